@@ -122,14 +122,11 @@ def load_internal_plugins():
 
 
 def load_external_plugins():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
+    from newrelic.common.entry_points import iter_entry_points
 
     group = 'newrelic.admin'
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         __import__(entrypoint.module_name)
 
 
@@ -14,7 +14,9 @@
 
 import logging
 import sys
+import time
 
+from newrelic.common.startup_profiler import record_startup_phase
 from newrelic.packages import six
 
 _logger = logging.getLogger(__name__)
@@ -59,6 +61,12 @@ _ok_modules = (
 
 _uninstrumented_modules = set()
 
+# The time spent running the import hooks for each module, since they
+# were last reported. This is the overhead added by instrumentation to
+# the import of the module.
+
+_import_hook_durations = {}
+
 
 def register_import_hook(name, callable):  # pylint: disable=redefined-builtin
     if six.PY2:
@@ -107,7 +115,12 @@ def register_import_hook(name, callable):  # pylint: disable=redefined-builtin
 
                 _import_hooks[name] = None
 
-                callable(module)
+                start = time.time()
+
+                try:
+                    callable(module)
+                finally:
+                    _record_import_hook_duration(name, start)
 
             else:
 
@@ -128,6 +141,15 @@ def register_import_hook(name, callable):  # pylint: disable=redefined-builtin
             imp.release_lock()
 
 
+def _record_import_hook_duration(name, start):
+    duration = time.time() - start
+
+    durations = _import_hook_durations
+    durations[name] = durations.get(name, 0.0) + duration
+
+    record_startup_phase("Instrumentation", name, duration)
+
+
 def _notify_import_hooks(name, module):
 
     # Is assumed that this function is called with the global
@@ -139,8 +161,26 @@ def _notify_import_hooks(name, module):
     if hooks is not None:
         _import_hooks[name] = None
 
-        for hook in hooks:
-            hook(module)
+        start = time.time()
+
+        try:
+            for hook in hooks:
+                hook(module)
+        finally:
+            _record_import_hook_duration(name, start)
+
+
+def import_hook_durations():
+    """Returns a dictionary of the time spent running the import hooks for
+    each module since the last call.
+
+    """
+
+    global _import_hook_durations
+
+    durations, _import_hook_durations = _import_hook_durations, {}
+
+    return durations
 
 
 class _ImportHookLoader:
@@ -12,9 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import json
 import logging
+import os
 import re
+import sys
+import threading
+import traceback
 from logging import Formatter, LogRecord
 
 from newrelic.api.time_trace import get_linking_metadata
@@ -86,9 +91,22 @@ class NewRelicContextFormatter(Formatter):
 
 
 class NewRelicLogHandler(logging.Handler):
-    """This is an experimental log handler provided by the community. Use with caution."""
+    """This is an experimental log handler provided by the community. Use with caution.
+
+    By default each log record is sent to the log API as it is emitted, on
+    the thread which logged it. When asynchronous is set, log records are
+    instead formatted and added to a bounded queue, and sent from a
+    background thread as a single compressed request for each batch of up
+    to batch_size log records, or for whatever is queued once
+    flush_interval seconds have passed. Log records emitted while the queue
+    is full are dropped and counted. Anything still queued is sent when the
+    handler is flushed or closed, which the logging module does on process
+    shutdown.
+
+    """
 
     PATH = "/log/v1"
+    CLIENT = agent_http.HttpClient
 
     def __init__(
         self,
@@ -103,13 +121,22 @@ class NewRelicLogHandler(logging.Handler):
         timeout=None,
         ca_bundle_path=None,
         disable_certificate_validation=False,
+        asynchronous=False,
+        batch_size=500,
+        flush_interval=5.0,
+        queue_size=10000,
     ):
         super(NewRelicLogHandler, self).__init__(level=level)
         self.license_key = license_key or self.settings.license_key
         self.host = host or self.settings.host or self.default_host(self.license_key)
 
-        self.client = agent_http.HttpClient(
-            host=host,
+        # Batches are always compressed, whereas single log records are
+        # only compressed where over the default compression threshold.
+
+        client_kwargs = {"compression_threshold": 0} if asynchronous else {}
+
+        self.client = self.CLIENT(
+            host=self.host,
             port=port,
             proxy_scheme=proxy_scheme,
             proxy_host=proxy_host,
@@ -118,10 +145,24 @@ class NewRelicLogHandler(logging.Handler):
             timeout=timeout,
             ca_bundle_path=ca_bundle_path,
             disable_certificate_validation=disable_certificate_validation,
+            **client_kwargs
         )
 
         self.setFormatter(NewRelicContextFormatter())
 
+        self._asynchronous = asynchronous
+        self._batch_size = max(batch_size, 1)
+        self._flush_interval = flush_interval
+        self._queue = collections.deque()
+        self._queue_size = queue_size
+        self._notify = threading.Condition()
+        self._waiting = False
+        self._closed = False
+        self._thread = None
+        self._process_id = os.getpid()
+        self._sent = 0
+        self._dropped = 0
+
     @property
     def settings(self):
         transaction = current_transaction()
@@ -129,29 +170,189 @@ class NewRelicLogHandler(logging.Handler):
             return transaction.settings
         return global_settings()
 
+    def _send(self, payload):
+        headers = {"Api-Key": self.license_key or "", "Content-Type": "application/json"}
+        status_code, response = self.client.send_request(path=self.PATH, headers=headers, payload=payload)
+        if status_code < 200 or status_code >= 300:
+            raise RuntimeError(
+                "An unexpected HTTP response of %r was received for request made to https://%s:%d%s."
+                "The response payload for the request was %r. If this issue persists then please "
+                "report this problem to New Relic support for further investigation."
+                % (
+                    status_code,
+                    self.client._host,
+                    self.client._port,
+                    self.PATH,
+                    truncate(response.decode("utf-8"), 1024),
+                )
+            )
+
     def emit(self, record):
         try:
-            headers = {"Api-Key": self.license_key or "", "Content-Type": "application/json"}
             payload = self.format(record).encode("utf-8")
+
+            if self._asynchronous:
+                self._enqueue(payload)
+                return
+
             with self.client:
-                status_code, response = self.client.send_request(path=self.PATH, headers=headers, payload=payload)
-                if status_code < 200 or status_code >= 300:
-                    raise RuntimeError(
-                        "An unexpected HTTP response of %r was received for request made to https://%s:%d%s."
-                        "The response payload for the request was %r. If this issue persists then please "
-                        "report this problem to New Relic support for further investigation."
-                        % (
-                            status_code,
-                            self.client._host,
-                            self.client._port,
-                            self.PATH,
-                            truncate(response.decode("utf-8"), 1024),
-                        )
-                    )
+                self._send(payload)
 
         except Exception:
             self.handleError(record)
 
+    def _check_process(self):
+        # After a fork, the log records queued and the counts are those of
+        # the parent process, which remains responsible for sending them,
+        # and the background thread does not exist in this process. The
+        # condition is also replaced as it may have been held by a thread
+        # of the parent process at the time of the fork. As the condition
+        # can be replaced at any time, each critical section reads it once
+        # and uses that same condition throughout.
+
+        if self._process_id == os.getpid():
+            return
+
+        self._process_id = os.getpid()
+        self._queue = collections.deque()
+        self._notify = threading.Condition()
+        self._waiting = False
+        self._thread = None
+        self._sent = 0
+        self._dropped = 0
+
+    def _enqueue(self, payload):
+        self._check_process()
+
+        notify = self._notify
+
+        with notify:
+            queue = self._queue
+
+            if self._closed or len(queue) >= self._queue_size:
+                self._dropped += 1
+                return
+
+            if self._thread is None:
+                thread = self._thread = threading.Thread(target=self._run, args=(notify, queue), name="NR-Log-Handler")
+                thread.daemon = True
+                thread.start()
+
+            queue.append(payload)
+
+            if self._waiting and len(queue) >= self._batch_size:
+                notify.notify()
+
+    def stats(self):
+        """Returns and resets the number of log records sent and the number
+        dropped since last called.
+
+        """
+
+        self._check_process()
+
+        notify = self._notify
+
+        with notify:
+            sent, dropped = self._sent, self._dropped
+            self._sent, self._dropped = 0, 0
+
+        return sent, dropped
+
+    def _next_batch(self, queue):
+        batch = []
+
+        while queue and len(batch) < self._batch_size:
+            batch.append(queue.popleft())
+
+        return batch
+
+    def _send_batch(self, batch):
+        try:
+            self._send(b"[" + b",".join(batch) + b"]")
+        except Exception:
+            # There is no log record to pass to handleError, and logging the
+            # failure could feed back into this handler, so the failure is
+            # reported the same way as handleError would.
+
+            notify = self._notify
+
+            with notify:
+                self._dropped += len(batch)
+
+            if logging.raiseExceptions and sys.stderr:
+                sys.stderr.write("--- Logging error ---\n")
+                traceback.print_exc(file=sys.stderr)
+            return
+
+        notify = self._notify
+
+        with notify:
+            self._sent += len(batch)
+
+    def flush(self):
+        """Sends all log records currently queued on the calling thread."""
+
+        self._check_process()
+
+        while True:
+            notify = self._notify
+
+            with notify:
+                batch = self._next_batch(self._queue)
+
+            if not batch:
+                return
+
+            self._send_batch(batch)
+
+    def close(self):
+        self._check_process()
+
+        notify = self._notify
+
+        with notify:
+            self._closed = True
+            notify.notify_all()
+            thread = self._thread
+
+        # Any batch the background thread is part way through sending is
+        # given a chance to complete before the remainder is sent.
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(self._flush_interval)
+
+        self.flush()
+        self.client.close_connection()
+
+        super(NewRelicLogHandler, self).close()
+
+    def _run(self, notify, queue):
+        # The thread only ever uses the condition and queue it was started
+        # with, and exits once they have been replaced after a fork.
+
+        while True:
+            with notify:
+                if self._notify is not notify:
+                    return
+
+                if len(queue) < self._batch_size and not self._closed:
+                    self._waiting = True
+                    notify.wait(self._flush_interval)
+
+                    if self._notify is not notify:
+                        return
+
+                    self._waiting = False
+
+                if self._closed:
+                    return
+
+                batch = self._next_batch(queue)
+
+            if batch:
+                self._send_batch(batch)
+
     def default_host(self, license_key):
         if not license_key:
             return "log-api.newrelic.com"
@@ -209,7 +209,7 @@ class TimeTrace(object):
         settings = self.settings or self.transaction.settings
         if source and settings and settings.code_level_metrics and settings.code_level_metrics.enabled:
             try:
-                node = extract_code_from_callable(source)
+                node = extract_code_from_callable(source, settings.agent_limits.code_level_metrics_cache_size)
                 node.add_attrs(self._add_agent_attribute)
             except Exception as exc:
                 _logger.debug(
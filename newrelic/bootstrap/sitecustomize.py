@@ -151,8 +151,18 @@ if python_prefix_matches and python_version_matches:
         if do_insert_path:
             sys.path.insert(0, root_directory)
 
+        import_start_time = time.time()
+
         import newrelic.config
 
+        agent_import_time = time.time() - import_start_time
+
+        log_message("agent_import_time = %.3fs", agent_import_time)
+
+        from newrelic.common.startup_profiler import record_startup_phase
+
+        record_startup_phase("AgentImport", None, agent_import_time)
+
         log_message("agent_version = %r", newrelic.version)
 
         if do_insert_path:
@@ -163,7 +173,11 @@ if python_prefix_matches and python_version_matches:
 
         # Finally initialize the agent.
 
+        initialize_start_time = time.time()
+
         newrelic.config.initialize(config_file, environment)
+
+        log_message("agent_initialize_time = %.3fs", time.time() - initialize_start_time)
 else:
     log_message(
         """New Relic could not start because the newrelic-admin script was called from a Python installation that is different from the Python installation that is currently running. To fix this problem, call the newrelic-admin script from the Python installation that is currently running (details below).
@@ -16,6 +16,7 @@ from __future__ import print_function
 
 import os
 import sys
+import threading
 import time
 import zlib
 from pprint import pprint
@@ -74,6 +75,8 @@ def _urllib3_ssl_recursion_workaround(wrapped, instance, args, kwargs):
 
 class BaseClient(object):
     AUDIT_LOG_ID = 0
+    STREAMING_PAYLOADS = False
+    AUDIT_LOG_LOCK = threading.Lock()
 
     def __init__(
         self,
@@ -92,6 +95,7 @@ class BaseClient(object):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._audit_log_fp = audit_log_fp
 
@@ -108,21 +112,39 @@ class BaseClient(object):
         pass
 
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload_size, body, compression_time):
         pass
 
     @classmethod
     def log_request(
-        cls, fp, method, url, params, payload, headers, body=None, compression_time=None
+        cls,
+        fp,
+        method,
+        url,
+        params,
+        payload,
+        headers,
+        body=None,
+        compression_time=None,
+        payload_size=None,
     ):
-        cls._supportability_request(params, payload, body, compression_time)
+        if payload_size is None and payload is not None:
+            payload_size = len(payload)
+
+        cls._supportability_request(params, payload_size, body, compression_time)
 
         if not fp:
             return
 
-        # Maintain a global AUDIT_LOG_ID attached to all class instances
-        # NOTE: this is not thread safe so this class cannot be used
-        # across threads when audit logging is on
+        # Maintain a global AUDIT_LOG_ID attached to all class instances.
+        # The lock keeps the IDs unique and the entries whole when requests
+        # are sent from more than one thread at a time.
+
+        with cls.AUDIT_LOG_LOCK:
+            return cls._log_request(fp, url, params, payload, headers)
+
+    @classmethod
+    def _log_request(cls, fp, url, params, payload, headers):
         cls.AUDIT_LOG_ID += 1
 
         print(
@@ -173,6 +195,11 @@ class BaseClient(object):
         if not fp:
             return
 
+        with cls.AUDIT_LOG_LOCK:
+            cls._log_response(fp, log_id, status, headers, data, exc_info)
+
+    @classmethod
+    def _log_response(cls, fp, log_id, status, headers, data, exc_info):
         try:
             result = json_decode(data)
         except Exception:
@@ -218,6 +245,7 @@ class BaseClient(object):
 
 class HttpClient(BaseClient):
     CONNECTION_CLS = urllib3.HTTPSConnectionPool
+    STREAMING_PAYLOADS = True
     PREFIX_SCHEME = "https://"
     BASE_HEADERS = urllib3.make_headers(
         keep_alive=True, accept_encoding=True, user_agent=USER_AGENT
@@ -240,6 +268,7 @@ class HttpClient(BaseClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._host = host
         port = self._port = port
@@ -254,6 +283,7 @@ class HttpClient(BaseClient):
         self._headers = dict(self.BASE_HEADERS)
         self._connection_kwargs = connection_kwargs = {
             "timeout": timeout,
+            "maxsize": max(max_connections or 1, 1),
         }
         self._urlopen_kwargs = urlopen_kwargs = {}
 
@@ -301,6 +331,7 @@ class HttpClient(BaseClient):
         self._proxy = proxy
 
         self._connection_attr = None
+        self._connection_lock = threading.Lock()
 
     @staticmethod
     def _parse_proxy(scheme, host, port, username, password):
@@ -343,17 +374,25 @@ class HttpClient(BaseClient):
         if self._connection_attr:
             return self._connection_attr
 
-        retries = urllib3.Retry(
-            total=False, connect=None, read=None, redirect=0, status=None
-        )
-        self._connection_attr = self.CONNECTION_CLS(
-            self._host,
-            self._port,
-            strict=True,
-            retries=retries,
-            **self._connection_kwargs
-        )
-        return self._connection_attr
+        # Requests may be sent from more than one thread at a time when
+        # harvest uploads run concurrently, in which case they must all
+        # share the one connection pool.
+
+        with self._connection_lock:
+            if self._connection_attr:
+                return self._connection_attr
+
+            retries = urllib3.Retry(
+                total=False, connect=None, read=None, redirect=0, status=None
+            )
+            self._connection_attr = self.CONNECTION_CLS(
+                self._host,
+                self._port,
+                strict=True,
+                retries=retries,
+                **self._connection_kwargs
+            )
+            return self._connection_attr
 
     def close_connection(self):
         if self._connection_attr:
@@ -370,21 +409,27 @@ class HttpClient(BaseClient):
         headers,
         body=None,
         compression_time=None,
+        payload_size=None,
     ):
         if not self._prefix:
             url = self.CONNECTION_CLS.scheme + "://" + self._host + url
 
         return super(HttpClient, self).log_request(
-            fp, method, url, params, payload, headers, body, compression_time
+            fp, method, url, params, payload, headers, body, compression_time, payload_size
         )
 
     @staticmethod
-    def _compress(data, method="gzip", level=None):
-        compression_start = time.time()
+    def _compressor(method="gzip", level=None):
         level = level or zlib.Z_DEFAULT_COMPRESSION
         wbits = 31 if method == "gzip" else 15
 
-        compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+        return zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    @classmethod
+    def _compress(cls, data, method="gzip", level=None):
+        compression_start = time.time()
+
+        compressor = cls._compressor(method, level)
         data = compressor.compress(data)
         data += compressor.flush()
 
@@ -392,6 +437,56 @@ class HttpClient(BaseClient):
 
         return data, compression_time
 
+    def _compress_chunks(self, chunks):
+        # The payload is supplied as an iterable of byte strings, such as
+        # is produced by json_encode_chunks(). The chunks are buffered until
+        # there is more than the compression threshold, after which they
+        # are passed through the compressor as they are produced, so that
+        # the full uncompressed payload is never held in memory. Encoding
+        # of the payload stops as soon as the compressed body exceeds the
+        # maximum payload size, in which case the body returned is None.
+
+        buffered = []
+        payload_size = 0
+        compressor = None
+        compressed = []
+        body_size = 0
+        compression_time = None
+
+        for chunk in chunks:
+            payload_size += len(chunk)
+
+            if compressor is None:
+                buffered.append(chunk)
+
+                if payload_size <= self._compression_threshold:
+                    continue
+
+                compressor = self._compressor(self._compression_method, self._compression_level)
+                compression_time = 0.0
+                chunk = b"".join(buffered)
+                buffered = None
+
+            compression_start = time.time()
+            data = compressor.compress(chunk)
+            compression_time += max(time.time(), compression_start) - compression_start
+
+            if data:
+                compressed.append(data)
+                body_size += len(data)
+
+                if body_size > self._max_payload_size_in_bytes:
+                    return None, payload_size, compression_time
+
+        if compressor is None:
+            return b"".join(buffered), payload_size, None
+
+        compression_start = time.time()
+        compressed.append(compressor.flush())
+        compression_time += max(time.time(), compression_start) - compression_start
+
+        return b"".join(compressed), payload_size, compression_time
+
     def send_request(
         self,
         method="POST",
@@ -411,14 +506,25 @@ class HttpClient(BaseClient):
             merged_headers.update(headers)
         path = self._prefix + path
         body = payload
+        payload_size = None
         compression_time = None
         if payload is not None:
-            if len(payload) > self._compression_threshold:
-                body, compression_time = self._compress(
-                    payload,
-                    method=self._compression_method,
-                    level=self._compression_level,
-                )
+            # The payload may be supplied as an iterable of byte strings
+            # rather than a single byte string, in which case it is only
+            # joined up when it needs to be written to the audit log.
+
+            if isinstance(payload, bytes):
+                chunks = (payload,)
+            elif self._audit_log_fp:
+                payload = b"".join(payload)
+                chunks = (payload,)
+            else:
+                chunks = payload
+                payload = None
+
+            body, payload_size, compression_time = self._compress_chunks(chunks)
+
+            if compression_time is not None:
                 content_encoding = self._compression_method
             else:
                 content_encoding = "Identity"
@@ -434,9 +540,10 @@ class HttpClient(BaseClient):
             merged_headers,
             body,
             compression_time,
+            payload_size,
         )
 
-        if body and len(body) > self._max_payload_size_in_bytes:
+        if payload_size is not None and (body is None or len(body) > self._max_payload_size_in_bytes):
             return 413, b""
 
         try:
@@ -489,6 +596,7 @@ class InsecureHttpClient(HttpClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         proxy = self._parse_proxy(proxy_scheme, proxy_host, None, None, None)
         if proxy and proxy.scheme == "https":
@@ -515,12 +623,13 @@ class InsecureHttpClient(HttpClient):
             compression_method,
             max_payload_size_in_bytes,
             audit_log_fp,
+            max_connections,
         )
 
 
 class SupportabilityMixin(object):
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload_size, body, compression_time):
         # *********
         # Used only for supportability metrics. Do not use to drive business
         # logic!
@@ -532,7 +641,7 @@ class SupportabilityMixin(object):
             if compression_time is not None:
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Bytes/%s" % agent_method,
-                    len(payload),
+                    payload_size,
                 )
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Compress/%s" % agent_method,
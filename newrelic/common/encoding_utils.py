@@ -31,6 +31,11 @@ from collections import OrderedDict
 
 from newrelic.packages import six
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 HEXDIGLC_RE = re.compile('^[0-9a-f]+$')
 DELIMITER_FORMAT_RE = re.compile('[ \t]*,[ \t]*')
 PARENT_TYPE = {
@@ -48,10 +53,45 @@ BASE64_DECODE_STR = getattr(base64, 'decodestring', None)
 # be supplied as key word arguments to allow the wrappers to supply
 # defaults.
 
-def json_encode(obj, **kwargs):
+# Conversions of types which the JSON encoders do not handle themselves,
+# looked up by the exact type of the object. Other objects which are
+# iterable are expanded into a list.
+
+_json_type_converters = {
+    types.GeneratorType: list,
+}
+
+if not six.PY2:
+    _json_type_converters[bytes] = lambda o: o.decode('latin-1')
+
+
+def register_json_type(cls, converter):
+    """Registers the function used to convert objects of the given type
+    into something which can be encoded as JSON. The conversion applies
+    only to objects of exactly that type and not to subclasses.
+
+    """
+
+    _json_type_converters[cls] = converter
+
+
+def _json_default(o):
+    converter = _json_type_converters.get(type(o))
+    if converter is not None:
+        return converter(o)
+    elif isinstance(o, bytes):
+        return o.decode('latin-1')
+    elif isinstance(o, types.GeneratorType):
+        return list(o)
+    elif hasattr(o, '__iter__'):
+        return list(iter(o))
+    raise TypeError(repr(o) + ' is not JSON serializable')
+
+
+def _json_encode_kwargs(kwargs):
     _kwargs = {}
 
-    # This wrapper function needs to deal with a few issues.
+    # The arguments for encoding need to deal with a few issues.
     #
     # The first is that when a byte string is provided, we need to
     # ensure that it is interpreted as being Latin-1. This is necessary
@@ -82,16 +122,7 @@ def json_encode(obj, **kwargs):
     if type(b'') is type(''):  # NOQA
         _kwargs['encoding'] = 'latin-1'
 
-    def _encode(o):
-        if isinstance(o, bytes):
-            return o.decode('latin-1')
-        elif isinstance(o, types.GeneratorType):
-            return list(o)
-        elif hasattr(o, '__iter__'):
-            return list(iter(o))
-        raise TypeError(repr(o) + ' is not JSON serializable')
-
-    _kwargs['default'] = _encode
+    _kwargs['default'] = _json_default
 
     _kwargs['separators'] = (',', ':')
 
@@ -102,7 +133,148 @@ def json_encode(obj, **kwargs):
 
     _kwargs.update(kwargs)
 
-    return json.dumps(obj, **_kwargs)
+    return _kwargs
+
+
+def json_encode(obj, **kwargs):
+    return json.dumps(obj, **_json_encode_kwargs(kwargs))
+
+
+def _json_is_array(obj):
+    # Mirrors which objects json_encode() will encode as a JSON array.
+
+    if isinstance(obj, (list, tuple, types.GeneratorType)):
+        return True
+    if isinstance(obj, (six.text_type, six.binary_type, dict)):
+        return False
+    return hasattr(obj, '__iter__')
+
+
+def _json_encode_pieces(obj, depth, encode, batch_size):
+    if depth <= 0 or not _json_is_array(obj):
+        yield encode(obj)
+        return
+
+    yield b'['
+
+    items = iter(obj)
+    separator = b''
+
+    if depth > 1:
+        for item in items:
+            yield separator
+            separator = b','
+            for piece in _json_encode_pieces(item, depth - 1, encode, batch_size):
+                yield piece
+
+    else:
+        # Items of the innermost array are encoded a batch at a time, as
+        # encoding them one at a time adds a lot of overhead.
+
+        while True:
+            batch = list(itertools.islice(items, batch_size))
+            if not batch:
+                break
+            yield separator
+            separator = b','
+            yield encode(batch)[1:-1]
+
+    yield b']'
+
+
+def json_encode_chunks(obj, depth=2, chunk_size=64 * 1024, encoder=None, **kwargs):
+    """Generator which yields the same JSON as json_encode() would return,
+    but as a sequence of UTF-8 encoded byte strings of around chunk_size
+    bytes. Arrays are expanded down to the given depth, with the items of
+    the innermost arrays being encoded in batches. This means the JSON
+    for a large collector payload, such as a list of span events, need
+    never be held in memory all at once. The encoder, if supplied, is a
+    function as returned by json_payload_encoder(), in which case any
+    other key word arguments are ignored.
+
+    """
+
+    if encoder is None:
+        _kwargs = _json_encode_kwargs(kwargs)
+        encode = (_kwargs.pop('cls', None) or json.JSONEncoder)(**_kwargs).encode
+        encoder = lambda o: encode(o).encode('utf-8')  # noqa: E731
+
+    pieces = []
+    size = 0
+
+    for piece in _json_encode_pieces(obj, depth, encoder, 100):
+        pieces.append(piece)
+        size += len(piece)
+
+        if size >= chunk_size:
+            yield b''.join(pieces)
+            pieces = []
+            size = 0
+
+    if pieces:
+        yield b''.join(pieces)
+
+
+def _stdlib_payload_encoder(obj):
+    return json_encode(obj).encode('utf-8')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_payload_encoder(obj):
+        # Some values which the standard library will encode cannot be
+        # encoded by orjson, such as integers of more than 64 bits and
+        # strings containing unpaired surrogates. The whole payload is
+        # encoded by the standard library instead when that occurs. As
+        # generators and iterators converted before the failure have been
+        # consumed, the results of those conversions are remembered and
+        # reused by the standard library. The object converted is kept
+        # with the result so its id cannot be reused in the meantime.
+
+        converted = {}
+
+        def _default(o):
+            result = _json_default(o)
+            converted[id(o)] = (o, result)
+            return result
+
+        try:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+
+        def _fallback(o):
+            entry = converted.get(id(o))
+            if entry is not None:
+                return entry[1]
+            return _json_default(o)
+
+        return json_encode(obj, default=_fallback).encode('utf-8')
+
+else:
+    _orjson_payload_encoder = None
+
+
+_json_payload_encoders = {
+    'stdlib': _stdlib_payload_encoder,
+    'orjson': _orjson_payload_encoder,
+}
+
+
+def json_payload_encoder(name='stdlib'):
+    """Returns a function which encodes an object as UTF-8 encoded JSON
+    bytes using the named backend. The backend can be 'stdlib' for the
+    json module of the standard library, 'orjson' for the orjson package,
+    or 'auto' to use orjson if it is installed. Where the named backend
+    is unknown or not installed, the standard library is used.
+
+    """
+
+    if name == 'auto':
+        name = orjson is not None and 'orjson' or 'stdlib'
+
+    return _json_payload_encoders.get(name) or _stdlib_payload_encoder
 
 
 def json_decode(s, **kwargs):
@@ -0,0 +1,79 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module provides access to the entry points of installed packages.
+
+Where available, importlib.metadata is used in preference to pkg_resources,
+as importing pkg_resources scans every installed distribution up front and
+can add a significant delay to the startup of short lived processes.
+
+"""
+
+import re
+from collections import namedtuple
+
+try:
+    from importlib.metadata import entry_points as _entry_points
+except ImportError:
+    _entry_points = None
+
+EntryPoint = namedtuple("EntryPoint", ["name", "module_name", "attrs"])
+
+_entry_point_value_re = re.compile(r"(?P<module>[\w.]+)\s*(?::\s*(?P<attrs>[\w.]+))?\s*(?:\[.*\])?\s*$")
+
+
+def _importlib_entry_points(group):
+    try:
+        entrypoints = _entry_points(group=group)
+    except TypeError:
+        # Prior to Python 3.10 the entry points for all groups are
+        # returned as a dictionary keyed by the group name.
+        entrypoints = _entry_points().get(group, ())
+
+    for entrypoint in entrypoints:
+        match = _entry_point_value_re.match(entrypoint.value)
+
+        if match is None:
+            continue
+
+        attrs = match.group("attrs")
+
+        yield EntryPoint(
+            entrypoint.name,
+            match.group("module"),
+            tuple(attrs.split(".")) if attrs else (),
+        )
+
+
+def _pkg_resources_entry_points(group):
+    try:
+        import pkg_resources
+    except ImportError:
+        return
+
+    for entrypoint in pkg_resources.iter_entry_points(group=group):
+        yield EntryPoint(entrypoint.name, entrypoint.module_name, entrypoint.attrs)
+
+
+def iter_entry_points(group):
+    """Yields the name, module name and attributes of each entry point in
+    the group for the installed packages.
+
+    """
+
+    if _entry_points is not None:
+        return _importlib_entry_points(group)
+
+    return _pkg_resources_entry_points(group)
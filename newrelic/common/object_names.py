@@ -20,6 +20,8 @@ import sys
 import types
 import inspect
 import functools
+import threading
+import weakref
 
 from newrelic.packages import six
 
@@ -279,6 +281,114 @@ def _object_context_py3(object):
 
     return (mname, path)
 
+# Name details for objects which they can't be cached against as an attribute,
+# such as types implemented as C code or objects with slots, and for bound
+# methods, which are created anew each time they are accessed. Entries are
+# dropped when the object they were derived from is garbage collected.
+# Bound methods are cached against the function and the class they are
+# bound to, as that is all the name details depend on. Objects which can't
+# be weakly referenced are cached against their type and module where they
+# don't have a name of their own, as that is then all the name details
+# depend on, and otherwise aren't cached.
+
+_object_path_cache = weakref.WeakKeyDictionary()
+_method_path_cache = weakref.WeakKeyDictionary()
+_object_path_type_cache = weakref.WeakKeyDictionary()
+
+_object_path_type_cache_lock = threading.Lock()
+
+def _method_owner(method):
+    owner = method.__self__
+
+    if inspect.isclass(owner):
+        return owner
+
+    # Where the method is bound to an object having a name of its own,
+    # rather than an instance of a class, the name details would depend
+    # on the object, so they aren't cached.
+
+    if getattr(owner, '__qualname__', None) or getattr(owner, '__name__', None):
+        return None
+
+    return type(owner)
+
+def _object_module(target):
+    # Where the object has a name of its own the name details would depend
+    # on the object rather than its type, so they aren't cached.
+
+    if getattr(target, '__qualname__', None) or getattr(target, '__name__', None):
+        return None
+
+    if hasattr(target, '__objclass__') or inspect.isbuiltin(target):
+        return None
+
+    return getattr(target, '__module__', None)
+
+def _cached_object_context(target):
+    if _is_py3_method(target):
+        try:
+            owners = _method_path_cache.get(target.__func__)
+        except TypeError:
+            return None
+
+        if owners is not None:
+            owner = _method_owner(target)
+            if owner is not None:
+                return owners.get(owner)
+
+        return None
+
+    try:
+        return _object_path_cache.get(target)
+    except TypeError:
+        pass
+
+    module = _object_module(target)
+
+    if module is not None:
+        try:
+            modules = _object_path_type_cache.get(type(target))
+        except TypeError:
+            return None
+
+        if modules is not None:
+            return modules.get(module)
+
+def _cache_object_context(target, details):
+    if _is_py3_method(target):
+        owner = _method_owner(target)
+
+        if owner is not None:
+            try:
+                owners = _method_path_cache.get(target.__func__)
+                if owners is None:
+                    owners = weakref.WeakKeyDictionary()
+                    _method_path_cache[target.__func__] = owners
+                owners[owner] = details
+            except TypeError:
+                pass
+
+        return
+
+    try:
+        _object_path_cache[target] = details
+        return
+    except TypeError:
+        pass
+
+    module = _object_module(target)
+
+    if module is not None:
+        try:
+            with _object_path_type_cache_lock:
+                modules = _object_path_type_cache.get(type(target))
+                if modules is None:
+                    modules = {}
+                    _object_path_type_cache[type(target)] = modules
+                modules[module] = details
+        except TypeError:
+            pass
+
 def object_context(target):
     """Returns a tuple identifying the supplied object. This will be of
     the form (module, object_path).
@@ -304,6 +414,14 @@ def object_context(target):
     if details and not _is_py3_method(target):
         return details
 
+    # Otherwise check whether they were cached for an object they
+    # couldn't be cached against as an attribute.
+
+    details = _cached_object_context(target)
+
+    if details:
+        return details
+
     # Check whether the object is actually one of our own
     # wrapper classes. For these we use the convention that the
     # attribute _nr_last_object refers to the wrapped object
@@ -349,24 +467,15 @@ def object_context(target):
 
         # Finally attempt to cache the name details against what
         # we derived them from. We may not be able to cache it if
-        # it is a type implemented as C code or an object with
-        # slots, which doesn't allow arbitrary addition of extra
-        # attributes. In that case, if we actually have to rely
-        # on the name details being cached against it and it fails,
-        # we have no choice but to recalculate them every time.
-        #
-        # XXX We could consider for the case where it fails
-        # storing it in a dictionary where the key is a weak
-        # function proxy with a callback to remove the entry if
-        # it ever expires. That would be another lookup we would
-        # have to make and we are already doing a lot so would
-        # have to properly benchmarks overhead before making that
-        # choice.
+        # it is a type implemented as C code, an object with slots
+        # or a bound method, which don't allow arbitrary addition
+        # of extra attributes. In that case they are cached against
+        # the object in a separate weakly keyed cache instead.
 
         source._nr_object_path = details
 
     except Exception:
-        pass
+        _cache_object_context(target, details)
 
     return details
 
@@ -0,0 +1,114 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module implements an opt in profiler for the startup of the agent.
+When the NEW_RELIC_STARTUP_PROFILE environment variable is enabled, the
+wall time of each phase of startup is recorded. This covers reading of
+the configuration, registration of each import hook, running of the
+import hooks for each module as it is imported and activation of the
+application. The recorded phases can be obtained as a report, and totals
+for each category of phase are reported as supportability metrics.
+
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from newrelic.common.stopwatch import default_timer
+
+_enabled = os.environ.get("NEW_RELIC_STARTUP_PROFILE", "off").lower() in ("on", "true", "1")
+
+_lock = threading.Lock()
+
+_phases = []
+_phases_reported = 0
+
+
+def startup_profiler_enabled():
+    return _enabled
+
+
+def record_startup_phase(category, name, duration):
+    """Records the wall time in seconds taken by a phase of startup. The
+    category is used to total the time taken by similar phases, with the
+    name distinguishing the individual phases within a category.
+
+    """
+
+    if _enabled:
+        with _lock:
+            _phases.append((category, name, duration))
+
+
+@contextmanager
+def startup_phase(category, name=None):
+    """Records the wall time taken to run the body of the with statement as
+    a phase of startup.
+
+    """
+
+    if not _enabled:
+        yield
+        return
+
+    start = default_timer()
+
+    try:
+        yield
+    finally:
+        record_startup_phase(category, name, default_timer() - start)
+
+
+def startup_profile_report():
+    """Returns a dictionary of the time taken by each category of phase,
+    along with each of the recorded phases in the order they completed.
+
+    """
+
+    with _lock:
+        phases = list(_phases)
+
+    categories = {}
+
+    for category, _, duration in phases:
+        totals = categories.setdefault(category, {"count": 0, "duration": 0.0})
+        totals["count"] += 1
+        totals["duration"] += duration
+
+    return {
+        "categories": categories,
+        "phases": [{"category": category, "name": name, "duration": duration} for category, name, duration in phases],
+    }
+
+
+def startup_profile_metrics():
+    """Returns a dictionary of the total time taken by each category of
+    phase recorded since the last call.
+
+    """
+
+    global _phases_reported
+
+    with _lock:
+        phases = _phases[_phases_reported:]
+        _phases_reported = len(_phases)
+
+    totals = {}
+
+    for category, _, duration in phases:
+        totals[category] = totals.get(category, 0.0) + duration
+
+    return totals
@@ -17,20 +17,23 @@ import logging
 import threading
 
 try:
+    from newrelic.core.infinite_tracing_batch_pb2 import SpanBatch
     from newrelic.core.infinite_tracing_pb2 import AttributeValue
 except:
-    AttributeValue = None
+    AttributeValue, SpanBatch = None, None
 
 _logger = logging.getLogger(__name__)
 
 
 class StreamBuffer(object):
-    def __init__(self, maxlen):
+    def __init__(self, maxlen, batch_size=100):
         self._queue = collections.deque(maxlen=maxlen)
         self._notify = self.condition()
         self._shutdown = False
         self._seen = 0
         self._dropped = 0
+        self._waiting = 0
+        self.batch_size = batch_size
 
     @staticmethod
     def condition(*args, **kwargs):
@@ -57,7 +60,47 @@ class StreamBuffer(object):
                 self._dropped += 1
 
             self._queue.append(item)
-            self._notify.notify_all()
+
+            # Consumers only need to be woken up if they are waiting for
+            # an item to be added to an empty queue.
+            if self._waiting:
+                self._notify.notify_all()
+
+    def put_many(self, items):
+        # Items are gathered before taking the lock, as they may be
+        # generated lazily, so that the lock is only taken once for all
+        # items rather than once per item.
+        items = list(items)
+
+        if not items:
+            return
+
+        with self._notify:
+            if self._shutdown:
+                return
+
+            self._seen += len(items)
+
+            # See put() regarding dropped possibly being over-counted.
+            overflow = len(self._queue) + len(items) - self._queue.maxlen
+            if overflow > 0:
+                self._dropped += min(overflow, len(items))
+
+            self._queue.extend(items)
+
+            if self._waiting:
+                self._notify.notify_all()
+
+    def _requeue(self, items):
+        # Return items which were taken by a consumer but not consumed
+        # to the front of the queue. Callers must hold the lock. Where
+        # the queue is now too full, the newest items will be lost and
+        # so are counted as dropped.
+        overflow = len(self._queue) + len(items) - self._queue.maxlen
+        if overflow > 0:
+            self._dropped += min(overflow, len(items))
+
+        self._queue.extendleft(reversed(items))
 
     def stats(self):
         with self._notify:
@@ -69,6 +112,9 @@ class StreamBuffer(object):
     def __iter__(self):
         return StreamBufferIterator(self)
 
+    def batches(self, max_count, max_bytes):
+        return SpanBatchIterator(self, max_count, max_bytes)
+
 
 class StreamBufferIterator(object):
     def __init__(self, stream_buffer):
@@ -76,16 +122,41 @@ class StreamBufferIterator(object):
         self._notify = self.stream_buffer._notify
         self._shutdown = False
         self._stream = None
+        self._batch = collections.deque()
 
     def shutdown(self):
         with self._notify:
             self._shutdown = True
+
+            # Any items drained from the stream buffer but not yet consumed
+            # are returned to the stream buffer for the next iterator. The
+            # consumer can be taking items from the batch without holding
+            # the lock, so items are popped one at a time to ensure each is
+            # either consumed or returned, but never both.
+            items = []
+            while True:
+                try:
+                    items.append(self._batch.popleft())
+                except IndexError:
+                    break
+
+            if items:
+                self.stream_buffer._requeue(items)
+
             self._notify.notify_all()
 
     def stream_closed(self):
         return self._shutdown or self.stream_buffer._shutdown or (self._stream and self._stream.done())
 
     def __next__(self):
+        # Items are drained from the stream buffer in batches so the lock
+        # need only be taken once per batch rather than once per item.
+        if self._batch and not self.stream_closed():
+            try:
+                return self._batch.popleft()
+            except IndexError:
+                pass
+
         with self._notify:
             while True:
                 # When a gRPC stream receives a server side disconnect (usually in the form of an OK code)
@@ -100,19 +171,77 @@ class StreamBufferIterator(object):
                         self.shutdown()
                     raise StopIteration
 
-                try:
-                    return self.stream_buffer._queue.popleft()
-                except IndexError:
-                    pass
+                queue = self.stream_buffer._queue
 
-                if not self.stream_closed() and not self.stream_buffer._queue:
+                if queue:
+                    item = queue.popleft()
+                    for _ in range(min(len(queue), self.stream_buffer.batch_size - 1)):
+                        self._batch.append(queue.popleft())
+                    return item
+
+                self.stream_buffer._waiting += 1
+                try:
                     self._notify.wait()
+                finally:
+                    self.stream_buffer._waiting -= 1
 
     next = __next__
 
     def __iter__(self):
         return self
 
+    def _next_nowait(self):
+        # Returns the next item if one is immediately available, without
+        # waiting for one to be added to the stream buffer.
+        try:
+            return self._batch.popleft()
+        except IndexError:
+            pass
+
+        with self._notify:
+            if self.stream_closed() or not self.stream_buffer._queue:
+                return None
+            return self.stream_buffer._queue.popleft()
+
+
+class SpanBatchIterator(StreamBufferIterator):
+    """Iterator over a stream buffer of spans which packs the spans into
+    SpanBatch messages. Waits for at least one span to be available, then
+    adds any other spans which are immediately available, up to a maximum
+    number of spans and size in bytes for the batch.
+
+    """
+
+    def __init__(self, stream_buffer, max_count, max_bytes):
+        super(SpanBatchIterator, self).__init__(stream_buffer)
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+
+    def __next__(self):
+        span = super(SpanBatchIterator, self).__next__()
+
+        spans = [span]
+        size = span.ByteSize()
+
+        while len(spans) < self.max_count:
+            span = self._next_nowait()
+            if span is None:
+                break
+
+            # A span which would take the batch over the maximum size is
+            # kept back as the first span of the next batch.
+            span_size = span.ByteSize()
+            if size + span_size > self.max_bytes:
+                self._batch.appendleft(span)
+                break
+
+            spans.append(span)
+            size += span_size
+
+        return SpanBatch(spans=spans)
+
+    next = __next__
+
 
 class SpanProtoAttrs(dict):
     def __init__(self, *args, **kwargs):
@@ -43,8 +43,15 @@ import newrelic.console
 import newrelic.core.agent
 import newrelic.core.config
 import newrelic.core.trace_cache as trace_cache
+from newrelic.common.encoding_utils import json_encode
+from newrelic.common.entry_points import iter_entry_points
 from newrelic.common.log_file import initialize_logging
 from newrelic.common.object_names import expand_builtin_exception_name
+from newrelic.common.startup_profiler import (
+    startup_phase,
+    startup_profile_report,
+    startup_profiler_enabled,
+)
 from newrelic.core.config import (
     Settings,
     apply_config_setting,
@@ -338,6 +345,7 @@ def _process_configuration(section):
     _process_setting(section, "startup_timeout", "getfloat", None)
     _process_setting(section, "shutdown_timeout", "getfloat", None)
     _process_setting(section, "compressed_content_encoding", "get", _map_compressed_content_encoding)
+    _process_setting(section, "json_encoder", "get", None)
     _process_setting(section, "attributes.enabled", "getboolean", None)
     _process_setting(section, "attributes.exclude", "get", _map_inc_excl_attributes)
     _process_setting(section, "attributes.include", "get", _map_inc_excl_attributes)
@@ -439,6 +447,7 @@ def _process_configuration(section):
     _process_setting(section, "span_events.attributes.enabled", "getboolean", None)
     _process_setting(section, "span_events.attributes.exclude", "get", _map_inc_excl_attributes)
     _process_setting(section, "span_events.attributes.include", "get", _map_inc_excl_attributes)
+    _process_setting(section, "span_events.lazy_materialization", "getboolean", None)
     _process_setting(section, "transaction_segments.attributes.enabled", "getboolean", None)
     _process_setting(
         section,
@@ -470,6 +479,10 @@ def _process_configuration(section):
     _process_setting(section, "agent_limits.synthetics_transactions", "getint", None)
     _process_setting(section, "agent_limits.data_compression_threshold", "getint", None)
     _process_setting(section, "agent_limits.data_compression_level", "getint", None)
+    _process_setting(section, "agent_limits.normalization_cache_size", "getint", None)
+    _process_setting(section, "agent_limits.attribute_filter_cache_size", "getint", None)
+    _process_setting(section, "agent_limits.sql_statement_cache_bytes", "getint", None)
+    _process_setting(section, "agent_limits.code_level_metrics_cache_size", "getint", None)
     _process_setting(section, "console.listener_socket", "get", _map_console_listener_socket)
     _process_setting(section, "console.allow_interpreter_cmd", "getboolean", None)
     _process_setting(section, "debug.disable_api_supportability_metrics", "getboolean", None)
@@ -530,6 +543,25 @@ def _process_configuration(section):
     _process_setting(section, "infinite_tracing.trace_observer_host", "get", None)
     _process_setting(section, "infinite_tracing.trace_observer_port", "getint", None)
     _process_setting(section, "infinite_tracing.span_queue_size", "getint", None)
+    _process_setting(section, "infinite_tracing.batching", "getboolean", None)
+    _process_setting(section, "infinite_tracing.batch_size", "getint", None)
+    _process_setting(section, "infinite_tracing.batch_max_bytes", "getint", None)
+    _process_setting(section, "stats_sharding.enabled", "getboolean", None)
+    _process_setting(section, "stats_sharding.shard_count", "getint", None)
+    _process_setting(section, "deferred_recording.enabled", "getboolean", None)
+    _process_setting(section, "deferred_recording.queue_size", "getint", None)
+    _process_setting(section, "deferred_recording.batch_size", "getint", None)
+    _process_setting(section, "async_explain_plans.enabled", "getboolean", None)
+    _process_setting(section, "async_explain_plans.worker_count", "getint", None)
+    _process_setting(section, "async_explain_plans.database_concurrency", "getint", None)
+    _process_setting(section, "async_explain_plans.cache_ttl", "getfloat", None)
+    _process_setting(section, "async_explain_plans.harvest_time_budget", "getfloat", None)
+    _process_setting(section, "concurrent_harvest.enabled", "getboolean", None)
+    _process_setting(section, "concurrent_harvest.max_workers", "getint", None)
+    _process_setting(section, "harvest_spool.enabled", "getboolean", None)
+    _process_setting(section, "harvest_spool.directory", "get", None)
+    _process_setting(section, "harvest_spool.max_bytes", "getint", None)
+    _process_setting(section, "harvest_spool.replay_limit", "getint", None)
     _process_setting(section, "code_level_metrics.enabled", "getboolean", None)
 
 
@@ -1936,6 +1968,11 @@ def _process_function_profile_configuration():
 
 
 def _process_module_definition(target, module, function="instrument"):
+    with startup_phase("HookRegistration", target):
+        _register_module_definition(target, module, function)
+
+
+def _register_module_definition(target, module, function):
     enabled = True
     execute = None
 
@@ -2885,14 +2922,9 @@ def _process_module_builtin_defaults():
 
 
 def _process_module_entry_points():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = "newrelic.hooks"
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         target = entrypoint.name
 
         if target in _module_import_hook_registry:
@@ -2945,14 +2977,9 @@ def _setup_instrumentation():
 
 
 def _setup_extensions():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = "newrelic.extension"
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         __import__(entrypoint.module_name)
         module = sys.modules[entrypoint.module_name]
         module.initialize()
@@ -2991,16 +3018,26 @@ def initialize(
     if ignore_errors is None:
         ignore_errors = newrelic.core.config._environ_as_bool("NEW_RELIC_IGNORE_STARTUP_ERRORS", True)
 
-    _load_configuration(config_file, environment, ignore_errors, log_file, log_level)
+    with startup_phase("Initialize"):
+        with startup_phase("Configuration"):
+            _load_configuration(config_file, environment, ignore_errors, log_file, log_level)
 
-    if _settings.monitor_mode or _settings.developer_mode:
-        _settings.enabled = True
-        _setup_instrumentation()
-        _setup_data_source()
-        _setup_extensions()
-        _setup_agent_console()
-    else:
-        _settings.enabled = False
+        if _settings.monitor_mode or _settings.developer_mode:
+            _settings.enabled = True
+            _setup_instrumentation()
+
+            with startup_phase("DataSources"):
+                _setup_data_source()
+
+            with startup_phase("Extensions"):
+                _setup_extensions()
+
+            _setup_agent_console()
+        else:
+            _settings.enabled = False
+
+    if startup_profiler_enabled():
+        _logger.info("Agent startup profile: %s", json_encode(startup_profile_report()))
 
 
 def filter_app_factory(app, global_conf, config_file, environment=None):
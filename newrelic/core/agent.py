@@ -34,6 +34,8 @@ import newrelic.core.application
 import newrelic.core.config
 import newrelic.packages.six as six
 from newrelic.common.log_file import initialize_logging
+from newrelic.common.startup_profiler import record_startup_phase
+from newrelic.common.stopwatch import default_timer
 from newrelic.core.thread_utilization import thread_utilization_data_source
 from newrelic.samplers.cpu_usage import cpu_usage_data_source
 from newrelic.samplers.gc_data import garbage_collector_data_source
@@ -336,6 +338,8 @@ class Agent(object):
 
         activate_session = False
 
+        start = default_timer()
+
         with self._lock:
             application = self._applications.get(app_name, None)
             if not application:
@@ -397,6 +401,8 @@ class Agent(object):
             if activate_session:
                 application.activate_session(self.activate_agent, timeout)
 
+                record_startup_phase("ActivateApplication", app_name, default_timer() - start)
+
     @property
     def applications(self):
         """Returns a dictionary of the internal application objects
@@ -580,11 +586,7 @@ class Agent(object):
         self._flexible_harvest_count += 1
         self._last_flexible_harvest = time.time()
 
-        for application in list(six.itervalues(self._applications)):
-            try:
-                application.harvest(shutdown=False, flexible=True)
-            except Exception:
-                _logger.exception("Failed to harvest data for %s." % application.name)
+        self._harvest_applications(shutdown=False, flexible=True)
 
         self._flexible_harvest_duration = time.time() - self._last_flexible_harvest
 
@@ -592,6 +594,40 @@ class Agent(object):
             "Completed harvest[flexible] of application data in %.2f seconds.", self._flexible_harvest_duration
         )
 
+    def _harvest_application(self, application, shutdown, flexible):
+        try:
+            application.harvest(shutdown, flexible=flexible)
+        except Exception:
+            _logger.exception("Failed to harvest data for %s." % application.name)
+
+    def _harvest_applications(self, shutdown, flexible):
+        applications = list(six.itervalues(self._applications))
+        settings = self.global_settings()
+
+        # When concurrent harvest is enabled and there is more than one
+        # application, each is harvested in its own thread so that a slow
+        # harvest of one application does not hold up the others.
+
+        if len(applications) > 1 and settings.concurrent_harvest.enabled and not settings.serverless_mode.enabled:
+            threads = []
+
+            for application in applications:
+                thread = threading.Thread(
+                    target=self._harvest_application,
+                    args=(application, shutdown, flexible),
+                    name="NR-Harvest/%s" % application.name,
+                )
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+            for thread in threads:
+                thread.join()
+
+        else:
+            for application in applications:
+                self._harvest_application(application, shutdown, flexible)
+
     def _harvest_default(self, shutdown=False):
         if not self._harvest_shutdown_is_set():
             self._scheduler.enter(60.0, 2, self._harvest_default, ())
@@ -604,11 +640,7 @@ class Agent(object):
         self._default_harvest_count += 1
         self._last_default_harvest = time.time()
 
-        for application in list(six.itervalues(self._applications)):
-            try:
-                application.harvest(shutdown, flexible=False)
-            except Exception:
-                _logger.exception("Failed to harvest data for %s." % application.name)
+        self._harvest_applications(shutdown, flexible=False)
 
         self._default_harvest_duration = time.time() - self._last_default_harvest
 
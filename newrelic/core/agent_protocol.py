@@ -14,6 +14,7 @@
 
 import logging
 import os
+import time
 
 from newrelic import version
 from newrelic.common import system_info
@@ -21,6 +22,8 @@ from newrelic.common.agent_http import ApplicationModeClient, ServerlessModeClie
 from newrelic.common.encoding_utils import (
     json_decode,
     json_encode,
+    json_encode_chunks,
+    json_payload_encoder,
     serverless_payload_encode,
 )
 from newrelic.common.utilization import (
@@ -37,7 +40,7 @@ from newrelic.core.config import (
     finalize_application_settings,
     global_settings_dump,
 )
-from newrelic.core.internal_metrics import internal_count_metric
+from newrelic.core.internal_metrics import internal_count_metric, internal_metric
 from newrelic.network.exceptions import (
     DiscardDataForRequest,
     ForceAgentDisconnect,
@@ -174,6 +177,7 @@ class AgentProtocol(object):
             compression_method=settings.compressed_content_encoding,
             max_payload_size_in_bytes=settings.max_payload_size_in_bytes,
             audit_log_fp=audit_log_fp,
+            max_connections=self._max_connections(settings),
         )
 
         self._params = {
@@ -196,6 +200,14 @@ class AgentProtocol(object):
         self._headers["Content-Type"] = "application/json"
         self._run_token = settings.agent_run_id
 
+        # Where the client is able to accept the payload as a sequence of
+        # chunks, the JSON is encoded as it is being compressed rather than
+        # all of it up front. Payloads are always encoded in full when they
+        # are to be written to the audit log.
+
+        self._stream_payloads = self.client.STREAMING_PAYLOADS and not audit_log_fp
+        self._payload_encoder = json_payload_encoder(settings.json_encoder)
+
         # Logging
         self._proxy_host = settings.proxy_host
         self._proxy_port = settings.proxy_port
@@ -204,6 +216,16 @@ class AgentProtocol(object):
         # Do not access configuration anywhere inside the class
         self.configuration = settings
 
+    @staticmethod
+    def _max_connections(settings):
+        # When harvest uploads run concurrently, enough connections to the
+        # data collector are kept open for each upload to have its own.
+
+        concurrent_harvest = settings.concurrent_harvest
+        if concurrent_harvest.enabled and not settings.serverless_mode.enabled:
+            return max(concurrent_harvest.max_workers, 1)
+        return 1
+
     def __enter__(self):
         self.client.__enter__()
         return self
@@ -217,11 +239,15 @@ class AgentProtocol(object):
     def send(self, method, payload=()):
         params, headers, payload = self._to_http(method, payload)
 
+        start = time.time()
+
         try:
             response = self.client.send_request(params=params, headers=headers, payload=payload)
         except NetworkInterfaceException:
             # All HTTP errors are currently retried
             raise RetryDataForRequest
+        finally:
+            internal_metric("Supportability/Python/Collector/Duration/%s" % method, time.time() - start)
 
         status, data = response
 
@@ -257,7 +283,9 @@ class AgentProtocol(object):
         params["method"] = method
         if self._run_token:
             params["run_id"] = self._run_token
-        return params, self._headers, json_encode(payload).encode("utf-8")
+        if self._stream_payloads:
+            return params, self._headers, json_encode_chunks(payload, encoder=self._payload_encoder)
+        return params, self._headers, self._payload_encoder(payload)
 
     @staticmethod
     def _connect_payload(app_name, linked_applications, environment, settings):
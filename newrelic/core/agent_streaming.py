@@ -18,9 +18,10 @@ import threading
 try:
     import grpc
 
+    from newrelic.core.infinite_tracing_batch_pb2 import SpanBatch
     from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span
 except Exception:
-    grpc, RecordStatus, Span = None, None, None
+    grpc, RecordStatus, Span, SpanBatch = None, None, None, None
 
 _logger = logging.getLogger(__name__)
 
@@ -31,9 +32,15 @@ class StreamingRpc(object):
     This class keeps a stream_stream RPC alive, retrying after a timeout when
     errors are encountered. If grpc.StatusCode.UNIMPLEMENTED is encountered, a
     retry will not occur.
+
+    When batching is enabled, spans are packed into SpanBatch messages sent
+    using the RecordSpanBatch method. If the trace observer responds to this
+    with grpc.StatusCode.UNIMPLEMENTED, batching is disabled and the stream
+    reestablished immediately, sending single spans.
     """
 
     PATH = "/com.newrelic.trace.v1.IngestService/RecordSpan"
+    BATCH_PATH = "/com.newrelic.trace.v1.IngestService/RecordSpanBatch"
     RETRY_POLICY = (
         (15, False),
         (15, False),
@@ -44,11 +51,24 @@ class StreamingRpc(object):
     )
     OPTIONS = [("grpc.enable_retries", 0)]
 
-    def __init__(self, endpoint, stream_buffer, metadata, record_metric, ssl=True):
+    def __init__(
+        self,
+        endpoint,
+        stream_buffer,
+        metadata,
+        record_metric,
+        ssl=True,
+        batching=False,
+        batch_size=100,
+        batch_max_bytes=1024 * 1024,
+    ):
         self._endpoint = endpoint
         self._ssl = ssl
         self.metadata = metadata
         self.stream_buffer = stream_buffer
+        self.batching = batching
+        self.batch_size = batch_size
+        self.batch_max_bytes = batch_max_bytes
         self.request_iterator = iter(stream_buffer)
         self.response_processing_thread = threading.Thread(
             target=self.process_responses, name="NR-StreamingRpc-process-responses"
@@ -67,11 +87,19 @@ class StreamingRpc(object):
         else:
             self.channel = grpc.insecure_channel(self._endpoint, options=self.OPTIONS)
 
-        self.rpc = self.channel.stream_stream(self.PATH, Span.SerializeToString, RecordStatus.FromString)
+        if self.batching:
+            self.rpc = self.channel.stream_stream(
+                self.BATCH_PATH, SpanBatch.SerializeToString, RecordStatus.FromString
+            )
+        else:
+            self.rpc = self.channel.stream_stream(self.PATH, Span.SerializeToString, RecordStatus.FromString)
 
     def create_response_iterator(self):
         with self.stream_buffer._notify:
-            self.request_iterator = iter(self.stream_buffer)
+            if self.batching:
+                self.request_iterator = self.stream_buffer.batches(self.batch_size, self.batch_max_bytes)
+            else:
+                self.request_iterator = iter(self.stream_buffer)
             self.request_iterator._stream = reponse_iterator = self.rpc(self.request_iterator, metadata=self.metadata)
             return reponse_iterator
 
@@ -127,6 +155,25 @@ class StreamingRpc(object):
                         self.channel.close()
                         self.create_channel()
 
+                    elif code is grpc.StatusCode.UNIMPLEMENTED and self.batching:
+                        _logger.warning(
+                            "Streaming RPC received UNIMPLEMENTED "
+                            "response code for span batches. The agent "
+                            "will reestablish the stream immediately, "
+                            "sending single spans."
+                        )
+
+                        self.record_metric(
+                            "Supportability/InfiniteTracing/Span/Batching/Unimplemented",
+                            {"count": 1},
+                        )
+
+                        # Fall back to sending single spans
+                        self.batching = False
+                        self.request_iterator.shutdown()
+                        self.channel.close()
+                        self.create_channel()
+
                     else:
                         self.record_metric(
                             "Supportability/InfiniteTracing/Span/Response/Error",
@@ -27,13 +27,19 @@ import traceback
 import warnings
 from functools import partial
 
+from newrelic.api.import_hook import import_hook_durations
 from newrelic.common.object_names import callable_name
+from newrelic.common.startup_profiler import startup_profile_metrics
 from newrelic.core.adaptive_sampler import AdaptiveSampler
 from newrelic.core.config import global_settings
 from newrelic.core.custom_event import create_custom_event
 from newrelic.core.data_collector import create_session
-from newrelic.core.database_utils import SQLConnections
+from newrelic.core.deferred_recorder import DeferredRecorder
+from newrelic.core.database_utils import SQLConnections, sql_statement_cache_stats
 from newrelic.core.environment import environment_settings
+from newrelic.core.explain_plan_executor import ExplainPlanExecutor
+from newrelic.core.harvest_spool import HarvestSpool
+from newrelic.core.harvest_uploads import HarvestUploadPool, HarvestUploads
 from newrelic.core.internal_metrics import (
     InternalTrace,
     InternalTraceContext,
@@ -42,7 +48,7 @@ from newrelic.core.internal_metrics import (
 )
 from newrelic.core.profile_sessions import profile_session_manager
 from newrelic.core.rules_engine import RulesEngine, SegmentCollapseEngine
-from newrelic.core.stats_engine import CustomMetrics, StatsEngine
+from newrelic.core.stats_engine import CustomMetrics, StatsEngine, StatsEngineShards
 from newrelic.network.exceptions import (
     DiscardDataForRequest,
     ForceAgentDisconnect,
@@ -102,6 +108,10 @@ class Application(object):
 
         self._stats_lock = threading.RLock()
         self._stats_engine = StatsEngine()
+        self._stats_shards = None
+        self._deferred_recorder = None
+        self._explain_plan_executor = None
+        self._harvest_upload_pool = None
 
         self._stats_custom_lock = threading.RLock()
         self._stats_custom_engine = StatsEngine()
@@ -419,9 +429,11 @@ class Application(object):
                             configuration.transaction_name_rules,
                         )
 
-                    self._rules_engine["url"] = RulesEngine(configuration.url_rules)
-                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules)
-                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules)
+                    cache_size = configuration.agent_limits.normalization_cache_size
+
+                    self._rules_engine["url"] = RulesEngine(configuration.url_rules, cache_size)
+                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules, cache_size)
+                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules, cache_size)
                     self._rules_engine["segment"] = SegmentCollapseEngine(configuration.transaction_segment_terms)
 
                 except Exception:
@@ -496,9 +508,90 @@ class Application(object):
 
         configuration = active_session.configuration
 
+        # Stop the background thread used for deferred recording by a prior
+        # agent run. This must be done before the stats lock is acquired,
+        # as the background thread needs it to record its final batch.
+
+        deferred_recorder, self._deferred_recorder = self._deferred_recorder, None
+
+        if deferred_recorder is not None:
+            deferred_recorder.shutdown()
+
         with self._stats_lock:
             self._stats_engine.reset_stats(configuration, reset_stream=True)
 
+            # When stats sharding is enabled, transactions are merged into
+            # a shard assigned to the recording thread rather than into the
+            # main stats engine. The shards are created from the main stats
+            # engine after it has been reset so they share the span stream.
+
+            if configuration.stats_sharding.enabled:
+                self._stats_shards = StatsEngineShards(self._stats_engine, configuration.stats_sharding.shard_count)
+            else:
+                self._stats_shards = None
+
+            # When deferred recording is enabled, transactions are queued
+            # and recorded into the stats engine in batches by a background
+            # thread rather than by the thread which ran the transaction.
+
+            if configuration.deferred_recording.enabled:
+                self._deferred_recorder = DeferredRecorder(
+                    self._app_name,
+                    self._record_deferred_transactions,
+                    configuration.deferred_recording.queue_size,
+                    configuration.deferred_recording.batch_size,
+                )
+                self._deferred_recorder.start()
+            else:
+                self._deferred_recorder = None
+
+            # When asynchronous explain plans are enabled, explain plans for
+            # slow SQL are run on background threads and their results
+            # cached, rather than being run on the harvest thread.
+
+            if self._explain_plan_executor is not None:
+                self._explain_plan_executor.shutdown()
+
+            if configuration.async_explain_plans.enabled:
+                self._explain_plan_executor = ExplainPlanExecutor(
+                    self._app_name,
+                    configuration.async_explain_plans.worker_count,
+                    configuration.async_explain_plans.database_concurrency,
+                    configuration.async_explain_plans.cache_ttl,
+                    configuration.agent_limits.max_sql_connections,
+                )
+            else:
+                self._explain_plan_executor = None
+
+            # When concurrent harvest is enabled, the payloads for a harvest
+            # are sent to the data collector on a pool of background threads
+            # rather than one after another on the harvest thread. This is
+            # not done in serverless mode where payloads are not sent.
+
+            if self._harvest_upload_pool is not None:
+                self._harvest_upload_pool.shutdown()
+
+            if configuration.concurrent_harvest.enabled and not configuration.serverless_mode.enabled:
+                self._harvest_upload_pool = HarvestUploadPool(
+                    self._app_name, configuration.concurrent_harvest.max_workers
+                )
+            else:
+                self._harvest_upload_pool = None
+
+            # When the harvest spool is enabled, data which cannot be sent
+            # because the data collector cannot be reached is written to
+            # disk, and replayed on later harvests, rather than being held
+            # in memory.
+
+            if configuration.harvest_spool.enabled and not configuration.serverless_mode.enabled:
+                active_session.spool = HarvestSpool(
+                    configuration.harvest_spool.directory,
+                    configuration.license_key,
+                    self._app_name,
+                    configuration.harvest_spool.max_bytes,
+                    configuration.harvest_spool.replay_limit,
+                )
+
             if configuration.serverless_mode.enabled:
                 sampling_target_period = 60.0
             else:
@@ -868,6 +961,16 @@ class Application(object):
 
         self.validate_process()
 
+        # If deferred recording is enabled, hand off the transaction to be
+        # recorded by the background thread. If the queue is full the
+        # transaction is dropped and counted in a supportability metric.
+
+        deferred_recorder = self._deferred_recorder
+
+        if deferred_recorder is not None:
+            deferred_recorder.put(data)
+            return
+
         internal_metrics = CustomMetrics()
 
         with InternalTraceContext(internal_metrics):
@@ -893,32 +996,103 @@ class Application(object):
                     if settings.debug.record_transaction_failure:
                         raise
 
-            with self._stats_lock:
-                try:
-                    self._transaction_count += 1
-                    self._last_transaction = data.end_time
+            # If stats sharding is enabled we merge into the shard for
+            # this thread, which avoids contending on the main stats lock
+            # with other threads recording transactions. The shards are
+            # merged into the main stats engine when a harvest occurs.
+
+            stats_shards = self._stats_shards
+
+            try:
+                # We merge the internal statistics here as well even
+                # though have popped out of the context where we are
+                # recording. This is okay so long as don't record
+                # anything else after this point. If we do then that
+                # data will not be recorded.
+
+                if stats_shards is not None:
+                    stats_shards.current_shard().merge_transaction(stats, internal_metrics.metrics())
+                else:
+                    self._merge_transaction(stats, internal_metrics.metrics(), data.end_time)
+
+            except Exception:
+                _logger.exception(
+                    "The merging of transaction data has "
+                    "failed. This would indicate some sort of "
+                    "internal implementation issue with the agent. "
+                    "Please report this problem to New Relic support "
+                    "for further investigation."
+                )
 
-                    self._stats_engine.merge(stats)
+                if settings.debug.record_transaction_failure:
+                    raise
 
-                    # We merge the internal statistics here as well even
-                    # though have popped out of the context where we are
-                    # recording. This is okay so long as don't record
-                    # anything else after this point. If we do then that
-                    # data will not be recorded.
+    def _record_deferred_transactions(self, transactions):
+        """Records a batch of transactions queued by the deferred recorder.
+        Each transaction is still distilled into its own workarea, as the
+        events generated for a transaction are derived from its metrics,
+        but they are combined and merged into the main stats engine with
+        a single acquisition of the stats lock.
 
-                    self._stats_engine.merge_custom_metrics(internal_metrics.metrics())
+        """
 
-                except Exception:
-                    _logger.exception(
-                        "The merging of transaction data has "
-                        "failed. This would indicate some sort of "
-                        "internal implementation issue with the agent. "
-                        "Please report this problem to New Relic support "
-                        "for further investigation."
-                    )
+        settings = self._stats_engine.settings
 
-                    if settings.debug.record_transaction_failure:
-                        raise
+        if settings is None:
+            return
+
+        internal_metrics = CustomMetrics()
+
+        batch = self._stats_engine.create_workarea()
+        transaction_count = 0
+        last_transaction = 0.0
+
+        with InternalTraceContext(internal_metrics):
+            for data in transactions:
+                # The agent may have been restarted since the transaction
+                # was queued, in which case it needs to be discarded.
+
+                if settings.agent_run_id != data.settings.agent_run_id:
+                    continue
+
+                with InternalTrace("Supportability/Python/RecordTransaction/Calls/record"):
+                    try:
+                        stats = self._stats_engine.create_workarea()
+                        stats.record_transaction(data)
+                        batch.merge(stats)
+
+                    except Exception:
+                        _logger.exception(
+                            "The generation of transaction data has "
+                            "failed. This would indicate some sort of internal "
+                            "implementation issue with the agent. Please report "
+                            "this problem to New Relic support for further "
+                            "investigation."
+                        )
+                        continue
+
+                transaction_count += 1
+                last_transaction = max(last_transaction, data.end_time)
+
+        with self._stats_lock:
+            self._transaction_count += transaction_count
+            self._last_transaction = max(self._last_transaction, last_transaction)
+
+            self._stats_engine.merge_shard(batch)
+            self._stats_engine.merge_custom_metrics(internal_metrics.metrics())
+
+    def _merge_transaction(self, stats, metrics, end_time):
+        """Merges the stats for a single transaction into the main stats
+        engine under the stats lock.
+
+        """
+
+        with self._stats_lock:
+            self._transaction_count += 1
+            self._last_transaction = end_time
+
+            self._stats_engine.merge(stats)
+            self._stats_engine.merge_custom_metrics(metrics)
 
     def cmd_start_profiler(self, command_id=0, **kwargs):
         """Triggered by the start_profiler agent command to start a
@@ -1063,15 +1237,35 @@ class Application(object):
                 _logger.debug("Snapshotting for harvest[%s] of %r.", call_metric, self._app_name)
 
                 configuration = self._active_session.configuration
-                transaction_count = self._transaction_count
+
+                # Record any transactions still queued for deferred
+                # recording so they are included in this harvest. On the
+                # final harvest the background thread is also stopped, so
+                # any batch it is part way through recording is included.
+
+                if self._deferred_recorder is not None:
+                    if shutdown:
+                        self._deferred_recorder.shutdown()
+                    else:
+                        self._deferred_recorder.flush()
 
                 with self._stats_lock:
+                    transaction_count = self._transaction_count
+
                     self._transaction_count = 0
 
                     self._last_transaction = 0.0
 
                     stats = self._stats_engine.harvest_snapshot(flexible)
 
+                # Fold any data accumulated in stats engine shards into the
+                # snapshot. This is done without holding the lock for the
+                # main stats engine so that threads recording transactions
+                # are not blocked while the shards are being merged.
+
+                if self._stats_shards is not None:
+                    transaction_count += self._stats_shards.harvest(stats, flexible)
+
                 if not flexible:
                     with self._stats_custom_lock:
                         global_events_account = self._global_events_account
@@ -1133,6 +1327,51 @@ class Application(object):
                                 data_sampler.name,
                             )
 
+                    # Record how many transactions were recorded by the
+                    # deferred recorder and how many were dropped due to
+                    # the queue being full.
+
+                    if self._deferred_recorder is not None:
+                        recorded, dropped = self._deferred_recorder.stats()
+
+                        internal_count_metric("Supportability/Python/DeferredRecording/Recorded", recorded)
+                        internal_count_metric("Supportability/Python/DeferredRecording/Dropped", dropped)
+
+                    # Report how effective the caches of normalized names
+                    # held by the rules engines have been.
+
+                    for rule_type in ("url", "transaction", "metric"):
+                        rules_engine = self._rules_engine[rule_type]
+
+                        if rules_engine.rules:
+                            hits, misses = rules_engine.cache_stats()
+
+                            internal_count_metric(
+                                "Supportability/Python/RulesEngine/%s/Cache/Hits" % rule_type.capitalize(), hits
+                            )
+                            internal_count_metric(
+                                "Supportability/Python/RulesEngine/%s/Cache/Misses" % rule_type.capitalize(), misses
+                            )
+
+                    # Report how effective the cache of destinations for
+                    # attribute names held by the attribute filter has been.
+
+                    if configuration.attribute_filter is not None:
+                        hits, misses, evictions = configuration.attribute_filter.cache_stats()
+
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Hits", hits)
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Misses", misses)
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Evictions", evictions)
+
+                    # Report how effective the cache of parsed and obfuscated
+                    # SQL statements has been.
+
+                    hits, misses, evictions = sql_statement_cache_stats()
+
+                    internal_count_metric("Supportability/Python/SQLStatement/Cache/Hits", hits)
+                    internal_count_metric("Supportability/Python/SQLStatement/Cache/Misses", misses)
+                    internal_count_metric("Supportability/Python/SQLStatement/Cache/Evictions", evictions)
+
                     # Add a metric we can use to track how many harvest
                     # periods have occurred.
 
@@ -1146,6 +1385,25 @@ class Application(object):
                             internal_count_metric("Supportability/Python/Uninstrumented", 1)
                             internal_count_metric("Supportability/Uninstrumented/%s" % uninstrumented, 1)
 
+                    # Report the time spent running the import hooks for
+                    # modules imported since the last harvest, which is the
+                    # overhead instrumentation adds to importing them.
+
+                    import_hook_total = 0.0
+
+                    for name, duration in import_hook_durations().items():
+                        import_hook_total += duration
+                        internal_metric("Supportability/Python/ImportHook/%s" % name, duration)
+
+                    if import_hook_total:
+                        internal_metric("Supportability/Python/ImportHook/all", import_hook_total)
+
+                    # When the startup profiler is enabled, report the time
+                    # taken by each category of startup phase.
+
+                    for category, duration in startup_profile_metrics().items():
+                        internal_metric("Supportability/Python/Startup/%s" % category, duration)
+
                 # Create our time stamp as to when this reporting period
                 # ends and start reporting the data.
 
@@ -1168,159 +1426,203 @@ class Application(object):
                         period_end = self._period_start + 1.001
 
                 try:
-                    # Send the transaction and custom metric data.
-
-                    # Send data set for analytics, which is Synthetic analytic
-                    # events, and the sampled data set of regular requests sent
-                    # as separate requests.
-
-                    synthetics_events = stats.synthetics_events
-                    if synthetics_events:
-                        if synthetics_events.num_samples:
-                            _logger.debug("Sending synthetics event data for harvest of %r.", self._app_name)
-
-                            self._active_session.send_transaction_events(
-                                synthetics_events.sampling_info, synthetics_events
-                            )
+                    # Send any data which was spooled to disk while the
+                    # data collector could not be reached, before sending
+                    # the data for this harvest.
 
-                        stats.reset_synthetics_events()
+                    self._active_session.replay_spool()
 
-                    if configuration.collect_analytics_events and configuration.transaction_events.enabled:
-
-                        transaction_events = stats.transaction_events
-
-                        if transaction_events:
-                            # As per spec
-                            internal_metric(
-                                "Supportability/Python/RequestSampler/requests", transaction_events.num_seen
-                            )
-                            internal_metric(
-                                "Supportability/Python/RequestSampler/samples", transaction_events.num_samples
-                            )
-
-                            if transaction_events.num_samples:
-                                _logger.debug("Sending analytics event data for harvest of %r.", self._app_name)
-
-                                self._active_session.send_transaction_events(
-                                    transaction_events.sampling_info, transaction_events
+                    # Send the transaction and custom metric data.
+                    #
+                    # When concurrent harvest is enabled, the payloads other
+                    # than the metric data are sent on the upload pool and
+                    # are all waited on before the metric data is sent, with
+                    # the data for each reset only once it has been sent.
+
+                    with HarvestUploads(self._harvest_upload_pool, internal_metrics) as uploads:
+                        # Send data set for analytics, which is Synthetic analytic
+                        # events, and the sampled data set of regular requests sent
+                        # as separate requests.
+
+                        synthetics_events = stats.synthetics_events
+                        if synthetics_events:
+                            if synthetics_events.num_samples:
+                                _logger.debug("Sending synthetics event data for harvest of %r.", self._app_name)
+
+                                uploads.send(
+                                    self._active_session.send_transaction_events,
+                                    (synthetics_events.sampling_info, synthetics_events),
+                                    stats.reset_synthetics_events,
                                 )
+                            else:
+                                stats.reset_synthetics_events()
 
-                            stats.reset_transaction_events()
-
-                    # Send span events
+                        if configuration.collect_analytics_events and configuration.transaction_events.enabled:
 
-                    if (
-                        configuration.span_events.enabled
-                        and configuration.collect_span_events
-                        and configuration.distributed_tracing.enabled
-                    ):
-                        if configuration.infinite_tracing.enabled:
-                            span_stream = stats.span_stream
-                            # Only merge stats as part of default harvest
-                            if span_stream and not flexible:
-                                spans_seen, spans_dropped = span_stream.stats()
-                                spans_sent = spans_seen - spans_dropped
+                            transaction_events = stats.transaction_events
 
-                                internal_count_metric("Supportability/InfiniteTracing/Span/Seen", spans_seen)
-                                internal_count_metric("Supportability/InfiniteTracing/Span/Sent", spans_sent)
-                        else:
-                            spans = stats.span_events
-                            if spans:
-                                if spans.num_samples > 0:
-                                    span_samples = list(spans)
+                            if transaction_events:
+                                # As per spec
+                                internal_metric(
+                                    "Supportability/Python/RequestSampler/requests", transaction_events.num_seen
+                                )
+                                internal_metric(
+                                    "Supportability/Python/RequestSampler/samples", transaction_events.num_samples
+                                )
 
-                                    _logger.debug("Sending span event data for harvest of %r.", self._app_name)
+                                if transaction_events.num_samples:
+                                    _logger.debug("Sending analytics event data for harvest of %r.", self._app_name)
 
-                                    self._active_session.send_span_events(spans.sampling_info, span_samples)
-                                    span_samples = None
+                                    uploads.send(
+                                        self._active_session.send_transaction_events,
+                                        (transaction_events.sampling_info, transaction_events),
+                                        stats.reset_transaction_events,
+                                    )
+                                else:
+                                    stats.reset_transaction_events()
+
+                        # Send span events
+
+                        if (
+                            configuration.span_events.enabled
+                            and configuration.collect_span_events
+                            and configuration.distributed_tracing.enabled
+                        ):
+                            if configuration.infinite_tracing.enabled:
+                                span_stream = stats.span_stream
+                                # Only merge stats as part of default harvest
+                                if span_stream and not flexible:
+                                    spans_seen, spans_dropped = span_stream.stats()
+                                    spans_sent = spans_seen - spans_dropped
+
+                                    internal_count_metric("Supportability/InfiniteTracing/Span/Seen", spans_seen)
+                                    internal_count_metric("Supportability/InfiniteTracing/Span/Sent", spans_sent)
+                            else:
+                                spans = stats.span_events
+                                if spans:
+                                    if spans.num_samples > 0:
+                                        span_samples = list(spans)
+
+                                        _logger.debug("Sending span event data for harvest of %r.", self._app_name)
+
+                                        uploads.send(
+                                            self._active_session.send_span_events,
+                                            (spans.sampling_info, span_samples),
+                                            stats.reset_span_events,
+                                        )
+                                        span_samples = None
+                                    else:
+                                        stats.reset_span_events()
+
+                                    # As per spec
+                                    spans_seen = spans.num_seen
+                                    spans_sampled = spans.num_samples
+                                    internal_count_metric("Supportability/SpanEvent/TotalEventsSeen", spans_seen)
+                                    internal_count_metric("Supportability/SpanEvent/TotalEventsSent", spans_sampled)
+
+                        # Send error events
+
+                        if (
+                            configuration.collect_error_events
+                            and configuration.error_collector.capture_events
+                            and configuration.error_collector.enabled
+                        ):
+
+                            error_events = stats.error_events
+                            if error_events:
+                                num_error_samples = error_events.num_samples
+                                if num_error_samples > 0:
+                                    error_event_samples = list(error_events)
+
+                                    _logger.debug("Sending error event data for harvest of %r.", self._app_name)
+
+                                    samp_info = error_events.sampling_info
+                                    uploads.send(
+                                        self._active_session.send_error_events,
+                                        (samp_info, error_event_samples),
+                                        stats.reset_error_events,
+                                    )
+                                    error_event_samples = None
+                                else:
+                                    stats.reset_error_events()
 
                                 # As per spec
-                                spans_seen = spans.num_seen
-                                spans_sampled = spans.num_samples
-                                internal_count_metric("Supportability/SpanEvent/TotalEventsSeen", spans_seen)
-                                internal_count_metric("Supportability/SpanEvent/TotalEventsSent", spans_sampled)
+                                internal_count_metric(
+                                    "Supportability/Events/TransactionError/Seen", error_events.num_seen
+                                )
+                                internal_count_metric(
+                                    "Supportability/Events/TransactionError/Sent", num_error_samples
+                                )
 
-                                stats.reset_span_events()
+                        # Send custom events
 
-                    # Send error events
+                        if configuration.collect_custom_events and configuration.custom_insights_events.enabled:
 
-                    if (
-                        configuration.collect_error_events
-                        and configuration.error_collector.capture_events
-                        and configuration.error_collector.enabled
-                    ):
+                            customs = stats.custom_events
 
-                        error_events = stats.error_events
-                        if error_events:
-                            num_error_samples = error_events.num_samples
-                            if num_error_samples > 0:
-                                error_event_samples = list(error_events)
+                            if customs:
+                                if customs.num_samples > 0:
+                                    custom_samples = list(customs)
 
-                                _logger.debug("Sending error event data for harvest of %r.", self._app_name)
+                                    _logger.debug("Sending custom event data for harvest of %r.", self._app_name)
 
-                                samp_info = error_events.sampling_info
-                                self._active_session.send_error_events(samp_info, error_event_samples)
-                                error_event_samples = None
+                                    uploads.send(
+                                        self._active_session.send_custom_events,
+                                        (customs.sampling_info, custom_samples),
+                                        stats.reset_custom_events,
+                                    )
+                                    custom_samples = None
+                                else:
+                                    stats.reset_custom_events()
 
-                            # As per spec
-                            internal_count_metric("Supportability/Events/TransactionError/Seen", error_events.num_seen)
-                            internal_count_metric("Supportability/Events/TransactionError/Sent", num_error_samples)
+                                # As per spec
+                                internal_count_metric("Supportability/Events/Customer/Seen", customs.num_seen)
+                                internal_count_metric("Supportability/Events/Customer/Sent", customs.num_samples)
 
-                            stats.reset_error_events()
+                        # Send the accumulated error data.
 
-                    # Send custom events
+                        if configuration.collect_errors:
+                            error_data = stats.error_data()
 
-                    if configuration.collect_custom_events and configuration.custom_insights_events.enabled:
+                            if error_data:
+                                _logger.debug("Sending error data for harvest of %r.", self._app_name)
 
-                        customs = stats.custom_events
+                                uploads.send(self._active_session.send_errors, (error_data,))
 
-                        if customs:
-                            if customs.num_samples > 0:
-                                custom_samples = list(customs)
+                        if not flexible:
+                            if configuration.collect_traces:
+                                explain_plan_executor = self._explain_plan_executor
 
-                                _logger.debug("Sending custom event data for harvest of %r.", self._app_name)
+                                if explain_plan_executor is not None:
+                                    connections = explain_plan_executor.harvest(
+                                        configuration.async_explain_plans.harvest_time_budget
+                                    )
+                                else:
+                                    connections = SQLConnections(configuration.agent_limits.max_sql_connections)
 
-                                self._active_session.send_custom_events(customs.sampling_info, custom_samples)
-                                custom_samples = None
+                                with connections:
+                                    if configuration.slow_sql.enabled:
+                                        _logger.debug("Processing slow SQL data for harvest of %r.", self._app_name)
 
-                            # As per spec
-                            internal_count_metric("Supportability/Events/Customer/Seen", customs.num_seen)
-                            internal_count_metric("Supportability/Events/Customer/Sent", customs.num_samples)
+                                        slow_sql_data = stats.slow_sql_data(connections)
 
-                            stats.reset_custom_events()
+                                        if slow_sql_data:
+                                            _logger.debug("Sending slow SQL data for harvest of %r.", self._app_name)
 
-                    # Send the accumulated error data.
+                                            uploads.send(self._active_session.send_sql_traces, (slow_sql_data,))
 
-                    if configuration.collect_errors:
-                        error_data = stats.error_data()
+                                    slow_transaction_data = stats.transaction_trace_data(connections)
 
-                        if error_data:
-                            _logger.debug("Sending error data for harvest of %r.", self._app_name)
+                                    if slow_transaction_data:
+                                        _logger.debug(
+                                            "Sending slow transaction data for harvest of %r.", self._app_name
+                                        )
 
-                            self._active_session.send_errors(error_data)
+                                        uploads.send(
+                                            self._active_session.send_transaction_traces, (slow_transaction_data,)
+                                        )
 
                     if not flexible:
-                        if configuration.collect_traces:
-                            connections = SQLConnections(configuration.agent_limits.max_sql_connections)
-
-                            with connections:
-                                if configuration.slow_sql.enabled:
-                                    _logger.debug("Processing slow SQL data for harvest of %r.", self._app_name)
-
-                                    slow_sql_data = stats.slow_sql_data(connections)
-
-                                    if slow_sql_data:
-                                        _logger.debug("Sending slow SQL data for harvest of %r.", self._app_name)
-
-                                        self._active_session.send_sql_traces(slow_sql_data)
-
-                                slow_transaction_data = stats.transaction_trace_data(connections)
-
-                                if slow_transaction_data:
-                                    _logger.debug("Sending slow transaction data for harvest of %r.", self._app_name)
-
-                                    self._active_session.send_transaction_traces(slow_transaction_data)
-
                         # Create a metric_normalizer based on normalize_name
                         # If metric rename rules are empty, set normalizer
                         # to None and the stats engine will skip steps as
@@ -1517,6 +1819,24 @@ class Application(object):
 
         self.stop_data_samplers()
 
+        # Stop the background thread used for deferred recording. Any
+        # transactions still queued at this point are recorded, but will
+        # only be reported if there is a further harvest.
+
+        if self._deferred_recorder is not None:
+            self._deferred_recorder.shutdown()
+            self._deferred_recorder = None
+
+        # Stop the background threads used for running explain plans.
+
+        if self._explain_plan_executor is not None:
+            self._explain_plan_executor.shutdown()
+            self._explain_plan_executor = None
+
+        if self._harvest_upload_pool is not None:
+            self._harvest_upload_pool.shutdown()
+            self._harvest_upload_pool = None
+
         # Now shutdown the actual agent session.
 
         try:
@@ -67,6 +67,8 @@ _TRANSACTION_EVENT_DEFAULT_ATTRIBUTES = set((
         'db.instance',
         'db.operation',
         'db.statement',
+        'db.redis.pipeline.commands',
+        'db.redis.pipeline.operations',
         'error.class',
         'error.message',
         'error.expected',
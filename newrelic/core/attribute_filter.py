@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+
 # Attribute "destinations" represented as bitfields.
 
 DST_NONE = 0x0
@@ -57,12 +59,48 @@ class AttributeFilter(object):
     #      the bitfield.
     #
     #   4. Return the resulting bitfield after all rules have been applied.
+    #
+    # As only the rules whose name is a prefix of the attribute name can
+    # match, rules are indexed by name, along with the set of distinct rule
+    # name lengths, so that only the rules which can match an attribute
+    # are looked up, rather than traversing every rule.
+    #
+    # The result for each attribute name and default destinations is
+    # cached. As attribute names can be dynamic, the cache is bounded and
+    # once full, entries are evicted using the CLOCK algorithm. A hit only
+    # marks the entry as referenced, so needs no lock. Only adding an entry
+    # on a miss is done while holding a lock.
 
     def __init__(self, flattened_settings):
 
         self.enabled_destinations = self._set_enabled_destinations(flattened_settings)
         self.rules = self._build_rules(flattened_settings)
+        self.rules_index, self.rule_name_lengths = self._build_rules_index(self.rules)
+
         self.cache = {}
+        self.cache_size = flattened_settings.get(
+                'agent_limits.attribute_filter_cache_size', 1000)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+        self._cache_lock = threading.Lock()
+        self._clock = []
+        self._clock_hand = 0
+
+    def __getstate__(self):
+
+        # Settings objects holding the attribute filter can be copied, so
+        # the lock protecting the cache must be dropped from the state and
+        # recreated when the state is restored.
+
+        state = self.__dict__.copy()
+        del state['_cache_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
 
     def __repr__(self):
         return "<AttributeFilter: destinations: %s, rules: %s>" % (
@@ -135,28 +173,99 @@ class AttributeFilter(object):
 
         return tuple(rules)
 
+    def _build_rules_index(self, rules):
+
+        # Index the sorted rules by name. Rules sort lexicographically by
+        # name and any prefix of an attribute name sorts before a longer
+        # prefix, so visiting the prefixes of an attribute name from the
+        # shortest to the longest visits the matching rules in sorted order.
+
+        rules_index = {}
+
+        for rule in rules:
+            rules_index.setdefault(rule.name, []).append(rule)
+
+        rule_name_lengths = tuple(sorted(set(len(name) for name in rules_index)))
+
+        return rules_index, rule_name_lengths
+
+    def cache_stats(self):
+
+        # Returns the number of cache hits, misses and evictions since this
+        # was last called. Hits are counted without holding the lock so the
+        # count is only approximate when there is contention.
+
+        with self._cache_lock:
+            stats = (self.cache_hits, self.cache_misses, self.cache_evictions)
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_evictions = 0
+
+        return stats
+
     def apply(self, name, default_destinations):
         if self.enabled_destinations == DST_NONE:
             return DST_NONE
 
         cache_index = (name, default_destinations)
 
-        if cache_index in self.cache:
-            return self.cache[cache_index]
+        entry = self.cache.get(cache_index)
+
+        if entry is not None:
+            entry[1] = True
+            self.cache_hits += 1
+            return entry[0]
 
         destinations = self.enabled_destinations & default_destinations
 
-        for rule in self.rules:
-            if rule.name_match(name):
-                if rule.is_include:
-                    inc_dest = rule.destinations & self.enabled_destinations
-                    destinations |= inc_dest
-                else:
-                    destinations &= ~rule.destinations
+        for length in self.rule_name_lengths:
+            if length > len(name):
+                break
+
+            for rule in self.rules_index.get(name[:length], ()):
+                if rule.is_wildcard or length == len(name):
+                    if rule.is_include:
+                        inc_dest = rule.destinations & self.enabled_destinations
+                        destinations |= inc_dest
+                    else:
+                        destinations &= ~rule.destinations
+
+        if self.cache_size > 0:
+            self._cache_add(cache_index, destinations)
 
-        self.cache[cache_index] = destinations
         return destinations
 
+    def _cache_add(self, cache_index, destinations):
+        with self._cache_lock:
+            self.cache_misses += 1
+
+            if cache_index in self.cache:
+                return
+
+            clock = self._clock
+
+            if len(clock) < self.cache_size:
+                clock.append(cache_index)
+
+            else:
+                # Advance the clock hand, giving referenced entries a
+                # second chance, until an entry which has not been
+                # referenced since the hand last passed is found.
+
+                while True:
+                    evicted = self.cache[clock[self._clock_hand]]
+                    if not evicted[1]:
+                        break
+                    evicted[1] = False
+                    self._clock_hand = (self._clock_hand + 1) % len(clock)
+
+                del self.cache[clock[self._clock_hand]]
+                clock[self._clock_hand] = cache_index
+                self._clock_hand = (self._clock_hand + 1) % len(clock)
+                self.cache_evictions += 1
+
+            self.cache[cache_index] = [destinations, False]
+
 class AttributeFilterRule(object):
 
     def __init__(self, name, destinations, is_include):
@@ -14,7 +14,9 @@
 
 import functools
 import inspect
-from collections import namedtuple
+import sys
+import threading
+from collections import OrderedDict, namedtuple
 
 from newrelic.common.object_names import object_context
 
@@ -37,26 +39,122 @@ class CodeLevelMetricsNode(_CodeLevelMetricsNode):
                 add_attr_function("code.%s" % k, v)
 
 
-def extract_code_from_callable(func):
-    """Extract source code context from a callable and add appropriate attributes."""
-    original_func = func  # Save original reference
+class SourceCodeCache(object):
+    """Holds the source code context extracted for the most recently used
+    callables, bounded by the number of entries and evicting the least
+    recently used first. Entries are keyed on the code object or type
+    underlying a callable, rather than on the callable itself, so callables
+    such as bound methods or instances of classes with __slots__, which
+    can't hold an attribute caching the result, are covered as well.
 
-    if hasattr(func, "_nr_source_code"):
-        return func._nr_source_code
+    """
 
-    # Fully unwrap object
-    while (hasattr(func, "__wrapped__") and func.__wrapped__ is not None) or isinstance(func, functools.partial):
-        # Remove Partials
-        if isinstance(func, functools.partial):
-            func = func.func
-        # Unwrap wrapped objects
-        else:
-            if func.__wrapped__ == func:
-                # Infinite loop protection
-                break
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
 
-            func = func.__wrapped__
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        with self._lock:
+            node = self._cache.pop(key, None)
+            if node is not None:
+                self._cache[key] = node
+            return node
+
+    def add(self, key, node, max_size):
+        if max_size <= 0:
+            return
+
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = node
+
+            while len(self._cache) > max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_source_code_cache = SourceCodeCache()
+
+
+def _source_code_cache_key(func):
+    """Returns the key for the source code context of an unwrapped callable,
+    identifying everything the context is derived from, or None where the
+    context is not worth caching.
+
+    """
+
+    if inspect.isbuiltin(func):
+        # The context for builtins doesn't depend on source files, and
+        # bound builtin methods are created anew on each access.
+        return None
+
+    if inspect.ismethod(func):
+        owner = func.__self__
+        if not inspect.isclass(owner):
+            owner = type(owner)
+        return ("method", getattr(func.__func__, "__code__", func.__func__), owner, func.__name__)
+
+    code = getattr(func, "__code__", None)
+
+    if code is not None:
+        return ("function", code, getattr(func, "__module__", None), getattr(func, "__qualname__", None))
+
+    if inspect.isclass(func):
+        return ("class", func)
+
+    return ("instance", type(func))
+
+
+def _module_file(obj):
+    module = sys.modules.get(getattr(obj, "__module__", None))
+    file_path = getattr(module, "__file__", None)
+
+    if file_path and file_path.endswith((".pyc", ".pyo")):
+        file_path = file_path[:-1]
+
+    return file_path
+
+
+def _class_first_line(cls):
+    """Returns the line a class is defined on without reading its source
+    file. Where the class does not record the line itself, it is taken to
+    be the line before the first function defined in the class body, which
+    for most classes is the class statement. None is returned where there
+    is no such function.
+
+    """
 
+    line_number = getattr(cls, "__firstlineno__", None)
+
+    if line_number is not None:
+        return line_number
+
+    prefix = "%s." % getattr(cls, "__qualname__", cls.__name__)
+    line_numbers = []
+
+    for value in vars(cls).values():
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        elif isinstance(value, property):
+            value = value.fget
+
+        code = getattr(value, "__code__", None)
+
+        # Functions assigned from elsewhere aren't in the class body.
+        if code is not None and getattr(value, "__qualname__", "").startswith(prefix):
+            line_numbers.append(code.co_firstlineno)
+
+    if line_numbers:
+        return min(line_numbers) - 1
+
+
+def _extract_code_from_unwrapped_callable(func):
     # Retrieve basic object details
     module_name, func_path = object_context(func)
 
@@ -82,15 +180,21 @@ def extract_code_from_callable(func):
             # Extract class from object instances
             func = func.__class__
 
-        # Initialize here instead of in except to potentially get file_path but not line_number
-        file_path = None
-        line_number = None
-        try:
-            # Use inspect to get file and line number
-            file_path = inspect.getsourcefile(func)
-            line_number = inspect.getsourcelines(func)[1]
-        except TypeError:
-            pass
+        code = getattr(func, "__code__", None)
+
+        if code is not None:
+            # Where the __call__ method is a Python function the details
+            # can be taken from its code object without reading the source
+            # file from disk.
+            file_path = code.co_filename
+            line_number = code.co_firstlineno
+        else:
+            # Reading the source file to find where a class is defined is
+            # not done, as this would be on the request path. The file is
+            # taken from the module the class is defined in, and the line
+            # number from the functions defined in the class body.
+            file_path = _module_file(func)
+            line_number = _class_first_line(func) if inspect.isclass(func) else None
 
     # Split function path to extract class name
     func_path = func_path.split(".")
@@ -101,20 +205,45 @@ def extract_code_from_callable(func):
     else:
         namespace = module_name
 
-    node = CodeLevelMetricsNode(
+    return CodeLevelMetricsNode(
         filepath=file_path,
         function=func_name,
         lineno=line_number,
         namespace=namespace,
     )
 
-    try:
-        if hasattr(original_func, "__func__"):
-            # Must store on underlying function not bound method
-            original_func = original_func.__func__
-        original_func._nr_source_code = node
-    except Exception:  # Don't raise exceptions for any reason
-        pass
+
+def extract_code_from_callable(func, cache_size=1000):
+    """Extract source code context from a callable and add appropriate attributes."""
+
+    # Fully unwrap object
+    while (hasattr(func, "__wrapped__") and func.__wrapped__ is not None) or isinstance(func, functools.partial):
+        # Remove Partials
+        if isinstance(func, functools.partial):
+            func = func.func
+        # Unwrap wrapped objects
+        else:
+            if func.__wrapped__ == func:
+                # Infinite loop protection
+                break
+
+            func = func.__wrapped__
+
+    node = None
+    key = _source_code_cache_key(func)
+
+    if key is not None:
+        try:
+            node = _source_code_cache.get(key)
+        except TypeError:
+            # The key includes an object which isn't hashable.
+            key = None
+
+    if node is None:
+        node = _extract_code_from_unwrapped_callable(func)
+
+        if key is not None:
+            _source_code_cache.add(key, node, cache_size)
 
     return node
 
@@ -316,6 +316,26 @@ class InfiniteTracingSettings(Settings):
         return True
 
 
+class StatsShardingSettings(Settings):
+    pass
+
+
+class DeferredRecordingSettings(Settings):
+    pass
+
+
+class AsyncExplainPlansSettings(Settings):
+    pass
+
+
+class ConcurrentHarvestSettings(Settings):
+    pass
+
+
+class HarvestSpoolSettings(Settings):
+    pass
+
+
 class EventHarvestConfigSettings(Settings):
     nested = True
     _lock = threading.Lock()
@@ -375,6 +395,11 @@ _settings.transaction_segments.attributes = TransactionSegmentAttributesSettings
 _settings.distributed_tracing = DistributedTracingSettings()
 _settings.serverless_mode = ServerlessModeSettings()
 _settings.infinite_tracing = InfiniteTracingSettings()
+_settings.stats_sharding = StatsShardingSettings()
+_settings.deferred_recording = DeferredRecordingSettings()
+_settings.async_explain_plans = AsyncExplainPlansSettings()
+_settings.concurrent_harvest = ConcurrentHarvestSettings()
+_settings.harvest_spool = HarvestSpoolSettings()
 _settings.event_harvest_config = EventHarvestConfigSettings()
 _settings.event_harvest_config.harvest_limits = EventHarvestConfigHarvestLimitSettings()
 
@@ -617,6 +642,7 @@ _settings.sampling_target = 10
 _settings.sampling_target_period_in_seconds = 60
 
 _settings.compressed_content_encoding = "gzip"
+_settings.json_encoder = os.environ.get("NEW_RELIC_JSON_ENCODER", "stdlib")
 _settings.max_payload_size_in_bytes = 1000000
 
 _settings.attributes.enabled = True
@@ -642,6 +668,9 @@ _settings.span_events.enabled = _environ_as_bool("NEW_RELIC_SPAN_EVENTS_ENABLED"
 _settings.span_events.attributes.enabled = True
 _settings.span_events.attributes.exclude = []
 _settings.span_events.attributes.include = []
+_settings.span_events.lazy_materialization = _environ_as_bool(
+    "NEW_RELIC_SPAN_EVENTS_LAZY_MATERIALIZATION", default=False
+)
 
 _settings.transaction_segments.attributes.enabled = True
 _settings.transaction_segments.attributes.exclude = []
@@ -706,11 +735,39 @@ _settings.agent_limits.synthetics_events = 200
 _settings.agent_limits.synthetics_transactions = 20
 _settings.agent_limits.data_compression_threshold = 64 * 1024
 _settings.agent_limits.data_compression_level = None
+_settings.agent_limits.normalization_cache_size = 1000
+_settings.agent_limits.attribute_filter_cache_size = 1000
+_settings.agent_limits.sql_statement_cache_bytes = 4 * 1024 * 1024
+_settings.agent_limits.code_level_metrics_cache_size = 1000
 
 _settings.infinite_tracing.trace_observer_host = os.environ.get("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_HOST", None)
 _settings.infinite_tracing.trace_observer_port = _environ_as_int("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_PORT", 443)
 _settings.infinite_tracing.ssl = True
 _settings.infinite_tracing.span_queue_size = _environ_as_int("NEW_RELIC_INFINITE_TRACING_SPAN_QUEUE_SIZE", 10000)
+_settings.infinite_tracing.batching = _environ_as_bool("NEW_RELIC_INFINITE_TRACING_BATCHING", default=False)
+_settings.infinite_tracing.batch_size = _environ_as_int("NEW_RELIC_INFINITE_TRACING_BATCH_SIZE", 100)
+_settings.infinite_tracing.batch_max_bytes = _environ_as_int("NEW_RELIC_INFINITE_TRACING_BATCH_MAX_BYTES", 1024 * 1024)
+
+_settings.stats_sharding.enabled = _environ_as_bool("NEW_RELIC_STATS_SHARDING_ENABLED", default=False)
+_settings.stats_sharding.shard_count = _environ_as_int("NEW_RELIC_STATS_SHARDING_SHARD_COUNT", 16)
+
+_settings.deferred_recording.enabled = _environ_as_bool("NEW_RELIC_DEFERRED_RECORDING_ENABLED", default=False)
+_settings.deferred_recording.queue_size = _environ_as_int("NEW_RELIC_DEFERRED_RECORDING_QUEUE_SIZE", 1000)
+_settings.deferred_recording.batch_size = 50
+
+_settings.async_explain_plans.enabled = _environ_as_bool("NEW_RELIC_ASYNC_EXPLAIN_PLANS_ENABLED", default=False)
+_settings.async_explain_plans.worker_count = 2
+_settings.async_explain_plans.database_concurrency = 1
+_settings.async_explain_plans.cache_ttl = 600.0
+_settings.async_explain_plans.harvest_time_budget = 2.0
+
+_settings.concurrent_harvest.enabled = _environ_as_bool("NEW_RELIC_CONCURRENT_HARVEST_ENABLED", default=False)
+_settings.concurrent_harvest.max_workers = _environ_as_int("NEW_RELIC_CONCURRENT_HARVEST_MAX_WORKERS", 4)
+
+_settings.harvest_spool.enabled = _environ_as_bool("NEW_RELIC_HARVEST_SPOOL_ENABLED", default=False)
+_settings.harvest_spool.directory = os.environ.get("NEW_RELIC_HARVEST_SPOOL_DIRECTORY", None)
+_settings.harvest_spool.max_bytes = _environ_as_int("NEW_RELIC_HARVEST_SPOOL_MAX_BYTES", 50 * 1024 * 1024)
+_settings.harvest_spool.replay_limit = 10
 
 _settings.event_harvest_config.harvest_limits.analytic_event_data = _environ_as_int(
     "NEW_RELIC_ANALYTICS_EVENTS_MAX_SAMPLES_STORED", DEFAULT_RESERVOIR_SIZE
@@ -28,6 +28,7 @@ from newrelic.common.agent_http import (
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.core.config import global_settings
+from newrelic.network.exceptions import RetryDataForRequest
 
 _logger = logging.getLogger(__name__)
 
@@ -42,6 +43,11 @@ class Session(object):
         )
         self._rpc = None
 
+        # Spool to which data is written when the data collector cannot
+        # be reached. Attached by the application when enabled.
+
+        self.spool = None
+
     @property
     def configuration(self):
         return self._protocol.configuration
@@ -75,7 +81,14 @@ class Session(object):
                 )
 
                 rpc = self._rpc = StreamingRpc(
-                    endpoint, span_iterator, metadata, record_metric, ssl=ssl
+                    endpoint,
+                    span_iterator,
+                    metadata,
+                    record_metric,
+                    ssl=ssl,
+                    batching=self.configuration.infinite_tracing.batching,
+                    batch_size=self.configuration.infinite_tracing.batch_size,
+                    batch_max_bytes=self.configuration.infinite_tracing.batch_max_bytes,
                 )
                 rpc.connect()
                 return rpc
@@ -84,6 +97,38 @@ class Session(object):
         if self._rpc:
             self._rpc.close()
 
+    def _send_data(self, method, payload):
+        spool = self.spool
+
+        if spool is None:
+            return self._protocol.send(method, payload)
+
+        # While the data collector cannot be reached the data is written
+        # straight to the spool, rather than it being retained in memory
+        # to be retried on the next harvest. The data is only retained in
+        # memory if it could not be spooled.
+
+        if not spool.offline:
+            try:
+                return self._protocol.send(method, payload)
+            except RetryDataForRequest:
+                spool.offline = True
+                if not spool.spool(method, payload):
+                    raise
+                return None
+
+        if not spool.spool(method, payload):
+            raise RetryDataForRequest("Unable to spool %s data." % method)
+
+    def replay_spool(self):
+        """Called at the start of a harvest to send data which was
+        spooled while the data collector could not be reached.
+
+        """
+
+        if self.spool is not None:
+            self.spool.replay(self._protocol.send, self.agent_run_id)
+
     def send_transaction_traces(self, transaction_traces):
         """Called to submit transaction traces. The transaction traces
         should be an iterable of individual traces.
@@ -98,25 +143,25 @@ class Session(object):
             return
 
         payload = (self.agent_run_id, transaction_traces)
-        return self._protocol.send("transaction_sample_data", payload)
+        return self._send_data("transaction_sample_data", payload)
 
     def send_transaction_events(self, sampling_info, sample_set):
         """Called to submit sample set for analytics."""
 
         payload = (self.agent_run_id, sampling_info, sample_set)
-        return self._protocol.send("analytic_event_data", payload)
+        return self._send_data("analytic_event_data", payload)
 
     def send_custom_events(self, sampling_info, custom_event_data):
         """Called to submit sample set for custom events."""
 
         payload = (self.agent_run_id, sampling_info, custom_event_data)
-        return self._protocol.send("custom_event_data", payload)
+        return self._send_data("custom_event_data", payload)
 
     def send_span_events(self, sampling_info, span_event_data):
         """Called to submit sample set for span events."""
 
         payload = (self.agent_run_id, sampling_info, span_event_data)
-        return self._protocol.send("span_event_data", payload)
+        return self._send_data("span_event_data", payload)
 
     def send_metric_data(self, start_time, end_time, metric_data):
         """Called to submit metric data for specified period of time.
@@ -126,7 +171,7 @@ class Session(object):
         """
 
         payload = (self.agent_run_id, start_time, end_time, metric_data)
-        return self._protocol.send("metric_data", payload)
+        return self._send_data("metric_data", payload)
 
     def get_agent_commands(self):
         """Receive agent commands from the data collector.
@@ -146,13 +191,13 @@ class Session(object):
 
         """
         payload = (self.agent_run_id, errors)
-        return self._protocol.send("error_data", payload)
+        return self._send_data("error_data", payload)
 
     def send_error_events(self, sampling_info, error_data):
         """Called to submit sample set for error events."""
 
         payload = (self.agent_run_id, sampling_info, error_data)
-        return self._protocol.send("error_event_data", payload)
+        return self._send_data("error_event_data", payload)
 
     def send_sql_traces(self, sql_traces):
         """Called to sub SQL traces. The SQL traces should be an
@@ -164,7 +209,7 @@ class Session(object):
         """
 
         payload = (sql_traces,)
-        return self._protocol.send("sql_trace_data", payload)
+        return self._send_data("sql_trace_data", payload)
 
     def send_agent_command_results(self, cmd_results):
         """Acknowledge the receipt of an agent command."""
@@ -19,7 +19,9 @@ explain plans for SQL etc.
 
 import logging
 import re
-import weakref
+import threading
+
+from collections import OrderedDict
 
 import newrelic.packages.six as six
 
@@ -33,37 +35,32 @@ _logger = logging.getLogger(__name__)
 # Obfuscation consists of replacing any quoted strings, integer or float
 # literals with a '?'. For quoted strings which types of quoted strings
 # should be collapsed depend on the database in use.
+#
+# Statements generated by ORMs can run to tens of kilobytes, so rather
+# than making a separate pass over the statement for the quoted strings
+# and then for each type of literal, all the token patterns for a
+# quoting style are joined into the one regular expression and the
+# statement is obfuscated in a single pass. To keep that pass cheap,
+# every token pattern starts by matching a single character from a
+# known set, which lets the regular expression engine quickly skip over
+# characters which cannot start a token. Any context a token needs on
+# its left, such as a word boundary, is checked with a look behind after
+# that first character has been matched.
 
 # See http://stackoverflow.com/questions/6718874.
 #
 # Escaping of quotes in SQL isn't like normal C style string. That is,
 # no backslash. Uses two successive instances of quote character in
 # middle of the string to indicate one embedded quote.
+#
+# The dollar quote pattern must be the only pattern with a capturing
+# group as the back reference to the dollar quote tag is by number.
 
 _single_quotes_p = r"'(?:[^']|'')*?(?:\\'.*|'(?!'))"
 _double_quotes_p = r'"(?:[^"]|"")*?(?:\\".*|"(?!"))'
-_dollar_quotes_p = r'(\$(?!\d)[^$]*?\$).*?(?:\1|$)'
-_oracle_quotes_p = (r"q'\[.*?(?:\]'|$)|q'\{.*?(?:\}'|$)|"
-        r"q'\<.*?(?:\>'|$)|q'\(.*?(?:\)'|$)")
-_any_quotes_p = _single_quotes_p + '|' + _double_quotes_p
-_single_dollar_p = _single_quotes_p + '|' + _dollar_quotes_p
-_single_oracle_p = _single_quotes_p + '|' + _oracle_quotes_p
-
-_single_quotes_re = re.compile(_single_quotes_p)
-_any_quotes_re = re.compile(_any_quotes_p)
-_single_dollar_re = re.compile(_single_dollar_p)
-_single_oracle_re = re.compile(_single_oracle_p)
-
-# Cleanup regexes. Presence of a quote will indicate that the now obfuscated
-# sql was actually malformed.
-
-_single_quotes_cleanup_p = r"'"
-_any_quotes_cleanup_p = r'\'|"'
-_single_dollar_cleanup_p = r"'|\$(?!\?)"
-
-_any_quotes_cleanup_re = re.compile(_any_quotes_cleanup_p)
-_single_quotes_cleanup_re = re.compile(_single_quotes_cleanup_p)
-_single_dollar_cleanup_re = re.compile(_single_dollar_cleanup_p)
+_dollar_quotes_p = r'\$(?!\d)([^$]*?)\$.*?(?:\$\1\$|$)'
+_oracle_quotes_p = (r"q'(?:\[.*?(?:\]'|$)|\{.*?(?:\}'|$)|"
+        r"\<.*?(?:\>'|$)|\(.*?(?:\)'|$))")
 
 # See http://www.regular-expressions.info/examplesprogrammer.html.
 #
@@ -76,38 +73,72 @@ _single_dollar_cleanup_re = re.compile(_single_dollar_cleanup_p)
 # We add one variation here in that don't want to replace a number that
 # follows on from a ':'. This is because ':1' can be used as positional
 # parameter with database adapters where 'paramstyle' is 'numeric'.
+#
+# Literals are matched without regard to case. This is spelt out in the
+# patterns rather than using the IGNORECASE flag, as that flag would
+# also apply to the 'q' prefix of Oracle quotes. UUIDs must be checked
+# for before integers to avoid partial matches on the shorter pattern.
+# The look ahead on the length of a UUID avoids working through the
+# repeated group for every hexadecimal digit in an identifier.
+
+_uuid_p = (r'\{(?=[-0-9a-fA-F]{32})(?:[0-9a-fA-F]-?){32}\}?|'
+        r'[0-9a-fA-F](?=[-0-9a-fA-F]{31})-?(?:[0-9a-fA-F]-?){31}\}?')
+_hex_p = r'0[xX][0-9a-fA-F]+'
+_int_p = (r'-(?<!:-)[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|'
+        r'[0-9](?<![\w:].)[0-9]*(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+_bool_p = (r'[tT](?<!\w.)[rR][uU][eE]%(end)s|'
+        r'[fF](?<!\w.)[aA][lL][sS][eE]%(end)s|'
+        r'[nN](?<!\w.)[uU][lL][lL]%(end)s')
+
+# Cleanup regexes. Presence of a quote will indicate that the now obfuscated
+# sql was actually malformed.
+
+_single_quotes_cleanup_p = r"'"
+_any_quotes_cleanup_p = r'\'|"'
+_single_dollar_cleanup_p = r"'|\$(?!\?)"
+
+_any_quotes_cleanup_re = re.compile(_any_quotes_cleanup_p)
+_single_quotes_cleanup_re = re.compile(_single_quotes_cleanup_p)
+_single_dollar_cleanup_re = re.compile(_single_dollar_cleanup_p)
+
+
+def _obfuscate_tokens_re(quotes_p, literal_end=r'\b'):
+    # The look ahead lists every character a token can start with. Quoted
+    # strings take precedence over the literals.
 
-_uuid_p = r'\{?(?:[0-9a-f]\-?){32}\}?'
-_int_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(e[+-]?[0-9]+)?'
-_hex_p = r'0x[0-9a-f]+'
-_bool_p = r'\b(?:true|false|null)\b'
+    return re.compile(r"(?=['\"$q{0-9a-fA-F\-tTnN])(?:%s|%s|%s|%s|%s)" % (
+            quotes_p, _uuid_p, _hex_p, _int_p,
+            _bool_p % {'end': literal_end}))
 
-# Join all literals into one compiled regular expression. Longest expressions
-# first to avoid the situation of partial matches on shorter expressions. UUIDs
-# might be an example.
 
-_all_literals_p = '(' + ')|('.join([_uuid_p, _hex_p, _int_p, _bool_p]) + ')'
-_all_literals_re = re.compile(_all_literals_p, re.IGNORECASE)
+# A boolean or null literal must be followed by a word boundary, but an
+# Oracle quoted string starts with a 'q' and is replaced before the
+# literals would have been, so a literal directly followed by one is
+# still a match.
 
 _quotes_table = {
-    'single': (_single_quotes_re, _single_quotes_cleanup_re),
-    'single+double': (_any_quotes_re, _any_quotes_cleanup_re),
-    'single+dollar': (_single_dollar_re, _single_dollar_cleanup_re),
-    'single+oracle': (_single_oracle_re, _single_quotes_cleanup_re),
+    'single': (_obfuscate_tokens_re(_single_quotes_p),
+            _single_quotes_cleanup_re),
+    'single+double': (_obfuscate_tokens_re(
+            _single_quotes_p + '|' + _double_quotes_p),
+            _any_quotes_cleanup_re),
+    'single+dollar': (_obfuscate_tokens_re(
+            _single_quotes_p + '|' + _dollar_quotes_p),
+            _single_dollar_cleanup_re),
+    'single+oracle': (_obfuscate_tokens_re(
+            _single_quotes_p + '|' + _oracle_quotes_p,
+            r'(?:\b|(?=%s))' % _oracle_quotes_p),
+            _single_quotes_cleanup_re),
 }
 
 
 def _obfuscate_sql(sql, database):
-    quotes_re, quotes_cleanup_re = _quotes_table.get(database.quoting_style,
-            (_single_quotes_re, _single_quotes_cleanup_re))
+    tokens_re, quotes_cleanup_re = _quotes_table.get(database.quoting_style,
+            _quotes_table['single'])
 
-    # Substitute quoted strings first.
+    # Substitute quoted strings and all other sensitive fields.
 
-    sql = quotes_re.sub('?', sql)
-
-    # Replace all other sensitive fields
-
-    sql = _all_literals_re.sub('?', sql)
+    sql = tokens_re.sub('?', sql)
 
     # Determine if the obfuscated query was malformed by searching for
     # remaining quote characters
@@ -138,26 +169,17 @@ def _obfuscate_sql(sql, database):
 
 _normalize_params_1_p = r'%\([^)]*\)s'
 _normalize_params_1_re = re.compile(_normalize_params_1_p)
-_normalize_params_2_p = r'%s'
+_normalize_params_2_p = r'%s|:\w+'
 _normalize_params_2_re = re.compile(_normalize_params_2_p)
-_normalize_params_3_p = r':\w+'
-_normalize_params_3_re = re.compile(_normalize_params_3_p)
 
 _normalize_values_p = r'\([^)]+\)'
 _normalize_values_re = re.compile(_normalize_values_p)
 
-_normalize_whitespace_1_p = r'\s+'
-_normalize_whitespace_1_re = re.compile(_normalize_whitespace_1_p)
-_normalize_whitespace_2_p = r'\s+(?!\w)'
-_normalize_whitespace_2_re = re.compile(_normalize_whitespace_2_p)
-_normalize_whitespace_3_p = r'(?<!\w)\s+'
-_normalize_whitespace_3_re = re.compile(_normalize_whitespace_3_p)
+_normalize_whitespace_p = r' (?:(?<!\w.)|(?!\w))'
+_normalize_whitespace_re = re.compile(_normalize_whitespace_p)
 
 
 def _normalize_sql(sql):
-    # Note we that do this as a series of regular expressions as
-    # using '|' in regular expressions is more expensive.
-
     # Convert param style of '%(name)s' to '?'. We need to do
     # this before collapsing sets of values to a single value
     # due to the use of the parenthesis in the param style.
@@ -171,21 +193,16 @@ def _normalize_sql(sql):
     # Convert '%s', ':1' and ':name' param styles to '?'.
 
     sql = _normalize_params_2_re.sub('?', sql)
-    sql = _normalize_params_3_re.sub('?', sql)
-
-    # Strip leading and trailing white space.
 
-    sql = sql.strip()
+    # Strip leading and trailing white space and collapse multiple
+    # white space to single white space.
 
-    # Collapse multiple white space to single white space.
-
-    sql = _normalize_whitespace_1_re.sub(' ', sql)
+    sql = ' '.join(sql.split())
 
     # Drop spaces adjacent to identifier except for case where
     # identifiers follow each other.
 
-    sql = _normalize_whitespace_2_re.sub('', sql)
-    sql = _normalize_whitespace_3_re.sub('', sql)
+    sql = _normalize_whitespace_re.sub('', sql)
 
     return sql
 
@@ -206,9 +223,12 @@ def _extract_identifier(token):
 
 # Helper function for removing C style comments embedded in SQL statements.
 
-_uncomment_sql_p = r'(?:#|--).*?(?=\r|\n|$)'
+# Each alternative starts with a literal character so that the regular
+# expression engine can quickly skip over text which is not a comment.
+
+_uncomment_sql_p = r'#[^\r\n]*|--[^\r\n]*'
 _uncomment_sql_q = r'\/\*(?:[^\/]|\/[^*])*?(?:\*\/|\/\*.*)'
-_uncomment_sql_x = r'(%s)|(%s)' % (_uncomment_sql_p, _uncomment_sql_q)
+_uncomment_sql_x = r'%s|%s' % (_uncomment_sql_p, _uncomment_sql_q)
 _uncomment_sql_re = re.compile(_uncomment_sql_x, re.DOTALL)
 
 
@@ -632,6 +652,11 @@ class SQLConnections(object):
 
         self.connections = []
 
+    def explain_plan(self, sql_statement, connect_params, cursor_params,
+            sql_parameters, execute_params):
+        return _explain_plan(self, sql_statement.sql, sql_statement.database,
+                connect_params, cursor_params, sql_parameters, execute_params)
+
     def __enter__(self):
         return self
 
@@ -757,8 +782,8 @@ def explain_plan(connections, sql_statement, connect_params, cursor_params,
     if sql_statement.operation not in database.explain_stmts:
         return
 
-    details = _explain_plan(connections, sql_statement.sql, database,
-            connect_params, cursor_params, sql_parameters, execute_params)
+    details = connections.explain_plan(sql_statement, connect_params,
+            cursor_params, sql_parameters, execute_params)
 
     if details is not None and sql_format != 'raw':
         return _obfuscate_explain_plan(database, *details)
@@ -888,13 +913,89 @@ class SQLStatement(object):
             return self.obfuscated
 
 
-_sql_statements = weakref.WeakValueDictionary()
+class SQLStatementCache(object):
+    """Holds strong references to the most recently used SQL statements so
+    that parsing and obfuscating the same statement is only done once, even
+    across transactions. The cache is bounded by the approximate number of
+    bytes taken up by the text of the statements it holds, evicting the
+    least recently used statements first.
+
+    """
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @staticmethod
+    def _cost(statement):
+        # Besides the original text of the statement, each statement
+        # ends up holding the uncommented, obfuscated and normalized text,
+        # none of which are longer than the original.
+
+        return 4 * len(statement.sql)
+
+    def get(self, key):
+        with self._lock:
+            result = self._cache.pop(key, None)
+            if result is not None:
+                self._cache[key] = result
+                self._hits += 1
+            else:
+                self._misses += 1
+            return result
+
+    def add(self, key, statement, max_bytes):
+        cost = self._cost(statement)
+
+        if cost > max_bytes:
+            return
+
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._size -= self._cost(previous)
+
+            self._cache[key] = statement
+            self._size += cost
+
+            while self._size > max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._size -= self._cost(evicted)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._size = 0
+
+    def cache_stats(self):
+        """Returns the number of hits, misses and evictions on the cache
+        since the last call, resetting the counts.
+
+        """
+
+        with self._lock:
+            result = (self._hits, self._misses, self._evictions)
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            return result
+
+
+_sql_statements = SQLStatementCache()
 
 
 def sql_statement(sql, dbapi2_module):
     key = (sql, dbapi2_module)
 
-    result = _sql_statements.get(key, None)
+    result = _sql_statements.get(key)
 
     if result is not None:
         return result
@@ -902,6 +1003,13 @@ def sql_statement(sql, dbapi2_module):
     database = SQLDatabase(dbapi2_module)
     result = SQLStatement(sql, database)
 
-    _sql_statements[key] = result
+    settings = global_settings()
+
+    _sql_statements.add(key, result,
+            settings.agent_limits.sql_statement_cache_bytes)
 
     return result
+
+
+def sql_statement_cache_stats():
+    return _sql_statements.cache_stats()
@@ -0,0 +1,198 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""This module implements deferred recording of transactions, where the
+transaction data is handed off to a background thread which records it
+into the stats engine in batches, rather than on the thread which ran the
+transaction.
+
+"""
+
+import collections
+import logging
+import os
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class DeferredRecorder(object):
+
+    """Bounded queue of completed transactions, drained in batches by a
+    background thread which passes each batch to the supplied record
+    function. Transactions which arrive while the queue is full are
+    dropped and counted.
+
+    """
+
+    def __init__(self, name, record, queue_size, batch_size):
+        self.name = name
+        self._record = record
+        self._queue = collections.deque()
+        self._queue_size = queue_size
+        self._batch_size = max(batch_size, 1)
+        self._notify = threading.Condition()
+        self._waiting = False
+        self._shutdown = False
+        self._thread = None
+        self._process_id = None
+        self._recorded = 0
+        self._dropped = 0
+
+    def _check_process(self):
+        # Threads do not survive a fork, so the background thread has to be
+        # started again when first used in a new process. Any transactions
+        # queued and the counts are those of the parent process, which
+        # remains responsible for recording them.
+
+        if self._process_id == os.getpid():
+            return
+
+        self._process_id = os.getpid()
+        self._queue = collections.deque()
+        self._waiting = False
+        self._thread = None
+        self._recorded = 0
+        self._dropped = 0
+
+    def _start(self):
+        self._check_process()
+
+        if self._thread is not None or self._shutdown:
+            return
+
+        self._thread = threading.Thread(
+            target=self._run, args=(self._queue,), name="NR-Deferred-Recorder/%s" % self.name
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def start(self):
+        with self._notify:
+            self._start()
+
+    def shutdown(self, timeout=None):
+        """Stops the background thread once it has recorded any batch it is
+        part way through, then records anything still queued on the calling
+        thread. Transactions queued after this are dropped.
+
+        """
+
+        with self._notify:
+            self._check_process()
+            self._shutdown = True
+            self._notify.notify_all()
+            thread = self._thread
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+        self.flush()
+
+    def put(self, item):
+        """Queues a transaction for recording. Returns False if the item
+        was dropped because the queue was full or recording was shutdown.
+
+        """
+
+        with self._notify:
+            self._start()
+
+            if self._shutdown or len(self._queue) >= self._queue_size:
+                self._dropped += 1
+                return False
+
+            self._queue.append(item)
+
+            # Only wake up the background thread if it is actually waiting
+            # for more data and a full batch is now available, or it would
+            # otherwise sit idle. The background thread also wakes up
+            # periodically to record any partial batch.
+
+            if self._waiting and len(self._queue) >= self._batch_size:
+                self._notify.notify()
+
+        return True
+
+    def stats(self):
+        """Returns and resets the number of transactions recorded and the
+        number dropped due to the queue being full since last called.
+
+        """
+
+        with self._notify:
+            self._check_process()
+            recorded, dropped = self._recorded, self._dropped
+            self._recorded, self._dropped = 0, 0
+
+        return recorded, dropped
+
+    def _next_batch(self, queue):
+        batch = []
+
+        while queue and len(batch) < self._batch_size:
+            batch.append(queue.popleft())
+
+        return batch
+
+    def _record_batch(self, batch):
+        try:
+            self._record(batch)
+        except Exception:
+            _logger.exception(
+                "The deferred recording of transaction data has failed. "
+                "This would indicate some sort of internal implementation "
+                "issue with the agent. Please report this problem to New "
+                "Relic support for further investigation."
+            )
+
+        with self._notify:
+            self._recorded += len(batch)
+
+    def flush(self):
+        """Records all transactions currently queued on the calling thread.
+        This is used when a harvest is about to be performed so that queued
+        transactions are included in it.
+
+        """
+
+        while True:
+            with self._notify:
+                self._check_process()
+                batch = self._next_batch(self._queue)
+
+            if not batch:
+                return
+
+            self._record_batch(batch)
+
+    def _run(self, queue):
+        # The thread only ever uses the queue it was started with, and exits
+        # once it has been replaced after a fork.
+
+        while True:
+            with self._notify:
+                if len(queue) < self._batch_size and not self._shutdown:
+                    self._waiting = True
+                    self._notify.wait(1.0)
+                    self._waiting = False
+
+                if self._shutdown or self._queue is not queue:
+                    return
+
+                batch = self._next_batch(queue)
+
+            if batch:
+                self._record_batch(batch)
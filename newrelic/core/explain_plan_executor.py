@@ -0,0 +1,300 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements running explain plans for slow SQL on a pool of
+background threads, so that a slow database cannot stretch out a harvest,
+along with caching of the results so that the same statement is not
+explained again on every harvest.
+
+"""
+
+import logging
+import os
+import threading
+import time
+
+from newrelic.core.database_utils import SQLConnections, _explain_plan
+from newrelic.core.internal_metrics import internal_count_metric
+from newrelic.packages.six.moves import queue
+
+_logger = logging.getLogger(__name__)
+
+
+def _database_target(database, connect_params):
+    # The same client module can be used to connect to any number of
+    # databases, so the database is identified by the host, port and
+    # database name where the client module reports them, or otherwise by
+    # the parameters used to connect to it.
+
+    if connect_params is None:
+        return None
+
+    target = None
+    instance_info = getattr(database, "_nr_instance_info", None)
+
+    if instance_info is not None:
+        try:
+            target = tuple(instance_info(*connect_params))
+        except Exception:
+            pass
+
+    if target is None:
+        args, kwargs = connect_params
+        target = (tuple(args), tuple(sorted(kwargs.items())))
+
+    try:
+        hash(target)
+    except TypeError:
+        target = repr(target)
+
+    return target
+
+
+class _PendingExplainPlan(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.details = None
+
+
+class ExplainPlanExecutor(object):
+
+    """Pool of background threads which run explain plans. Results are
+    cached against the database and normalized statement for a period of
+    time, and a request for a statement which is already being explained
+    waits on that rather than running the explain plan again. The number
+    of explain plans run against any one database at the same time is
+    limited.
+
+    """
+
+    def __init__(self, name, worker_count, database_concurrency, cache_ttl, max_connections):
+        self.name = name
+        self._worker_count = max(worker_count, 1)
+        self._database_concurrency = max(database_concurrency, 1)
+        self._cache_ttl = cache_ttl
+        self._max_connections = max_connections
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._pending = {}
+        self._semaphores = {}
+        self._jobs = None
+        self._process_id = None
+        self._shutdown = False
+
+    def _start(self):
+        # Threads do not survive a fork, so a new set of threads is started
+        # when first used in a new process. Any explain plans which were
+        # pending in the parent process will never complete in this one,
+        # and any semaphores held by them would never be released.
+
+        if self._process_id == os.getpid():
+            return
+
+        self._process_id = os.getpid()
+        self._pending = {}
+        self._semaphores = {}
+        self._jobs = queue.Queue()
+
+        for index in range(self._worker_count):
+            thread = threading.Thread(
+                target=self._run, args=(self._jobs,), name="NR-Explain-Plans/%s/%d" % (self.name, index)
+            )
+            thread.daemon = True
+            thread.start()
+
+    def shutdown(self):
+        """Stops the background threads once any explain plans they are
+        currently running have completed. Queued explain plans are discarded.
+
+        """
+
+        with self._lock:
+            self._shutdown = True
+
+            if self._jobs is None or self._process_id != os.getpid():
+                return
+
+            for _ in range(self._worker_count):
+                self._jobs.put(None)
+
+    def _semaphore(self, database):
+        with self._lock:
+            semaphore = self._semaphores.get(database)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._database_concurrency)
+                self._semaphores[database] = semaphore
+            return semaphore
+
+    def _run(self, jobs):
+        connections = SQLConnections(self._max_connections)
+
+        while True:
+            job = jobs.get()
+
+            if job is None or self._shutdown:
+                break
+
+            key, args = job
+            details = None
+
+            try:
+                with self._semaphore(key[:2]):
+                    details = _explain_plan(connections, *args)
+
+                # Database connections are not kept open while there are
+                # no more explain plans waiting to be run.
+
+                if jobs.empty():
+                    connections.cleanup()
+
+            except Exception:
+                _logger.exception(
+                    "Running an explain plan in the background has failed. "
+                    "This would indicate some sort of internal implementation "
+                    "issue with the agent. Please report this problem to New "
+                    "Relic support for further investigation."
+                )
+
+            self._complete(key, details)
+
+        try:
+            connections.cleanup()
+        except Exception:
+            pass
+
+    def _complete(self, key, details):
+        with self._lock:
+            self._cache[key] = (time.time() + self._cache_ttl, details)
+            pending = self._pending.pop(key, None)
+
+        if pending is not None:
+            pending.details = details
+            pending.event.set()
+
+    def _lookup(self, key):
+        # Must be called with the lock held.
+
+        entry = self._cache.get(key)
+
+        if entry is not None:
+            if entry[0] > time.time():
+                return True, entry[1]
+
+            del self._cache[key]
+
+        return False, None
+
+    def expire(self):
+        """Discards all cached results which have passed their time to live."""
+
+        now = time.time()
+
+        with self._lock:
+            for key in [key for key, entry in self._cache.items() if entry[0] <= now]:
+                del self._cache[key]
+
+    def submit(self, sql_statement, connect_params, cursor_params, sql_parameters, execute_params):
+        """Returns a tuple of whether a result was available from the cache
+        and the result. If not available, the pending explain plan is
+        returned in place of the result, the event of which will be set
+        once the explain plan has run.
+
+        """
+
+        database = sql_statement.database
+        key = (database.client, _database_target(database, connect_params), sql_statement.identifier)
+
+        with self._lock:
+            found, details = self._lookup(key)
+
+            if found:
+                return True, details
+
+            if self._shutdown:
+                return True, None
+
+            self._start()
+
+            pending = self._pending.get(key)
+
+            if pending is None:
+                pending = _PendingExplainPlan()
+                self._pending[key] = pending
+
+                self._jobs.put(
+                    (
+                        key,
+                        (
+                            sql_statement.sql,
+                            database,
+                            connect_params,
+                            cursor_params,
+                            sql_parameters,
+                            execute_params,
+                        ),
+                    )
+                )
+
+        return False, pending
+
+    def harvest(self, time_budget):
+        """Returns an object to be used in place of the database connections
+        when generating slow SQL and transaction trace data for a harvest.
+        In total, no more than the time budget is spent waiting for explain
+        plans to complete.
+
+        """
+
+        self.expire()
+
+        return ExplainPlanHarvest(self, time.time() + time_budget)
+
+
+class ExplainPlanHarvest(object):
+    def __init__(self, executor, deadline):
+        self._executor = executor
+        self._deadline = deadline
+        self._hits = 0
+        self._misses = 0
+        self._timeouts = 0
+
+    def explain_plan(self, sql_statement, connect_params, cursor_params, sql_parameters, execute_params):
+        found, result = self._executor.submit(
+            sql_statement, connect_params, cursor_params, sql_parameters, execute_params
+        )
+
+        if found:
+            self._hits += 1
+            return result
+
+        self._misses += 1
+
+        # If the explain plan does not complete within what remains of the
+        # time budget, it is left to complete in the background and will
+        # be available from the cache on a subsequent harvest.
+
+        remaining = self._deadline - time.time()
+
+        if remaining > 0 and result.event.wait(remaining):
+            return result.details
+
+        self._timeouts += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, tb):
+        internal_count_metric("Supportability/Python/ExplainPlans/Cache/Hits", self._hits)
+        internal_count_metric("Supportability/Python/ExplainPlans/Cache/Misses", self._misses)
+        internal_count_metric("Supportability/Python/ExplainPlans/TimedOut", self._timeouts)
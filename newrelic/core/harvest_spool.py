@@ -0,0 +1,352 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements spooling of harvest payloads to disk when the
+data collector cannot be reached, so that the data is neither held in
+memory for the duration of the outage nor lost if the process exits
+before the data collector can be reached again. Spooled payloads are
+replayed a limited number at a time on each harvest once the data
+collector can be reached.
+
+"""
+
+import errno
+import hashlib
+import itertools
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+import zlib
+
+from newrelic.common.encoding_utils import json_decode, json_encode
+from newrelic.core.internal_metrics import internal_count_metric
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentDisconnect,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
+
+_logger = logging.getLogger(__name__)
+
+# The endpoints for which payloads can be spooled, and whether the first
+# item of the payload is the agent run ID. The agent run ID is not
+# spooled, as the payload is replayed against whichever agent run is
+# current at the time.
+
+SPOOLED_ENDPOINTS = {
+    "metric_data": True,
+    "analytic_event_data": True,
+    "custom_event_data": True,
+    "span_event_data": True,
+    "error_event_data": True,
+    "error_data": True,
+    "transaction_sample_data": True,
+    "sql_trace_data": False,
+}
+
+_SUFFIX = ".payload"
+_CLAIMED_SUFFIX = ".sending"
+_TEMPORARY_SUFFIX = ".tmp"
+
+# A payload claimed for sending by a process which then exits before
+# sending it would otherwise never be sent. Claims older than this are
+# assumed to have been abandoned.
+
+_CLAIM_TIMEOUT = 600.0
+
+
+def default_spool_directory():
+    return os.path.join(tempfile.gettempdir(), "newrelic-harvest-spool")
+
+
+def _secure_directory(path):
+    # Spooled payloads can hold error messages, SQL and request attributes,
+    # so the directories are only accessible to the current user. As the
+    # default directory is at a known location in a shared temporary
+    # directory, an existing directory is only used if it is owned by the
+    # current user and is not a symbolic link.
+
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise
+
+    status = os.lstat(path)
+
+    if not stat.S_ISDIR(status.st_mode):
+        return False
+
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        return False
+
+    return True
+
+
+class HarvestSpool(object):
+
+    """Spool of harvest payloads held as files in a directory, one file
+    for each payload. Payloads are written to a temporary file and then
+    renamed into place, and are claimed for sending by renaming them, so
+    the one directory can safely be shared by the processes reporting as
+    the same application, such as the workers of a web server. Payloads
+    are replayed oldest first. Once the total size of the spooled
+    payloads exceeds max_bytes, the oldest payloads are dropped.
+
+    """
+
+    def __init__(self, directory, license_key, app_name, max_bytes, replay_limit):
+        # Each application has its own directory so that payloads are
+        # only ever replayed against the application they came from.
+
+        key = hashlib.sha1(("%s:%s" % (license_key, app_name)).encode("utf-8")).hexdigest()
+
+        self._root = directory or default_spool_directory()
+        self.directory = os.path.join(self._root, key)
+        self._max_bytes = max_bytes
+        self._replay_limit = replay_limit
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self.offline = False
+
+    def _prepare_directory(self):
+        try:
+            parent = os.path.dirname(self._root)
+            if parent and not os.path.isdir(parent):
+                os.makedirs(parent, 0o700)
+
+            if _secure_directory(self._root) and _secure_directory(self.directory):
+                return True
+
+        except OSError:
+            _logger.exception("Unable to create the harvest spool directory %r.", self.directory)
+            return False
+
+        _logger.warning(
+            "Harvest data will not be spooled to %r as it is not a directory owned by the current user.",
+            self.directory,
+        )
+        return False
+
+    def _filenames(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        now = time.time()
+        filenames = []
+
+        for name in names:
+            if name.endswith(_SUFFIX):
+                filenames.append(name)
+
+            elif name.endswith(_CLAIMED_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    if now - os.path.getmtime(path) > _CLAIM_TIMEOUT:
+                        filename = name[: -len(_CLAIMED_SUFFIX)]
+                        os.rename(path, os.path.join(self.directory, filename))
+                        filenames.append(filename)
+                except OSError:
+                    pass
+
+        # File names start with the time the payload was spooled, padded
+        # so that they sort in the order they were spooled.
+
+        return sorted(filenames)
+
+    def _enforce_limit(self):
+        sizes = []
+
+        for filename in self._filenames():
+            try:
+                sizes.append((filename, os.path.getsize(os.path.join(self.directory, filename))))
+            except OSError:
+                pass
+
+        total = sum(size for _, size in sizes)
+
+        for filename, size in sizes:
+            if total <= self._max_bytes:
+                break
+
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+
+            total -= size
+
+            internal_count_metric("Supportability/Python/HarvestSpool/Dropped/%s" % filename.split(".")[1], 1)
+
+    def spool(self, method, payload):
+        """Writes the payload for the endpoint to the spool. Returns True
+        if the payload was spooled, or False if it could not be, in which
+        case the caller must deal with the payload itself.
+
+        """
+
+        has_run_id = SPOOLED_ENDPOINTS.get(method)
+
+        if has_run_id is None:
+            return False
+
+        if has_run_id:
+            payload = payload[1:]
+
+        try:
+            data = zlib.compress(json_encode(payload).encode("utf-8"))
+
+            with self._lock:
+                filename = "%020d-%d-%d.%s%s" % (
+                    int(time.time() * 1000000),
+                    os.getpid(),
+                    next(self._sequence),
+                    method,
+                    _SUFFIX,
+                )
+                path = os.path.join(self.directory, filename)
+
+                if not self._prepare_directory():
+                    return False
+
+                fd = os.open(
+                    path + _TEMPORARY_SUFFIX,
+                    os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+                    0o600,
+                )
+                with os.fdopen(fd, "wb") as fp:
+                    fp.write(data)
+
+                os.rename(path + _TEMPORARY_SUFFIX, path)
+
+                self._enforce_limit()
+
+        except Exception:
+            _logger.exception(
+                "Spooling of %s data to %r has failed. The data will be retained in memory instead.",
+                method,
+                self.directory,
+            )
+            return False
+
+        internal_count_metric("Supportability/Python/HarvestSpool/Spooled/%s" % method, 1)
+
+        return True
+
+    def _claim(self, filename):
+        path = os.path.join(self.directory, filename)
+        claimed = path + _CLAIMED_SUFFIX
+
+        # Renaming the file fails if another process has already claimed
+        # it. The modification time is updated as it is used to detect an
+        # abandoned claim.
+
+        try:
+            os.rename(path, claimed)
+            os.utime(claimed, None)
+            with open(claimed, "rb") as fp:
+                data = fp.read()
+        except (IOError, OSError):
+            return None, None
+
+        return claimed, data
+
+    def _release(self, claimed):
+        try:
+            os.rename(claimed, claimed[: -len(_CLAIMED_SUFFIX)])
+        except OSError:
+            pass
+
+    def _remove(self, claimed):
+        try:
+            os.remove(claimed)
+        except OSError:
+            pass
+
+    def replay(self, send, agent_run_id):
+        """Sends up to the replay limit of spooled payloads using send,
+        which is called with the endpoint and payload. The spool is marked
+        as being back online unless a payload could not be sent due to
+        being unable to reach the data collector.
+
+        """
+
+        # Nothing is sent from a directory which could have been written to
+        # by another user, and new data is then no longer spooled either.
+
+        if not self._prepare_directory():
+            self.offline = False
+            return
+
+        replayed = 0
+
+        for filename in self._filenames():
+            if replayed >= self._replay_limit:
+                break
+
+            method = filename.split(".")[1]
+            has_run_id = SPOOLED_ENDPOINTS.get(method)
+
+            if has_run_id is None:
+                continue
+
+            claimed, data = self._claim(filename)
+
+            if claimed is None:
+                continue
+
+            try:
+                payload = json_decode(zlib.decompress(data).decode("utf-8"))
+            except Exception:
+                _logger.warning("Discarding spooled %s data which could not be read from %r.", method, claimed)
+                self._remove(claimed)
+                continue
+
+            if has_run_id:
+                payload = [agent_run_id] + payload
+
+            try:
+                send(method, payload)
+
+            except RetryDataForRequest:
+                self._release(claimed)
+                self.offline = True
+                return
+
+            except DiscardDataForRequest:
+                internal_count_metric("Supportability/Python/HarvestSpool/Dropped/%s" % method, 1)
+                self._remove(claimed)
+                continue
+
+            except (ForceAgentRestart, ForceAgentDisconnect):
+                self._release(claimed)
+                raise
+
+            except Exception:
+                self._release(claimed)
+                _logger.exception("Replaying spooled %s data has failed.", method)
+                return
+
+            self._remove(claimed)
+            replayed += 1
+
+            internal_count_metric("Supportability/Python/HarvestSpool/Replayed/%s" % method, 1)
+
+        self.offline = False
@@ -0,0 +1,208 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements sending the independent payloads for a harvest
+to the data collector on a pool of background threads, so that a slow
+data collector or proxy does not cause the time taken for a harvest to
+grow with the number of payloads being sent.
+
+"""
+
+import os
+import sys
+import threading
+
+from newrelic.core.internal_metrics import InternalTraceContext
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentDisconnect,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
+from newrelic.packages import six
+from newrelic.packages.six.moves import queue
+
+# Where more than one upload fails, the exception which is raised at the
+# end of the uploads is the one which is handled most drastically by the
+# harvest. Anything not listed is an unexpected error and ranks lowest.
+
+_EXCEPTION_PRECEDENCE = (
+    ForceAgentRestart,
+    ForceAgentDisconnect,
+    RetryDataForRequest,
+    DiscardDataForRequest,
+)
+
+
+def _exception_precedence(exc_info):
+    for index, exc_type in enumerate(_EXCEPTION_PRECEDENCE):
+        if issubclass(exc_info[0], exc_type):
+            return index
+    return len(_EXCEPTION_PRECEDENCE)
+
+
+class _PendingUpload(object):
+    def __init__(self, send, args, on_success):
+        self.send = send
+        self.args = args
+        self.on_success = on_success
+        self.event = threading.Event()
+        self.exc_info = None
+        self.metrics = CustomMetrics()
+
+    def run(self):
+        # Supportability metrics are recorded against the thread local
+        # internal trace context, so each upload collects them separately
+        # for them to be merged back in by the harvest thread.
+
+        try:
+            with InternalTraceContext(self.metrics):
+                self.send(*self.args)
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.send = self.args = None
+            self.event.set()
+
+
+class HarvestUploadPool(object):
+
+    """Pool of background threads on which the payloads for harvests of an
+    application are sent to the data collector.
+
+    """
+
+    def __init__(self, name, worker_count):
+        self.name = name
+        self._worker_count = max(worker_count, 1)
+        self._lock = threading.Lock()
+        self._jobs = None
+        self._process_id = None
+        self._shutdown = False
+
+    def _start(self):
+        # Threads do not survive a fork, so a new set of threads is started
+        # when first used in a new process.
+
+        if self._process_id == os.getpid():
+            return
+
+        self._process_id = os.getpid()
+        self._jobs = queue.Queue()
+
+        for index in range(self._worker_count):
+            thread = threading.Thread(
+                target=self._run, args=(self._jobs,), name="NR-Harvest-Uploads/%s/%d" % (self.name, index)
+            )
+            thread.daemon = True
+            thread.start()
+
+    def shutdown(self):
+        """Stops the background threads once any uploads they are currently
+        sending have completed. Any uploads submitted after this are sent
+        from the thread submitting them.
+
+        """
+
+        with self._lock:
+            self._shutdown = True
+
+            if self._jobs is None or self._process_id != os.getpid():
+                return
+
+            for _ in range(self._worker_count):
+                self._jobs.put(None)
+
+    def _run(self, jobs):
+        while True:
+            upload = jobs.get()
+
+            if upload is None:
+                break
+
+            upload.run()
+
+    def submit(self, upload):
+        """Queues the upload to be sent by one of the background threads,
+        or sends it immediately if the pool has been shutdown.
+
+        """
+
+        with self._lock:
+            if not self._shutdown:
+                self._start()
+                self._jobs.put(upload)
+                return
+
+        upload.run()
+
+
+class HarvestUploads(object):
+
+    """Sends the payloads for a single harvest of an application. Used as
+    a context manager around the code which sends the payloads.
+
+    When no upload pool is supplied each payload is sent immediately and
+    any exception propagates straight away, as for a harvest where uploads
+    are not run concurrently. Otherwise payloads are sent on the upload
+    pool and on leaving the context all uploads are waited on. Their
+    supportability metrics are merged into internal_metrics and the
+    on_success callback of each upload which succeeded is then run on the
+    harvest thread. Where any upload failed, the exception of highest
+    precedence is then raised, so that rollback of the data which was not
+    sent proceeds as for a harvest where uploads are sent one at a time.
+
+    """
+
+    def __init__(self, pool, internal_metrics):
+        self._pool = pool
+        self._internal_metrics = internal_metrics
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def send(self, send, args, on_success=None):
+        if self._pool is None:
+            send(*args)
+            if on_success is not None:
+                on_success()
+            return
+
+        upload = _PendingUpload(send, args, on_success)
+        self._pending.append(upload)
+        self._pool.submit(upload)
+
+    def __exit__(self, exc, value, tb):
+        pending, self._pending = self._pending, []
+
+        failure = None
+
+        for upload in pending:
+            upload.event.wait()
+
+            self._internal_metrics.merge_metrics(upload.metrics.metrics())
+
+            if upload.exc_info is None:
+                if upload.on_success is not None:
+                    upload.on_success()
+            elif failure is None or _exception_precedence(upload.exc_info) < _exception_precedence(failure):
+                failure = upload.exc_info
+
+        # An exception raised by the harvest itself takes priority over
+        # any raised by the uploads.
+
+        if failure is not None and exc is None:
+            six.reraise(*failure)
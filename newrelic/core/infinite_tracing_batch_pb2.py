@@ -0,0 +1,84 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+  from google.protobuf import descriptor as _descriptor
+  from google.protobuf import message as _message
+  from google.protobuf import reflection as _reflection
+  from google.protobuf import symbol_database as _symbol_database
+  # @@protoc_insertion_point(imports)
+except ImportError:
+  pass
+else:
+  _sym_db = _symbol_database.Default()
+
+
+  from newrelic.core import infinite_tracing_pb2 as infinite__tracing__pb2
+
+
+  DESCRIPTOR = _descriptor.FileDescriptor(
+    name='infinite_tracing_batch.proto',
+    package='com.newrelic.trace.v1',
+    syntax='proto3',
+    serialized_options=None,
+    serialized_pb=b'\n\x1cinfinite_tracing_batch.proto\x12\x15\x63om.newrelic.trace.v1\x1a\x16infinite_tracing.proto\"7\n\tSpanBatch\x12*\n\x05spans\x18\x01 \x03(\x0b\x32\x1b.com.newrelic.trace.v1.Spanb\x06proto3'
+    ,
+    dependencies=[infinite__tracing__pb2.DESCRIPTOR,])
+
+
+
+
+  _SPANBATCH = _descriptor.Descriptor(
+    name='SpanBatch',
+    full_name='com.newrelic.trace.v1.SpanBatch',
+    filename=None,
+    file=DESCRIPTOR,
+    containing_type=None,
+    fields=[
+      _descriptor.FieldDescriptor(
+        name='spans', full_name='com.newrelic.trace.v1.SpanBatch.spans', index=0,
+        number=1, type=11, cpp_type=10, label=3,
+        has_default_value=False, default_value=[],
+        message_type=None, enum_type=None, containing_type=None,
+        is_extension=False, extension_scope=None,
+        serialized_options=None, file=DESCRIPTOR),
+    ],
+    extensions=[
+    ],
+    nested_types=[],
+    enum_types=[
+    ],
+    serialized_options=None,
+    is_extendable=False,
+    syntax='proto3',
+    extension_ranges=[],
+    oneofs=[
+    ],
+    serialized_start=79,
+    serialized_end=134,
+  )
+
+  _SPANBATCH.fields_by_name['spans'].message_type = infinite__tracing__pb2._SPAN
+  DESCRIPTOR.message_types_by_name['SpanBatch'] = _SPANBATCH
+  _sym_db.RegisterFileDescriptor(DESCRIPTOR)
+
+  SpanBatch = _reflection.GeneratedProtocolMessageType('SpanBatch', (_message.Message,), {
+    'DESCRIPTOR' : _SPANBATCH,
+    '__module__' : 'infinite_tracing_batch_pb2'
+    # @@protoc_insertion_point(class_scope:com.newrelic.trace.v1.SpanBatch)
+    })
+  _sym_db.RegisterMessage(SpanBatch)
+
+
+  # @@protoc_insertion_point(module_scope)
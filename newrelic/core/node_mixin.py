@@ -80,22 +80,39 @@ class GenericNodeMixin(object):
         # intrinsics, user attrs, agent attrs
         return [i_attrs, u_attrs, a_attrs]
 
+    def span_event_nodes(self, parent_guid=None):
+        """Yields a tuple of each node in the trace tree rooted at this
+        node and the guid of its parent, in depth first order.
+
+        """
+
+        # The trace tree is walked depth first using an explicit stack
+        # rather than by recursing into the children. For deep trees,
+        # nesting a generator per level means every node would have to
+        # be passed up through the whole chain of generators.
+
+        stack = [(self, parent_guid)]
+
+        while stack:
+            node, parent_guid = stack.pop()
+
+            yield node, parent_guid
+
+            children = node.children
+
+            if children:
+                guid = node.guid
+                stack.extend((child, guid) for child in reversed(children))
+
     def span_events(self,
             settings, base_attrs=None, parent_guid=None, attr_class=dict):
 
-        yield self.span_event(
-                settings,
-                base_attrs=base_attrs,
-                parent_guid=parent_guid,
-                attr_class=attr_class)
-
-        for child in self.children:
-            for event in child.span_events(
+        for node, parent_guid in self.span_event_nodes(parent_guid):
+            yield node.span_event(
                     settings,
                     base_attrs=base_attrs,
-                    parent_guid=self.guid,
-                    attr_class=attr_class):
-                yield event
+                    parent_guid=parent_guid,
+                    attr_class=attr_class)
 
 
 class DatastoreNodeMixin(GenericNodeMixin):
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 import re
-from collections import namedtuple
+import threading
+from collections import OrderedDict, namedtuple
 
 _NormalizationRule = namedtuple(
     "_NormalizationRule",
@@ -33,10 +34,51 @@ class NormalizationRule(_NormalizationRule):
         return self.match_expression_re.subn(self.replacement, string, count)
 
 
+# Match expressions which use back references or global inline flags
+# cannot be safely combined with others into a single alternation, as
+# the meaning of the expression would change.
+
+_UNCOMBINABLE_RE = re.compile(r"\\\d|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)")
+
+
+def _combined_matcher(rules):
+    """Returns a regular expression which matches wherever any of the
+    rules would match, or None if the rules cannot be combined.
+
+    """
+
+    expressions = []
+
+    for rule in rules:
+        if _UNCOMBINABLE_RE.search(rule.match_expression):
+            return None
+        expressions.append("(?:%s)" % rule.match_expression)
+
+    if not expressions:
+        return None
+
+    try:
+        return re.compile("|".join(expressions), re.IGNORECASE)
+    except Exception:
+        return None
+
+
 class RulesEngine(object):
-    def __init__(self, rules):
+    def __init__(self, rules, cache_size=0):
         self.__rules = []
 
+        # Results of normalizing a name are memoized in a bounded least
+        # recently used cache, as the same URLs and transaction names will
+        # be seen over and over. As the rules never change for the life of
+        # the rules engine, a new rules engine and so a new cache is used
+        # whenever new rules are received from the data collector.
+
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+        self.__cache_lock = threading.Lock()
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+
         for rule in rules:
             kwargs = {}
             for name in map(str, rule.keys()):
@@ -46,11 +88,100 @@ class RulesEngine(object):
 
         self.__rules = sorted(self.__rules, key=lambda rule: rule.eval_order)
 
+        # A rule which does not match leaves the name unchanged, so if no
+        # rule matches the original name, none would match at any point in
+        # the chain. The match expressions of the rules are therefore
+        # combined so that a name which no rule matches can be rejected in
+        # a single scan, with a separate scan of each segment for those
+        # rules which are applied to each segment. If the rules cannot be
+        # combined, every name is run through the full chain of rules.
+
+        self.__string_matcher = None
+        self.__segment_matcher = None
+
+        string_rules = [rule for rule in self.__rules if not rule.each_segment]
+        segment_rules = [rule for rule in self.__rules if rule.each_segment]
+
+        string_matcher = _combined_matcher(string_rules)
+        segment_matcher = _combined_matcher(segment_rules)
+
+        if (string_matcher is not None or not string_rules) and (segment_matcher is not None or not segment_rules):
+            self.__string_matcher = string_matcher
+            self.__segment_matcher = segment_matcher
+            self.__combined = True
+        else:
+            self.__combined = False
+
     @property
     def rules(self):
         return self.__rules
 
+    def cache_stats(self):
+        """Returns the number of hits and misses on the cache of normalized
+        names since this was last called.
+
+        """
+
+        with self.__cache_lock:
+            hits, misses = self.__cache_hits, self.__cache_misses
+            self.__cache_hits = 0
+            self.__cache_misses = 0
+
+        return hits, misses
+
     def normalize(self, string):
+        if not self.__rules:
+            if isinstance(string, bytes):
+                string = string.decode("Latin-1")
+            return (string, False)
+
+        if self.__cache_size <= 0:
+            return self._normalize(string)
+
+        cache = self.__cache
+
+        with self.__cache_lock:
+            result = cache.pop(string, None)
+            if result is not None:
+                cache[string] = result
+                self.__cache_hits += 1
+                return result
+
+            self.__cache_misses += 1
+
+        result = self._normalize(string)
+
+        with self.__cache_lock:
+            cache[string] = result
+            while len(cache) > self.__cache_size:
+                cache.popitem(last=False)
+
+        return result
+
+    def _matches(self, string):
+        """Returns whether any of the rules would match the name."""
+
+        if self.__string_matcher is not None and self.__string_matcher.search(string):
+            return True
+
+        if self.__segment_matcher is not None:
+            segments = string.split("/")
+
+            # Segments are split in the same way as when applying the
+            # rules, skipping any leading empty segment.
+
+            if segments and not segments[0]:
+                segments = segments[1:]
+
+            search = self.__segment_matcher.search
+
+            for segment in segments:
+                if search(segment):
+                    return True
+
+        return False
+
+    def _normalize(self, string):
         # URLs are supposed to be ASCII but can get a
         # URL with illegal non ASCII characters. As the
         # rule patterns and replacements are Unicode
@@ -63,6 +194,9 @@ class RulesEngine(object):
         if isinstance(string, bytes):
             string = string.decode("Latin-1")
 
+        if self.__combined and not self._matches(string):
+            return (string, False)
+
         final_string = string
         ignore = False
         for rule in self.__rules:
@@ -21,18 +21,20 @@ data whereby it is sent to the core application.
 
 import base64
 import copy
+import itertools
 import logging
 import operator
 import random
 import sys
+import threading
 import time
 import warnings
 import zlib
-from heapq import heapify, heapreplace
+from heapq import heapify, heapreplace, nlargest
 
 import newrelic.packages.six as six
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
-from newrelic.common.encoding_utils import json_encode
+from newrelic.common.encoding_utils import json_encode, register_json_type
 from newrelic.common.object_names import parse_exc_info
 from newrelic.common.streaming_utils import StreamBuffer
 from newrelic.core.attribute import create_user_attributes, process_user_attribute
@@ -43,6 +45,7 @@ from newrelic.core.database_utils import explain_plan
 from newrelic.core.error_collector import TracedError
 from newrelic.core.metric import TimeMetric
 from newrelic.core.stack_trace import exception_stack
+from newrelic.core.transaction_node import SpanEventReference
 
 _logger = logging.getLogger(__name__)
 
@@ -208,6 +211,20 @@ class CustomMetrics(object):
         else:
             stats.merge_stats(new_stats)
 
+    def merge_metrics(self, metrics):
+        """Merges in the set of value metrics from another table, where
+        metrics is an iterator over metric name and stats tuples such as
+        that returned by metrics().
+
+        """
+
+        for name, other in metrics:
+            stats = self.__stats_table.get(name)
+            if stats is None:
+                self.__stats_table[name] = copy.copy(other)
+            else:
+                stats.merge_stats(other)
+
     def metrics(self):
         """Returns an iterator over the set of value metrics. The items
         returned are a tuple consisting of the metric name and accumulated
@@ -320,11 +337,11 @@ class SampledDataSet(object):
             priority = random.random()  # nosec
 
         entry = (priority, self.num_seen, sample)
-        if self.num_seen == self.capacity:
-            self.pq.append(entry)
-            self.heap = self.heap or heapify(self.pq) or True
-        elif not self.heap:
+        if not self.heap:
             self.pq.append(entry)
+            if len(self.pq) >= self.capacity:
+                heapify(self.pq)
+                self.heap = True
         else:
             sampled = self.should_sample(priority)
             if not sampled:
@@ -332,13 +349,95 @@ class SampledDataSet(object):
             heapreplace(self.pq, entry)
 
     def merge(self, other_data_set):
-        for priority, seen_at, sample in other_data_set.pq:
-            self.add(sample, priority)
+        if self.capacity <= 0:
+            self.num_seen += other_data_set.num_seen
+            return
 
-        # Merge the num_seen from the other_data_set, but take care not to
-        # double-count the actual samples of other_data_set since the .add
-        # call above will add one to self.num_seen each time
-        self.num_seen += other_data_set.num_seen - other_data_set.num_samples
+        # Give the samples from the other_data_set sequence numbers which
+        # follow on from those of samples already held, as would be the
+        # case if they had been added one at a time.
+        entries = [
+            (priority, seen_at, sample)
+            for seen_at, (priority, _, sample) in enumerate(other_data_set.pq, self.num_seen + 1)
+        ]
+
+        self.num_seen += other_data_set.num_seen
+
+        if not entries:
+            return
+
+        pq = self.pq
+
+        if len(pq) + len(entries) <= self.capacity:
+            pq.extend(entries)
+            if len(pq) == self.capacity:
+                heapify(pq)
+                self.heap = True
+            return
+
+        # Once the reservoir is full, any sample with a priority no greater
+        # than the minimal priority held can never be kept, so is dropped
+        # straight away.
+        if self.heap:
+            minimum = pq[0][0]
+            entries = [entry for entry in entries if entry[0] > minimum]
+
+        # Where only a few samples remain, replacing the minimal sample for
+        # each is cheaper than selecting the top priorities from scratch.
+        # Otherwise select the samples with the top priorities of the
+        # combined reservoirs in one pass. As the selection is stable,
+        # samples already held win out over new samples of equal priority,
+        # the same as when adding them one at a time.
+        if self.heap and len(entries) * 8 <= len(pq):
+            for entry in entries:
+                if entry[0] > pq[0][0]:
+                    heapreplace(pq, entry)
+        else:
+            pq.extend(entries)
+            self.pq = nlargest(self.capacity, pq, key=operator.itemgetter(0))
+            heapify(self.pq)
+            self.heap = True
+
+
+class SpanEventDataSet(SampledDataSet):
+    """Reservoir of span events, which may hold references to the nodes of
+    sampled transactions in place of span events. The span event for a
+    reference is only built once the samples are read, so span events are
+    never built for samples which are later displaced from the reservoir.
+
+    """
+
+    @property
+    def samples(self):
+        pq = self.pq
+
+        for index, (priority, seen_at, sample) in enumerate(pq):
+            if isinstance(sample, SpanEventReference):
+                sample = sample.materialize()
+
+                # The entry is replaced with the materialized span
+                # event so that the span event is only built once.
+                # The priority is unchanged so the heap is unaffected.
+                pq[index] = (priority, seen_at, sample)
+
+            yield sample
+
+    def add_references(self, transaction, settings):
+        """Adds references to the nodes of a sampled transaction in place of
+        its span events.
+
+        """
+
+        priority = transaction.priority
+
+        for reference in transaction.span_event_references(settings):
+            self.add(reference, priority=priority)
+
+
+# Sampled data sets are encoded as JSON as the list of their samples.
+
+register_json_type(SampledDataSet, list)
+register_json_type(SpanEventDataSet, list)
 
 
 class LimitedDataSet(list):
@@ -423,7 +522,7 @@ class StatsEngine(object):
         self._transaction_events = SampledDataSet()
         self._error_events = SampledDataSet()
         self._custom_events = SampledDataSet()
-        self._span_events = SampledDataSet()
+        self._span_events = SpanEventDataSet()
         self._span_stream = None
         self.__sql_stats_table = {}
         self.__slow_transaction = None
@@ -989,11 +1088,13 @@ class StatsEngine(object):
 
         if settings.distributed_tracing.enabled and settings.span_events.enabled and settings.collect_span_events:
             if settings.infinite_tracing.enabled:
-                for event in transaction.span_protos(settings):
-                    self._span_stream.put(event)
+                self._span_stream.put_many(transaction.span_protos(settings))
             elif transaction.sampled:
-                for event in transaction.span_events(self.__settings):
-                    self._span_events.add(event, priority=transaction.priority)
+                if settings.span_events.lazy_materialization:
+                    self._span_events.add_references(transaction, self.__settings)
+                else:
+                    for event in transaction.span_events(self.__settings):
+                        self._span_events.add(event, priority=transaction.priority)
 
     def metric_data(self, normalizer=None):
         """Returns a list containing the low level metric data for
@@ -1387,9 +1488,9 @@ class StatsEngine(object):
 
     def reset_span_events(self):
         if self.__settings is not None:
-            self._span_events = SampledDataSet(self.__settings.event_harvest_config.harvest_limits.span_event_data)
+            self._span_events = SpanEventDataSet(self.__settings.event_harvest_config.harvest_limits.span_event_data)
         else:
-            self._span_events = SampledDataSet()
+            self._span_events = SpanEventDataSet()
 
     def reset_synthetics_events(self):
         """Resets the accumulated statistics back to initial state for
@@ -1516,6 +1617,26 @@ class StatsEngine(object):
         self._merge_sql(snapshot)
         self._merge_traces(snapshot)
 
+    def merge_shard(self, shard):
+        """Merges data from a stats engine shard. Unlike a snapshot for a
+        single transaction, a shard holds the accumulated data for many
+        transactions and so all of its sampled events are merged.
+
+        """
+
+        if not self.__settings:
+            return
+
+        self.merge_metric_stats(shard)
+        self._merge_transaction_events(shard, rollback=True)
+        self._merge_synthetics_events(shard, rollback=True)
+        self._merge_error_events(shard)
+        self._merge_error_traces(shard)
+        self._merge_custom_events(shard, rollback=True)
+        self._merge_span_events(shard, rollback=True)
+        self._merge_sql(shard)
+        self._merge_traces(shard)
+
     def rollback(self, snapshot):
         """Performs a "rollback" merge after a failed harvest. Snapshot is a
         copy of the main StatsEngine data that we attempted to harvest, but
@@ -1694,3 +1815,97 @@ class StatsEngineSnapshot(StatsEngine):
 
     def reset_error_events(self):
         self._error_events = None
+
+
+class StatsEngineShard(object):
+
+    """A single shard of a set of stats engine shards. Access to the shard
+    is protected by its own lock, which will only be contended by the
+    small set of threads mapped to the shard and the harvest thread.
+
+    """
+
+    def __init__(self, stats_engine):
+        self.lock = threading.Lock()
+        self.stats_engine = stats_engine
+        self.transaction_count = 0
+
+    def merge_transaction(self, stats, metrics):
+        """Merges the stats for a single transaction, along with the
+        internal metrics recorded while generating them, into the shard.
+
+        """
+
+        with self.lock:
+            self.transaction_count += 1
+
+            self.stats_engine.merge(stats)
+            self.stats_engine.merge_custom_metrics(metrics)
+
+
+class StatsEngineShards(object):
+
+    """A fixed size set of stats engines which transactions can be merged
+    into from multiple threads, without all threads contending on the
+    single lock protecting the main stats engine of the application. Each
+    thread is assigned a shard in round robin order the first time it
+    records a transaction. Data in the shards is only merged into the
+    snapshot taken from the main stats engine at harvest time.
+
+    """
+
+    def __init__(self, stats_engine, count):
+        self._stats_engine = stats_engine
+        self._shards = [StatsEngineShard(stats_engine.create_workarea()) for _ in range(max(count, 1))]
+        self._counter = itertools.count()
+        self._local = threading.local()
+        self._harvest_lock = threading.Lock()
+        self._retained = stats_engine.create_workarea()
+
+    def __len__(self):
+        return len(self._shards)
+
+    def __iter__(self):
+        return iter(self._shards)
+
+    def current_shard(self):
+        """Returns the shard assigned to the current thread."""
+
+        shard = getattr(self._local, "shard", None)
+
+        if shard is None:
+            index = next(self._counter) % len(self._shards)
+            shard = self._local.shard = self._shards[index]
+
+        return shard
+
+    def harvest(self, snapshot, flexible=False):
+        """Swaps out the accumulated data in each shard for an empty stats
+        engine and merges the data of the types being harvested into the
+        snapshot taken from the main stats engine, returning the number of
+        transactions swapped out. Data of other types is retained until
+        the harvest for those types. The lock protecting the main stats
+        engine need not be held, as the only locks taken are those of the
+        shards and these are only held for the time needed to swap in the
+        empty stats engine.
+
+        """
+
+        transaction_count = 0
+
+        with self._harvest_lock:
+            for shard in self._shards:
+                workarea = self._stats_engine.create_workarea()
+
+                with shard.lock:
+                    stats = shard.stats_engine
+                    shard.stats_engine = workarea
+
+                    transaction_count += shard.transaction_count
+                    shard.transaction_count = 0
+
+                self._retained.merge_shard(stats)
+
+            snapshot.merge_shard(self._retained.harvest_snapshot(flexible))
+
+        return transaction_count
@@ -36,6 +36,31 @@ try:
 except:
     pass
 
+
+class SpanEventReference(object):
+    """Stands in for the span event of a node of a sampled transaction,
+    so that building the span event can be deferred until the sample is
+    known to have survived in the span event reservoir. The context is
+    a tuple of the settings and base attributes of the transaction and
+    is shared between the references for all nodes of the transaction.
+
+    """
+
+    __slots__ = ('node', 'parent_guid', 'context')
+
+    def __init__(self, node, parent_guid, context):
+        self.node = node
+        self.parent_guid = parent_guid
+        self.context = context
+
+    def materialize(self):
+        settings, base_attrs = self.context
+        return self.node.span_event(
+                settings,
+                base_attrs=base_attrs,
+                parent_guid=self.parent_guid)
+
+
 _TransactionNode = namedtuple('_TransactionNode',
         ['settings', 'path', 'type', 'group', 'base_name', 'name_for_metric',
         'port', 'request_uri', 'queue_start', 'start_time',
@@ -602,14 +627,17 @@ class TransactionNode(_TransactionNode):
                        user_attributes=u_attrs,
                        agent_attributes=a_attrs)
 
-    def span_events(self, settings, attr_class=dict):
-        base_attrs = attr_class((
+    def _span_event_base_attrs(self, attr_class=dict):
+        return attr_class((
             ('transactionId', self.guid),
             ('traceId', self.trace_id),
             ('sampled', self.sampled),
             ('priority', self.priority),
         ))
 
+    def span_events(self, settings, attr_class=dict):
+        base_attrs = self._span_event_base_attrs(attr_class)
+
         for event in self.root.span_events(
             settings,
             base_attrs,
@@ -617,3 +645,10 @@ class TransactionNode(_TransactionNode):
             attr_class=attr_class,
         ):
             yield event
+
+    def span_event_references(self, settings):
+        context = (settings, self._span_event_base_attrs())
+
+        for node, parent_guid in self.root.span_event_nodes(
+                self.parent_span):
+            yield SpanEventReference(node, parent_guid, context)
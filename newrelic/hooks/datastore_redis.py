@@ -204,11 +204,26 @@ def _instance_info(kwargs):
     return (host, port_path_or_id, db)
 
 
+def _pipeline_queues_command(instance, operation):
+    # A pipeline queues commands to be sent together when it is executed,
+    # except where keys are being watched outside of an explicit
+    # transaction, in which case commands are sent immediately. Queued
+    # commands are covered by the trace for executing the pipeline.
+
+    if getattr(instance, "command_stack", None) is None:
+        return False
+
+    if getattr(instance, "explicit_transaction", False):
+        return True
+
+    return not (getattr(instance, "watching", False) or operation == "watch")
+
+
 def _wrap_Redis_method_wrapper_(module, instance_class_name, operation):
     def _nr_wrapper_Redis_method_(wrapped, instance, args, kwargs):
         transaction = current_transaction()
 
-        if transaction is None:
+        if transaction is None or _pipeline_queues_command(instance, operation):
             return wrapped(*args, **kwargs)
 
         dt = DatastoreTrace(product="Redis", target=None, operation=operation, source=wrapped)
@@ -229,7 +244,83 @@ def _wrap_Redis_method_wrapper_(module, instance_class_name, operation):
     wrap_function_wrapper(module, name, _nr_wrapper_Redis_method_)
 
 
+def _pipeline_operations(command_stack):
+    operations = {}
+
+    for args, _ in command_stack:
+        if not args:
+            continue
+
+        operation = args[0]
+        if isinstance(operation, bytes):
+            operation = operation.decode("utf-8", "replace")
+
+        operation = _redis_operation_re.sub("_", operation.strip().lower())
+        operations[operation] = operations.get(operation, 0) + 1
+
+    return operations
+
+
+def _nr_Pipeline_execute_wrapper_(wrapped, instance, args, kwargs):
+    transaction = current_transaction()
+
+    if transaction is None:
+        return wrapped(*args, **kwargs)
+
+    command_stack = getattr(instance, "command_stack", None)
+
+    if not command_stack:
+        return wrapped(*args, **kwargs)
+
+    host, port_path_or_id, db = (None, None, None)
+
+    try:
+        dt = transaction.settings.datastore_tracer
+        if dt.instance_reporting.enabled or dt.database_name_reporting.enabled:
+            if instance.connection is not None:
+                conn_kwargs = _conn_attrs_to_dict(instance.connection)
+            else:
+                conn_kwargs = instance.connection_pool.connection_kwargs
+            host, port_path_or_id, db = _instance_info(conn_kwargs)
+    except:
+        pass
+
+    # The commands are recorded as a count and a histogram of the
+    # operations, ordered from most to least frequent, rather than as a
+    # trace per command.
+
+    operations = _pipeline_operations(command_stack)
+    histogram = ",".join(
+        "%s=%d" % (operation, count)
+        for operation, count in sorted(operations.items(), key=lambda item: (-item[1], item[0]))
+    )
+
+    trace = DatastoreTrace(
+        product="Redis",
+        target=None,
+        operation="pipeline",
+        host=host,
+        port_path_or_id=port_path_or_id,
+        database_name=db,
+        source=wrapped,
+    )
+
+    trace._add_agent_attribute("db.redis.pipeline.commands", len(command_stack))
+    trace._add_agent_attribute("db.redis.pipeline.operations", histogram)
+
+    with trace:
+        return wrapped(*args, **kwargs)
+
+
 def instrument_redis_client(module):
+    # Older versions of the client define the execute() method for
+    # pipelines on a base class shared by the pipeline classes.
+
+    if hasattr(module, "BasePipeline"):
+        wrap_function_wrapper(module, "BasePipeline.execute", _nr_Pipeline_execute_wrapper_)
+    elif hasattr(module, "Pipeline"):
+        wrap_function_wrapper(module, "Pipeline.execute", _nr_Pipeline_execute_wrapper_)
+
     if hasattr(module, "StrictRedis"):
         for name in _redis_client_methods:
             if name in vars(module.StrictRedis):
@@ -156,7 +156,7 @@ kwargs = dict(
         "newrelic": ["newrelic.ini", "version.txt", "packages/urllib3/LICENSE.txt", "common/cacert.pem"],
     },
     scripts=["scripts/newrelic-admin"],
-    extras_require={"infinite-tracing": ["grpcio", "protobuf<4"]},
+    extras_require={"infinite-tracing": ["grpcio", "protobuf<4"], "orjson": ["orjson"]},
 )
 
 if with_setuptools:
@@ -0,0 +1,60 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from newrelic.common.agent_http import HttpClient
+from newrelic.common.encoding_utils import json_encode, json_encode_chunks
+
+
+def _span_event(index):
+    return [
+        {
+            "type": "Span",
+            "guid": "%016x" % index,
+            "traceId": "4485b89db608aece4485b89db608aece",
+            "parentId": "%016x" % (index - 1),
+            "name": "Function/module:function_%d" % (index % 50),
+            "timestamp": 1600000000000 + index,
+            "duration": 0.001 * index,
+            "category": "generic",
+            "sampled": True,
+            "priority": 1.234567,
+        },
+        {},
+        {"code.function": "function", "code.lineno": index},
+    ]
+
+
+class TimeSpanEventPayload(object):
+    """Encodes and compresses a span_event_data payload of 10,000 span
+    events, either in one go or as chunks streamed through the compressor.
+
+    """
+
+    def setup(self):
+        events = [_span_event(index) for index in range(10000)]
+        self.payload = ("1234567", {"reservoir_size": 10000, "events_seen": 10000}, events)
+        self.client = HttpClient("localhost", 443, max_payload_size_in_bytes=1000000000)
+
+    def time_encode_then_compress(self):
+        self.client._compress_chunks((json_encode(self.payload).encode("utf-8"),))
+
+    def time_streamed_compress(self):
+        self.client._compress_chunks(json_encode_chunks(self.payload))
+
+    def peakmem_encode_then_compress(self):
+        self.client._compress_chunks((json_encode(self.payload).encode("utf-8"),))
+
+    def peakmem_streamed_compress(self):
+        self.client._compress_chunks(json_encode_chunks(self.payload))
@@ -0,0 +1,79 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import tracemalloc
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.metric import TimeMetric
+from newrelic.core.stats_engine import StatsEngine
+
+
+def _time_metrics(count):
+    return [
+        TimeMetric(
+            name="Function/handler_%d" % i,
+            scope="WebTransaction/Function/app:index",
+            duration=0.01,
+            exclusive=0.01,
+        )
+        for i in range(count)
+    ]
+
+
+class MetricTableSuite(object):
+    """Times recording the time metrics of a transaction into a stats
+    engine workarea, and merging the metrics of a transaction into the main
+    stats engine, both where the metrics are already held and where they
+    are not.
+
+    """
+
+    params = [100, 1000, 10000]
+    param_names = ["metrics"]
+
+    def setup(self, metrics):
+        self.stats_engine = StatsEngine()
+        self.stats_engine.reset_stats(finalize_application_settings())
+        self.metrics = _time_metrics(metrics)
+
+        existing = self.stats_engine.create_workarea()
+        existing.record_time_metrics(self.metrics)
+        self.stats_engine.merge_metric_stats(existing)
+
+        self.transaction = self.stats_engine.create_workarea()
+        self.transaction.record_time_metrics(self.metrics)
+
+    def time_record_time_metrics(self, metrics):
+        self.stats_engine.create_workarea().record_time_metrics(self.metrics)
+
+    def time_merge_metric_stats_existing(self, metrics):
+        self.stats_engine.merge_metric_stats(self.transaction)
+
+    def time_merge_metric_stats_new(self, metrics):
+        self.stats_engine.create_workarea().merge_metric_stats(self.transaction)
+
+    def track_memory(self, metrics):
+        tracemalloc.start()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            result = self.stats_engine.create_workarea()
+            result.record_time_metrics(self.metrics)
+            current = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        del result
+        return sum(stat.size_diff for stat in current.compare_to(snapshot, "filename"))
+
+    track_memory.unit = "bytes"
@@ -0,0 +1,66 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import functools
+
+from newrelic.common.object_names import callable_name
+
+
+def _function():
+    pass
+
+
+class _Class(object):
+    def method(self):
+        pass
+
+    @classmethod
+    def class_method(cls):
+        pass
+
+
+class _Slotted(object):
+    __slots__ = ()
+
+    def __call__(self):
+        pass
+
+
+TARGETS = {
+    "function": lambda: _function,
+    "method": lambda: _Class().method,
+    "class_method": lambda: _Class.class_method,
+    "partial": lambda: functools.partial(_function),
+    "class": lambda: _Class,
+    "slotted_instance": lambda: _Slotted(),
+    "builtin": lambda: len,
+}
+
+
+class TimeCallableName(object):
+    """Derives the name of the kinds of callables which are commonly traced,
+    such as view functions and methods, as is done on each request.
+
+    """
+
+    params = (sorted(TARGETS),)
+    param_names = ["target"]
+
+    def setup(self, target):
+        self.target = TARGETS[target]()
+
+    def time_callable_name(self, target):
+        for _ in range(1000):
+            callable_name(self.target)
@@ -0,0 +1,155 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+
+from newrelic.common.encoding_utils import (
+    json_encode_chunks,
+    json_payload_encoder,
+    orjson,
+)
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.custom_event import create_custom_event
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+from newrelic.core.stats_engine import SampledDataSet, StatsEngine
+
+RUN_ID = "1234567"
+
+
+def _span_events(settings, count):
+    children = tuple(
+        FunctionNode(
+            group="Function",
+            name="app.views:handler_%d" % (index % 25),
+            children=(),
+            start_time=1.0 + index * 0.001,
+            end_time=1.001 + index * 0.001,
+            duration=0.001,
+            exclusive=0.001,
+            label=None,
+            params=None,
+            rollup=None,
+            guid="%016x" % (index + 1),
+            agent_attributes={"code.function": "handler", "code.namespace": "app.views", "code.lineno": index},
+            user_attributes={"tenant": "acme"},
+        )
+        for index in range(count - 1)
+    )
+    root = RootNode(
+        name="Function/main",
+        children=children,
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.0,
+        guid="0000000000000000",
+        agent_attributes={},
+        user_attributes={},
+        path="WebTransaction/Function/app.views:handler",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+    base_attrs = {
+        "transactionId": "4485b89db608aece",
+        "traceId": "4485b89db608aece4485b89db608aece",
+        "sampled": True,
+        "priority": 1.5,
+    }
+    return list(root.span_events(settings, base_attrs))
+
+
+def _metric_data(settings, count):
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+
+    rng = random.Random(0)
+    for index in range(count):
+        stats.record_custom_metric("Custom/app/metric_%d" % index, rng.random())
+        stats.record_custom_metric("Custom/app/metric_%d" % index, rng.random())
+
+    return stats.metric_data()
+
+
+def _transaction_events(count):
+    events = SampledDataSet(count)
+
+    for index in range(count):
+        intrinsics = {
+            "type": "Transaction",
+            "name": "WebTransaction/Function/app.views:handler_%d" % (index % 25),
+            "timestamp": 1600000000000 + index,
+            "duration": 0.05,
+            "guid": "%016x" % index,
+            "traceId": "%032x" % index,
+            "priority": 1.5,
+            "sampled": True,
+            "error": False,
+        }
+        agent_attributes = {"response.status": "200", "request.method": "GET", "request.uri": "/handler"}
+        events.add([intrinsics, {"tenant": "acme"}, agent_attributes], priority=1.5)
+
+    return events
+
+
+def _custom_events(count):
+    return [create_custom_event("Purchase", {"sku": "sku-%d" % index, "amount": index * 1.25}) for index in range(count)]
+
+
+def _payloads():
+    settings = finalize_application_settings({})
+
+    transaction_events = _transaction_events(1200)
+    span_events = _span_events(settings, 2000)
+    custom_events = _custom_events(3000)
+
+    return {
+        "analytic_event_data": (
+            RUN_ID,
+            {"reservoir_size": 1200, "events_seen": 1200},
+            transaction_events,
+        ),
+        "span_event_data": (RUN_ID, {"reservoir_size": 2000, "events_seen": 2000}, span_events),
+        "custom_event_data": (RUN_ID, {"reservoir_size": 3000, "events_seen": 3000}, custom_events),
+        "metric_data": (RUN_ID, 1600000000.0, 1600000060.0, _metric_data(settings, 2000)),
+    }
+
+
+class TimePayloadEncoding(object):
+    """Encodes the payloads of a harvest using each of the JSON encoder
+    backends, either in one go or as chunks as when streamed to the data
+    collector.
+
+    """
+
+    params = (
+        ["analytic_event_data", "span_event_data", "custom_event_data", "metric_data"],
+        ["stdlib", "orjson"],
+    )
+    param_names = ["endpoint", "encoder"]
+
+    def setup(self, endpoint, encoder):
+        if encoder == "orjson" and orjson is None:
+            raise NotImplementedError("orjson is not installed.")
+
+        self.payload = _payloads()[endpoint]
+        self.encoder = json_payload_encoder(encoder)
+
+    def time_encode(self, endpoint, encoder):
+        self.encoder(self.payload)
+
+    def time_encode_chunks(self, endpoint, encoder):
+        for _ in json_encode_chunks(self.payload, encoder=self.encoder):
+            pass
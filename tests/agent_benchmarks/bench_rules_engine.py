@@ -0,0 +1,129 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from newrelic.core.rules_engine import RulesEngine
+
+
+def _rule(match_expression, replacement, eval_order, each_segment=False, terminate_chain=False, ignore=False):
+    return {
+        "match_expression": match_expression,
+        "replacement": replacement,
+        "ignore": ignore,
+        "eval_order": eval_order,
+        "terminate_chain": terminate_chain,
+        "each_segment": each_segment,
+        "replace_all": False,
+    }
+
+
+# A set of URL rules typical of those sent by the data collector. These
+# are the default rules along with rules for an application which has
+# had a number of its URL paths collapsed.
+
+URL_RULES = [
+    _rule(r"^[0-9][0-9a-f_,.-]*$", "*", 1, each_segment=True),
+    _rule(r"^(.*)/[0-9][0-9a-f_,-]*\.([0-9a-z][0-9a-z]*)$", "\\1/.*\\2", 2),
+    _rule(
+        r".*\.(css|gif|ico|jpe?g|js|png|swf|eot|ttf|woff2?|svg)$",
+        "/*.\\1",
+        3,
+        terminate_chain=True,
+    ),
+]
+
+URL_RULES.extend(
+    _rule(r"^/api/v1/%s/[a-z0-9-]{36}(/.*)?$" % resource, "/api/v1/%s/*\\1" % resource, 10 + index)
+    for index, resource in enumerate(
+        (
+            "accounts",
+            "addresses",
+            "alerts",
+            "applications",
+            "baskets",
+            "campaigns",
+            "carts",
+            "catalogs",
+            "comments",
+            "coupons",
+            "customers",
+            "deliveries",
+            "devices",
+            "discounts",
+            "documents",
+            "events",
+            "exports",
+            "feeds",
+            "files",
+            "groups",
+            "imports",
+            "invoices",
+            "items",
+            "jobs",
+            "labels",
+            "messages",
+            "notes",
+            "notifications",
+            "orders",
+            "organizations",
+            "payments",
+            "permissions",
+            "products",
+            "profiles",
+            "projects",
+            "refunds",
+            "reports",
+            "reviews",
+            "roles",
+            "sessions",
+            "shipments",
+            "subscriptions",
+            "tags",
+            "tasks",
+            "teams",
+            "tickets",
+            "tokens",
+            "users",
+            "webhooks",
+            "workflows",
+        )
+    )
+)
+
+URL_RULES.append(_rule(r"^/(healthcheck|ping|status)$", "", 100, terminate_chain=True, ignore=True))
+
+NAMES = {
+    "unmatched": ["/api/v1/orders", "/checkout/confirm", "/account/settings", "/search"],
+    "matched": ["/api/v1/orders/%036d/items" % 1, "/static/app.min.js", "/products/1234", "/ping"],
+}
+
+
+class TimeRulesEngineNormalize(object):
+    """Normalizes URLs using a realistic set of more than 50 URL rules,
+    for URLs which no rule matches and URLs which some rule matches.
+
+    """
+
+    params = (["unmatched", "matched"],)
+    param_names = ["names"]
+
+    def setup(self, names):
+        self.rules_engine = RulesEngine(URL_RULES)
+        self.names = NAMES[names]
+
+    def time_normalize(self, names):
+        normalize = self.rules_engine.normalize
+        for _ in range(100):
+            for name in self.names:
+                normalize(name)
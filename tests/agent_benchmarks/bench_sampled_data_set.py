@@ -0,0 +1,52 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+
+from newrelic.core.stats_engine import SampledDataSet
+
+
+def _add_merge(data_set, other_data_set):
+    for priority, _, sample in other_data_set.pq:
+        data_set.add(sample, priority)
+    data_set.num_seen += other_data_set.num_seen - other_data_set.num_samples
+
+
+class TimeSpanEventsMerge(object):
+    """Merges the span events of many transactions into a span event
+    reservoir, as is done when recording transactions, comparing adding
+    the span events one at a time against the bulk merge.
+
+    """
+
+    params = ([10, 100, 1000], ["add", "merge"])
+    param_names = ["spans", "mode"]
+
+    def setup(self, spans, mode):
+        rng = random.Random(0)
+        self.transactions = []
+        for _ in range(50):
+            priority = rng.random() + rng.choice((0, 1))
+            data_set = SampledDataSet(spans)
+            for span in range(spans):
+                data_set.add(span, priority)
+            self.transactions.append(data_set)
+
+        self.merge = _add_merge if mode == "add" else SampledDataSet.merge
+
+    def time_merge(self, spans, mode):
+        data_set = SampledDataSet(2000)
+        for transaction in self.transactions:
+            self.merge(data_set, transaction)
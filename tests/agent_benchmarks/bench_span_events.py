@@ -0,0 +1,147 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import random
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+from newrelic.core.stats_engine import SpanEventDataSet
+from newrelic.core.transaction_node import TransactionNode
+
+
+def _function_node(index, children=()):
+    return FunctionNode(
+        group="Function",
+        name="app.models:Model.save",
+        children=children,
+        start_time=1.0,
+        end_time=1.001,
+        duration=0.001,
+        exclusive=0.001,
+        label=None,
+        params=None,
+        rollup=None,
+        guid="%016x" % index,
+        agent_attributes={"code.function": "save", "code.namespace": "app.models.Model"},
+        user_attributes={"tenant": "acme"},
+    )
+
+
+def _root_node(children):
+    return RootNode(
+        name="Function/main",
+        children=children,
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.0,
+        guid="0000000000000000",
+        agent_attributes={},
+        user_attributes={},
+        path="OtherTransaction/Function/main",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+
+def _deep_tree(depth):
+    # A chain of nested calls, as from recursive code.
+
+    node = None
+    for index in range(depth, 0, -1):
+        node = _function_node(index, node and (node,) or ())
+    return _root_node((node,))
+
+
+def _wide_tree(width):
+    # Many calls from the one function, as from an ORM issuing a query
+    # for each item in a loop.
+
+    return _root_node(tuple(_function_node(index) for index in range(width)))
+
+
+TREES = {
+    "deep": lambda: _deep_tree(500),
+    "wide": lambda: _wide_tree(2000),
+}
+
+
+class TimeSpanEvents(object):
+    """Generates the span events for synthetic trace trees which are deep
+    or wide.
+
+    """
+
+    params = (["deep", "wide"],)
+    param_names = ["tree"]
+
+    def setup(self, tree):
+        self.settings = finalize_application_settings({})
+        self.root = TREES[tree]()
+        self.base_attrs = {
+            "transactionId": "4485b89db608aece",
+            "traceId": "4485b89db608aece4485b89db608aece",
+            "sampled": True,
+            "priority": 1.5,
+        }
+
+    def time_span_events(self, tree):
+        for _ in self.root.span_events(self.settings, self.base_attrs):
+            pass
+
+
+class _Transaction(object):
+    _span_event_base_attrs = TransactionNode._span_event_base_attrs
+    span_events = TransactionNode.span_events
+    span_event_references = TransactionNode.span_event_references
+
+    def __init__(self, index, priority):
+        self.guid = "%016x" % index
+        self.trace_id = self.guid * 2
+        self.sampled = True
+        self.priority = priority
+        self.parent_span = None
+        self.root = _wide_tree(200)
+
+
+class TimeSpanEventReservoir(object):
+    """Records the spans of many sampled transactions into a span event
+    reservoir and reads back the survivors, as at harvest, with span
+    events built either up front or only for the survivors.
+
+    """
+
+    params = (["eager", "lazy"],)
+    param_names = ["mode"]
+
+    def setup(self, mode):
+        self.settings = finalize_application_settings({})
+        rng = random.Random(0)
+        self.transactions = [_Transaction(index, rng.random() + 1.0) for index in range(100)]
+
+    def time_record_and_harvest(self, mode):
+        data_set = SpanEventDataSet(2000)
+        settings = self.settings
+
+        for transaction in self.transactions:
+            if mode == "lazy":
+                data_set.add_references(transaction, settings)
+            else:
+                for event in transaction.span_events(settings):
+                    data_set.add(event, priority=transaction.priority)
+
+        list(data_set)
@@ -0,0 +1,76 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+from newrelic.core.database_utils import SQLStatement
+
+
+class DummyDatabase(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+def _orm_select():
+    # A SELECT of the size generated by ORMs for a model with many fields,
+    # filtered on a long IN list, string comparisons and other literals.
+
+    columns = ", ".join('"app_order"."field_%d" AS "col_%d"' % (i, i) for i in range(200))
+    ids = ", ".join(str(1000 + i * 37) for i in range(500))
+    names = " OR ".join("\"app_order\".\"name\" = 'name''s %d'" % i for i in range(50))
+
+    return (
+        "/* controller:orders,action:index */ SELECT %s FROM \"app_order\" "
+        'INNER JOIN "app_customer" ON ("app_order"."customer_id" = "app_customer"."id") '
+        'WHERE ("app_order"."id" IN (%s) AND (%s) AND "app_order"."total" > 12.5e3 '
+        "AND \"app_order\".\"uuid\" = '12345678-1234-1234-1234-123456789abc' AND \"app_order\".\"paid\" = true) "
+        '-- orders\nORDER BY "app_order"."created" DESC LIMIT 21' % (columns, ids, names)
+    )
+
+
+def _orm_insert():
+    # A bulk INSERT using the 'format' param style.
+
+    values = ", ".join("(%s, %s, %s, %s)" for _ in range(1000))
+
+    return 'INSERT INTO "app_item" ("order_id", "sku", "quantity", "price") VALUES ' + values
+
+
+STATEMENTS = {
+    "select": _orm_select(),
+    "insert": _orm_insert(),
+}
+
+
+class TimeSQLStatement(object):
+    """Obfuscates and normalizes large statements of the kind generated
+    by ORMs, for each of the quoting styles.
+
+    """
+
+    params = (["select", "insert"], ["single", "single+double", "single+dollar", "single+oracle"])
+    param_names = ["statement", "quoting_style"]
+
+    def setup(self, statement, quoting_style):
+        self.sql = STATEMENTS[statement]
+        self.database = DummyDatabase(quoting_style)
+
+    def time_obfuscated(self, statement, quoting_style):
+        SQLStatement(self.sql, self.database).obfuscated
+
+    def time_normalized(self, statement, quoting_style):
+        SQLStatement(self.sql, self.database).normalized
+
+    def time_target(self, statement, quoting_style):
+        SQLStatement(self.sql, self.database).target
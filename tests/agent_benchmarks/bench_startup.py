@@ -0,0 +1,77 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import subprocess
+import sys
+
+try:
+    from importlib.util import find_spec
+except ImportError:
+    find_spec = None
+
+# The frameworks which have tests in tests/framework_*, along with the
+# module imported to start an application for each.
+
+FRAMEWORKS = {
+    "none": None,
+    "aiohttp": "aiohttp.web",
+    "bottle": "bottle",
+    "cherrypy": "cherrypy",
+    "django": "django.core.handlers.wsgi",
+    "falcon": "falcon",
+    "fastapi": "fastapi",
+    "flask": "flask",
+    "pyramid": "pyramid.config",
+    "sanic": "sanic",
+    "starlette": "starlette.applications",
+    "tornado": "tornado.web",
+}
+
+AGENT = "import newrelic.agent; newrelic.agent.initialize(); "
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TimeStartup(object):
+    """Starts an interpreter which imports a framework, either bare or with
+    the agent initialized first, to measure what the agent adds to startup.
+
+    """
+
+    params = (sorted(FRAMEWORKS), ["bare", "agent"])
+    param_names = ["framework", "mode"]
+
+    def setup(self, framework, mode):
+        module = FRAMEWORKS[framework]
+
+        if module and (find_spec is None or find_spec(module.split(".")[0]) is None):
+            raise NotImplementedError("%s is not installed" % framework)
+
+        code = module and "import %s" % module or "pass"
+
+        if mode == "agent":
+            code = AGENT + code
+
+        self.command = [sys.executable, "-c", code]
+
+        self.environ = dict(os.environ)
+        self.environ.pop("NEW_RELIC_CONFIG_FILE", None)
+        self.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT_DIRECTORY, os.environ.get("PYTHONPATH")]))
+        self.environ["NEW_RELIC_LICENSE_KEY"] = "0" * 40
+        self.environ["NEW_RELIC_STARTUP_TIMEOUT"] = "0"
+
+    def time_startup(self, framework, mode):
+        subprocess.check_call(self.command, env=self.environ)
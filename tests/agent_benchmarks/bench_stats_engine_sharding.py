@@ -0,0 +1,78 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.metric import TimeMetric
+from newrelic.core.stats_engine import StatsEngine, StatsEngineShards
+
+TRANSACTIONS_PER_THREAD = 200
+
+
+class TimeRecordTransactionContention(object):
+    """Compares merging per transaction stats into the main stats engine
+    under a single lock against merging into stats engine shards, with
+    many threads recording transactions at the same time.
+
+    """
+
+    params = ([1, 8, 32], ["locked", "sharded"])
+    param_names = ["threads", "mode"]
+
+    def setup(self, threads, mode):
+        self.stats_engine = StatsEngine()
+        self.stats_engine.reset_stats(finalize_application_settings())
+        self.stats_lock = threading.RLock()
+        self.stats_shards = StatsEngineShards(self.stats_engine, 16)
+
+        self.metrics = [
+            TimeMetric(
+                name="Function/handler_%d" % i,
+                scope="WebTransaction/Function/app:index",
+                duration=0.01,
+                exclusive=0.01,
+            )
+            for i in range(50)
+        ]
+
+    def _record_locked(self):
+        for _ in range(TRANSACTIONS_PER_THREAD):
+            stats = self.stats_engine.create_workarea()
+            stats.record_time_metrics(self.metrics)
+
+            with self.stats_lock:
+                self.stats_engine.merge(stats)
+
+    def _record_sharded(self):
+        for _ in range(TRANSACTIONS_PER_THREAD):
+            stats = self.stats_engine.create_workarea()
+            stats.record_time_metrics(self.metrics)
+
+            self.stats_shards.current_shard().merge_transaction(stats, ())
+
+    def time_record_transactions(self, threads, mode):
+        target = self._record_sharded if mode == "sharded" else self._record_locked
+
+        workers = [threading.Thread(target=target) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if mode == "sharded":
+            with self.stats_lock:
+                snapshot = self.stats_engine.harvest_snapshot()
+            self.stats_shards.harvest(snapshot)
@@ -15,8 +15,24 @@
 from concurrent import futures
 
 import grpc
+from newrelic.core.infinite_tracing_batch_pb2 import SpanBatch
 from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span
 
+# Messages received by the handlers, as a list of spans for each message.
+RECEIVED = []
+
+
+def _check_span(span, context):
+    # Returns False if the stream should be ended by the server.
+    status_code = span.intrinsics.get('status_code', None)
+    status_code = status_code and getattr(
+        grpc.StatusCode, status_code.string_value)
+    if status_code is grpc.StatusCode.OK:
+        return False
+    elif status_code:
+        context.abort(status_code, "Abort triggered by client")
+    return True
+
 
 def record_span(request, context):
     metadata = dict(context.invocation_metadata())
@@ -24,24 +40,53 @@ def record_span(request, context):
     assert 'license_key' in metadata
 
     for span in request:
-        status_code = span.intrinsics.get('status_code', None)
-        status_code = status_code and getattr(
-            grpc.StatusCode, status_code.string_value)
-        if status_code is grpc.StatusCode.OK:
+        if not _check_span(span, context):
             break
-        elif status_code:
-            context.abort(status_code, "Abort triggered by client")
+
+        RECEIVED.append([span])
 
         yield RecordStatus(messages_seen=1)
 
 
+def record_span_batch(request, context):
+    metadata = dict(context.invocation_metadata())
+    assert 'agent_run_token' in metadata
+    assert 'license_key' in metadata
+
+    for span_batch in request:
+        for span in span_batch.spans:
+            if not _check_span(span, context):
+                return
+
+        RECEIVED.append(list(span_batch.spans))
+
+        yield RecordStatus(messages_seen=len(span_batch.spans))
+
+
+RECORD_SPAN_HANDLER = grpc.stream_stream_rpc_method_handler(
+    record_span, Span.FromString, RecordStatus.SerializeToString
+)
+
+RECORD_SPAN_BATCH_HANDLER = grpc.stream_stream_rpc_method_handler(
+    record_span_batch, SpanBatch.FromString, RecordStatus.SerializeToString
+)
+
 HANDLERS = (
     grpc.method_handlers_generic_handler(
         "com.newrelic.trace.v1.IngestService",
         {
-            "RecordSpan": grpc.stream_stream_rpc_method_handler(
-                record_span, Span.FromString, RecordStatus.SerializeToString
-            )
+            "RecordSpan": RECORD_SPAN_HANDLER,
+            "RecordSpanBatch": RECORD_SPAN_BATCH_HANDLER,
+        },
+    ),
+)
+
+# Handlers for a trace observer which does not support span batches.
+SINGLE_SPAN_HANDLERS = (
+    grpc.method_handlers_generic_handler(
+        "com.newrelic.trace.v1.IngestService",
+        {
+            "RecordSpan": RECORD_SPAN_HANDLER,
         },
     ),
 )
@@ -65,6 +65,24 @@ def mock_grpc_server(grpc_app_server):
     return port
 
 
+@pytest.fixture(scope="function")
+def mock_grpc_server_without_batching():
+    from _test_handler import SINGLE_SPAN_HANDLERS
+
+    with MockExternalgRPCServer() as server:
+        server.add_generic_rpc_handlers(SINGLE_SPAN_HANDLERS)
+        yield server.port
+
+
+@pytest.fixture(scope="function")
+def received_spans():
+    from _test_handler import RECEIVED
+
+    del RECEIVED[:]
+    yield RECEIVED
+    del RECEIVED[:]
+
+
 class SetEventOnWait(CONDITION_CLS):
     def __init__(self, event, *args, **kwargs):
         super(SetEventOnWait, self).__init__(*args, **kwargs)
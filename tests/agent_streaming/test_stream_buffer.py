@@ -0,0 +1,110 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+from newrelic.common.streaming_utils import StreamBuffer
+
+
+class CountingCondition(object):
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.notifications = 0
+
+    def __enter__(self):
+        return self._condition.__enter__()
+
+    def __exit__(self, *args):
+        return self._condition.__exit__(*args)
+
+    def wait(self, *args, **kwargs):
+        return self._condition.wait(*args, **kwargs)
+
+    def notify_all(self):
+        self.notifications += 1
+        self._condition.notify_all()
+
+
+def test_put_many_accounting():
+    stream_buffer = StreamBuffer(5)
+
+    stream_buffer.put_many(range(3))
+    stream_buffer.put_many(iter(range(3, 7)))
+    stream_buffer.put_many([])
+
+    assert stream_buffer.stats() == (7, 2)
+    assert list(stream_buffer._queue) == [2, 3, 4, 5, 6]
+
+
+def test_put_many_after_shutdown():
+    stream_buffer = StreamBuffer(5)
+    stream_buffer.shutdown()
+    stream_buffer.put_many(range(3))
+
+    assert stream_buffer.stats() == (0, 0)
+
+
+def test_put_only_notifies_waiting_consumer(monkeypatch):
+    condition = CountingCondition()
+    monkeypatch.setattr(StreamBuffer, "condition", staticmethod(lambda: condition))
+
+    stream_buffer = StreamBuffer(10)
+    stream_buffer.put(0)
+    stream_buffer.put_many(range(1, 3))
+
+    assert condition.notifications == 0
+
+    iterator = iter(stream_buffer)
+    assert [next(iterator) for _ in range(3)] == [0, 1, 2]
+
+    items = []
+    consumer = threading.Thread(target=lambda: items.append(next(iterator)))
+    consumer.start()
+
+    while not stream_buffer._waiting:
+        consumer.join(0.01)
+
+    stream_buffer.put_many(range(3, 5))
+    consumer.join(5)
+
+    assert items == [3]
+    assert condition.notifications == 1
+
+
+def test_iterator_drains_in_batches():
+    stream_buffer = StreamBuffer(10, batch_size=4)
+    stream_buffer.put_many(range(10))
+
+    iterator = iter(stream_buffer)
+
+    assert next(iterator) == 0
+    assert list(stream_buffer._queue) == list(range(4, 10))
+    assert [next(iterator) for _ in range(9)] == list(range(1, 10))
+
+
+def test_iterator_shutdown_requeues_batch():
+    stream_buffer = StreamBuffer(10, batch_size=4)
+    stream_buffer.put_many(range(6))
+
+    iterator = iter(stream_buffer)
+    assert next(iterator) == 0
+
+    iterator.shutdown()
+    assert list(stream_buffer._queue) == list(range(1, 6))
+
+    # A new iterator picks up the items not consumed
+    iterator = iter(stream_buffer)
+    assert [next(iterator) for _ in range(5)] == list(range(1, 6))
+    assert stream_buffer.stats() == (6, 0)
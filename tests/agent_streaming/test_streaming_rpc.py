@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import threading
+import time
 
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.common.streaming_utils import StreamBuffer
@@ -104,3 +105,84 @@ def test_close_while_awaiting_reconnect(mock_grpc_server, monkeypatch):
     rpc.close()
     # Make sure the processing_thread is closed
     assert not rpc.response_processing_thread.is_alive()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_batching_sends_span_batches(mock_grpc_server, received_spans):
+    endpoint = "localhost:%s" % mock_grpc_server
+    stream_buffer = StreamBuffer(10)
+
+    spans = [Span(trace_id=str(i), intrinsics={}, agent_attributes={}, user_attributes={}) for i in range(5)]
+    stream_buffer.put_many(spans)
+
+    rpc = StreamingRpc(
+        endpoint, stream_buffer, DEFAULT_METADATA, record_metric, ssl=False, batching=True, batch_size=2
+    )
+
+    rpc.connect()
+    try:
+        assert _wait_for(lambda: sum(len(batch) for batch in received_spans) == 5)
+    finally:
+        rpc.close()
+
+    assert [len(batch) for batch in received_spans] == [2, 2, 1]
+    assert [span.trace_id for batch in received_spans for span in batch] == [str(i) for i in range(5)]
+
+
+def test_batching_limits_batch_bytes(mock_grpc_server, received_spans):
+    endpoint = "localhost:%s" % mock_grpc_server
+    stream_buffer = StreamBuffer(10)
+
+    spans = [Span(trace_id="a" * 50, intrinsics={}, agent_attributes={}, user_attributes={}) for _ in range(4)]
+    stream_buffer.put_many(spans)
+
+    rpc = StreamingRpc(
+        endpoint,
+        stream_buffer,
+        DEFAULT_METADATA,
+        record_metric,
+        ssl=False,
+        batching=True,
+        batch_max_bytes=spans[0].ByteSize() * 3,
+    )
+
+    rpc.connect()
+    try:
+        assert _wait_for(lambda: sum(len(batch) for batch in received_spans) == 4)
+    finally:
+        rpc.close()
+
+    assert [len(batch) for batch in received_spans] == [3, 1]
+
+
+def test_batching_falls_back_on_unimplemented(mock_grpc_server_without_batching, received_spans):
+    endpoint = "localhost:%s" % mock_grpc_server_without_batching
+    stream_buffer = StreamBuffer(10)
+
+    metrics = []
+
+    def _record_metric(name, value):
+        metrics.append(name)
+
+    rpc = StreamingRpc(endpoint, stream_buffer, DEFAULT_METADATA, _record_metric, ssl=False, batching=True)
+
+    rpc.connect()
+    try:
+        # Spans sent as a batch may be lost when the trace observer rejects
+        # the batch method, so keep sending until single spans are received.
+        assert _wait_for(lambda: stream_buffer.put(Span(trace_id="a")) or received_spans)
+    finally:
+        rpc.close()
+
+    assert not rpc.batching
+    assert "Supportability/InfiniteTracing/Span/Batching/Unimplemented" in metrics
+    assert "Supportability/InfiniteTracing/Span/Response/Error" not in metrics
+    assert all(len(message) == 1 for message in received_spans)
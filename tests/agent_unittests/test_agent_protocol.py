@@ -205,6 +205,16 @@ def test_send(status_code):
     assert protocol.finalize() is None
 
 
+@pytest.mark.parametrize("json_encoder", ("stdlib", "orjson", "auto"))
+def test_send_json_encoder(json_encoder):
+    settings = finalize_application_settings({"json_encoder": json_encoder})
+    protocol = AgentProtocol(settings, client_cls=HttpClientRecorder)
+    protocol.send("metric_data", ("RUN_TOKEN", {"key": b"value"}, (i for i in range(3))))
+
+    request = HttpClientRecorder.SENT[0]
+    assert json_decode(request.payload.decode("utf-8")) == ["RUN_TOKEN", {"key": "value"}, [0, 1, 2]]
+
+
 @pytest.mark.parametrize(
     "status_code,expected_exc,log_level",
     (
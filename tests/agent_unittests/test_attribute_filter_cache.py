@@ -0,0 +1,106 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+
+from newrelic.core.attribute_filter import (
+    DST_ALL,
+    DST_ERROR_COLLECTOR,
+    DST_SPAN_EVENTS,
+    DST_TRANSACTION_EVENTS,
+    AttributeFilter,
+)
+
+
+def _settings(**settings):
+    flattened_settings = {
+        "attributes.enabled": True,
+        "transaction_events.attributes.enabled": True,
+        "transaction_tracer.attributes.enabled": True,
+        "error_collector.attributes.enabled": True,
+        "browser_monitoring.attributes.enabled": True,
+        "span_events.attributes.enabled": True,
+        "transaction_segments.attributes.enabled": True,
+    }
+    flattened_settings.update(settings)
+    return flattened_settings
+
+
+def _linear_apply(attribute_filter, name, default_destinations):
+    destinations = attribute_filter.enabled_destinations & default_destinations
+    for rule in attribute_filter.rules:
+        if rule.name_match(name):
+            if rule.is_include:
+                destinations |= rule.destinations & attribute_filter.enabled_destinations
+            else:
+                destinations &= ~rule.destinations
+    return destinations
+
+
+def test_rules_index_matches_linear_scan():
+    rng = random.Random(0)
+    alphabet = "ab."
+
+    def random_name():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+
+    def random_rules():
+        return [random_name() + rng.choice(("", "*")) for _ in range(rng.randint(0, 4))]
+
+    for _ in range(200):
+        attribute_filter = AttributeFilter(
+            _settings(
+                **{
+                    "attributes.include": random_rules(),
+                    "attributes.exclude": random_rules(),
+                    "span_events.attributes.include": random_rules(),
+                    "error_collector.attributes.exclude": random_rules(),
+                }
+            )
+        )
+
+        for _ in range(20):
+            name = random_name()
+            for default_destinations in (DST_ALL, DST_TRANSACTION_EVENTS, DST_SPAN_EVENTS | DST_ERROR_COLLECTOR):
+                expected = _linear_apply(attribute_filter, name, default_destinations)
+                assert attribute_filter.apply(name, default_destinations) == expected
+
+
+def test_cache_is_bounded():
+    attribute_filter = AttributeFilter(
+        _settings(**{"attributes.exclude": ["request.*"], "agent_limits.attribute_filter_cache_size": 3})
+    )
+
+    for index in range(10):
+        attribute_filter.apply("request.id.%d" % index, DST_ALL)
+
+    assert len(attribute_filter.cache) == 3
+    assert attribute_filter.cache_stats() == (0, 10, 7)
+    assert attribute_filter.cache_stats() == (0, 0, 0)
+
+
+def test_cache_evicts_unreferenced_entries():
+    attribute_filter = AttributeFilter(_settings(**{"agent_limits.attribute_filter_cache_size": 2}))
+
+    attribute_filter.apply("a", DST_ALL)
+    attribute_filter.apply("b", DST_ALL)
+
+    # Referencing "a" gives it a second chance so "b" is evicted instead
+    attribute_filter.apply("a", DST_ALL)
+    attribute_filter.apply("c", DST_ALL)
+
+    assert ("a", DST_ALL) in attribute_filter.cache
+    assert ("b", DST_ALL) not in attribute_filter.cache
+    assert attribute_filter.cache_stats() == (1, 3, 1)
@@ -0,0 +1,138 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import inspect
+
+import pytest
+
+from newrelic.core import code_level_metrics
+from newrelic.core.code_level_metrics import extract_code_from_callable
+
+
+class Slotted(object):
+    __slots__ = ()
+
+    def method(self):
+        pass
+
+
+class SlottedChild(Slotted):
+    __slots__ = ()
+
+
+class Callable(object):
+    def __call__(self):
+        pass
+
+
+class NotCallable(object):
+    pass
+
+
+class Located(object):
+    @staticmethod
+    def method():
+        pass
+
+    @property
+    def value(self):
+        pass
+
+
+Located.other = Callable.__call__
+
+
+@pytest.fixture
+def source_reads(monkeypatch):
+    code_level_metrics._source_code_cache.clear()
+
+    reads = []
+    getsourcelines = inspect.getsourcelines
+
+    def _getsourcelines(obj):
+        reads.append(obj)
+        return getsourcelines(obj)
+
+    monkeypatch.setattr(inspect, "getsourcelines", _getsourcelines)
+
+    yield reads
+
+    code_level_metrics._source_code_cache.clear()
+
+
+def test_bound_method_of_slotted_class_cached(source_reads):
+    node = extract_code_from_callable(Slotted().method)
+
+    assert node.namespace == __name__ + ".Slotted"
+    assert extract_code_from_callable(Slotted().method) is node
+
+    # The same method bound to an instance of a subclass is reported
+    # against the subclass.
+    child_node = extract_code_from_callable(SlottedChild().method)
+
+    assert child_node.namespace == __name__ + ".SlottedChild"
+    assert child_node.lineno == node.lineno
+    assert not source_reads
+
+
+def test_callable_object_read_from_code_object(source_reads):
+    node = extract_code_from_callable(Callable())
+
+    assert node.function == "__call__"
+    assert node.namespace == __name__ + ".Callable"
+    assert node.lineno == Callable.__call__.__code__.co_firstlineno
+    assert extract_code_from_callable(Callable()) is node
+    assert not source_reads
+
+
+def test_class_source_not_read(source_reads):
+    node = extract_code_from_callable(NotCallable)
+
+    assert node.namespace == __name__
+    assert node.function == "NotCallable"
+    assert node.filepath == __file__
+    assert node.lineno == getattr(NotCallable, "__firstlineno__", None)
+    assert extract_code_from_callable(NotCallable) is node
+    assert not source_reads
+
+
+def test_class_line_from_class_body(source_reads):
+    node = extract_code_from_callable(Located)
+
+    assert extract_code_from_callable(Located) is node
+    assert not source_reads
+
+    # The line of the class is found from the functions defined in its body
+    # rather than by reading the source file.
+    assert node.lineno == inspect.getsourcelines(Located)[1]
+
+
+def test_cache_size_bounded(source_reads):
+    # Each function is defined on a different line, so has a distinct
+    # code object.
+    functions = []
+    for lineno in range(5):
+        namespace = {"__name__": __name__}
+        exec("\n" * lineno + "def function(): pass", namespace)
+        functions.append(namespace["function"])
+
+    for function in functions:
+        extract_code_from_callable(function, cache_size=3)
+
+    assert len(code_level_metrics._source_code_cache) == 3
+
+    extract_code_from_callable(functions[0], cache_size=0)
+
+    assert len(code_level_metrics._source_code_cache) == 3
@@ -0,0 +1,173 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import json
+
+import pytest
+
+from newrelic.common.encoding_utils import (
+    json_encode,
+    json_encode_chunks,
+    json_payload_encoder,
+    orjson,
+    register_json_type,
+)
+from newrelic.core.stats_engine import SampledDataSet, SpanEventDataSet, TimeStats
+
+
+def _sampled_data_set():
+    events = SampledDataSet(capacity=3)
+    for index in range(3):
+        events.add([{"type": "Span", "index": index}, {}, {}])
+    return events
+
+
+PAYLOADS = {
+    "empty_list": [],
+    "empty_tuple": (),
+    "scalar": 1,
+    "string": "string",
+    "dict": {"key": [1, 2, 3]},
+    "nested": [1, [2, [3, [4, []]]]],
+    "bytes": ("run_id", [b"\xff"]),
+    "events": ("run_id", {"events_seen": 1000}, [[{"guid": "%016x" % i}, {}, {"attr": u"é"}] for i in range(1000)]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(PAYLOADS))
+@pytest.mark.parametrize("chunk_size", (1, 1024, 64 * 1024))
+def test_json_encode_chunks(name, chunk_size):
+    payload = PAYLOADS[name]
+
+    chunks = list(json_encode_chunks(payload, chunk_size=chunk_size))
+
+    assert b"".join(chunks) == json_encode(payload).encode("utf-8")
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+
+
+def test_json_encode_chunks_iterables():
+    events = _sampled_data_set()
+    payload = ("run_id", (i for i in range(3)), events)
+
+    expected = json_encode(("run_id", [0, 1, 2], list(events)))
+
+    assert b"".join(json_encode_chunks(payload)) == expected.encode("utf-8")
+
+
+def test_json_encode_chunks_size():
+    events = [[{"guid": "%016x" % i}, {}, {}] for i in range(1000)]
+
+    chunks = list(json_encode_chunks(("run_id", {}, events), chunk_size=1024))
+
+    # Chunks are only cut once at least the chunk size has been reached,
+    # and the events are never all encoded into a single chunk.
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 1024 for chunk in chunks[:-1])
+
+
+ENCODERS = (
+    "stdlib",
+    pytest.param("orjson", marks=pytest.mark.skipif(orjson is None, reason="orjson is not installed")),
+)
+
+Point = collections.namedtuple("Point", ("x", "y"))
+
+
+class Iterable(object):
+    def __iter__(self):
+        return iter((1, 2))
+
+
+class Custom(object):
+    pass
+
+
+def test_json_payload_encoder_names():
+    stdlib = json_payload_encoder("stdlib")
+
+    assert json_payload_encoder() is stdlib
+    assert json_payload_encoder("unknown") is stdlib
+
+    if orjson is None:
+        assert json_payload_encoder("orjson") is stdlib
+        assert json_payload_encoder("auto") is stdlib
+    else:
+        assert json_payload_encoder("orjson") is not stdlib
+        assert json_payload_encoder("auto") is json_payload_encoder("orjson")
+
+
+ENCODER_PAYLOADS = {
+    "events": lambda: ("run_id", {"events_seen": 2}, [[{"guid": "0"}, {"bytes": b"\xff"}, {"text": u"\u00e9"}]]),
+    "generator": lambda: (i for i in range(3)),
+    "namedtuple": lambda: Point(1, 2),
+    "iterable": lambda: Iterable(),
+    "integer_key": lambda: {1: "integer key"},
+    "time_stats": lambda: [TimeStats(1, 2.0, 1.0, 2.0, 3.0, 4.0)],
+    "big_integer": lambda: 2**70,
+    "surrogate": lambda: u"\ud800",
+    "generator_then_big_integer": lambda: ["a", (i for i in range(3)), 2**70],
+    "nested_generators": lambda: [(str(i) for i in range(2)), ((i for i in range(2)) for _ in range(2)), u"\ud800"],
+}
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+@pytest.mark.parametrize("name", sorted(ENCODER_PAYLOADS))
+def test_json_payload_encoders(encoder, name):
+    expected = json.loads(json_encode(ENCODER_PAYLOADS[name]()))
+
+    payload = json_payload_encoder(encoder)(ENCODER_PAYLOADS[name]())
+
+    assert isinstance(payload, bytes)
+    assert json.loads(payload.decode("utf-8")) == expected
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+def test_json_payload_encoders_unsupported_type(encoder):
+    with pytest.raises(TypeError):
+        json_payload_encoder(encoder)(Custom())
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+@pytest.mark.parametrize("data_set_cls", (SampledDataSet, SpanEventDataSet))
+def test_json_payload_encoders_data_sets(encoder, data_set_cls):
+    events = data_set_cls(capacity=3)
+    for index in range(3):
+        events.add([{"index": index}, {}, {}])
+
+    payload = json_payload_encoder(encoder)(("run_id", events))
+
+    assert sorted(json.loads(payload.decode("utf-8"))[1], key=lambda event: event[0]["index"]) == [
+        [{"index": index}, {}, {}] for index in range(3)
+    ]
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+def test_json_encode_chunks_encoder(encoder):
+    payload = PAYLOADS["events"]
+    encoder = json_payload_encoder(encoder)
+
+    chunks = list(json_encode_chunks(payload, chunk_size=1024, encoder=encoder))
+
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks).decode("utf-8")) == json.loads(json_encode(payload))
+
+
+def test_register_json_type():
+    class Registered(object):
+        pass
+
+    register_json_type(Registered, lambda o: "registered")
+
+    assert json_encode([Registered()]) == '["registered"]'
@@ -0,0 +1,239 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import time
+import types
+
+from newrelic.core.database_utils import SQLStatement, SQLDatabase, explain_plan
+from newrelic.core.explain_plan_executor import ExplainPlanExecutor
+
+
+class Cursor(object):
+    def __init__(self, dbapi2_module):
+        self.dbapi2_module = dbapi2_module
+        self.description = [("QUERY PLAN",)]
+
+    def execute(self, query, *args, **kwargs):
+        module = self.dbapi2_module
+
+        with module.lock:
+            module.queries.append(query)
+            module.running += 1
+            module.max_running = max(module.max_running, module.running)
+
+        module.proceed.wait(5.0)
+        time.sleep(module.delay)
+
+        with module.lock:
+            module.running -= 1
+
+    def fetchall(self):
+        return [("Seq Scan on users",)]
+
+
+class Connection(object):
+    def __init__(self, dbapi2_module):
+        self.dbapi2_module = dbapi2_module
+
+    def cursor(self, *args, **kwargs):
+        return Cursor(self.dbapi2_module)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def dbapi2_module(name, delay=0.0):
+    module = types.ModuleType(name)
+    module._nr_database_product = "Postgres"
+    module._nr_explain_query = "EXPLAIN"
+    module._nr_explain_stmts = ("select",)
+    module.lock = threading.Lock()
+    module.proceed = threading.Event()
+    module.proceed.set()
+    module.queries = []
+    module.running = 0
+    module.max_running = 0
+    module.delay = delay
+    module.connect = lambda *args, **kwargs: Connection(module)
+    module.NotSupportedError = Exception
+    return module
+
+
+CONNECT_PARAMS = ((), {})
+
+
+def run_explain_plan(connections, module, sql, connect_params=CONNECT_PARAMS):
+    statement = SQLStatement(sql, SQLDatabase(module))
+    return explain_plan(connections, statement, connect_params, None, None, None, "raw")
+
+
+def instance_info(args, kwargs):
+    return (kwargs.get("host"), kwargs.get("port", 5432), kwargs.get("database"))
+
+
+def test_explain_plan_cached_across_harvests():
+    module = dbapi2_module("explain_plan_cached")
+    executor = ExplainPlanExecutor("test", 2, 1, 60.0, 4)
+
+    try:
+        with executor.harvest(5.0) as connections:
+            first = run_explain_plan(connections, module, "SELECT * FROM users WHERE id = 1")
+
+        # A statement which only differs by the values used normalizes to
+        # the same statement and so uses the cached result.
+
+        with executor.harvest(5.0) as connections:
+            second = run_explain_plan(connections, module, "SELECT * FROM users WHERE id = 2")
+
+        assert first == (["QUERY PLAN"], [("Seq Scan on users",)])
+        assert second == first
+        assert module.queries == ["EXPLAIN SELECT * FROM users WHERE id = 1"]
+
+    finally:
+        executor.shutdown()
+
+
+def test_explain_plan_expires_from_cache():
+    module = dbapi2_module("explain_plan_expires")
+    executor = ExplainPlanExecutor("test", 1, 1, 0.0, 4)
+
+    try:
+        for _ in range(2):
+            with executor.harvest(5.0) as connections:
+                assert run_explain_plan(connections, module, "SELECT * FROM users")
+
+        assert len(module.queries) == 2
+
+    finally:
+        executor.shutdown()
+
+
+def test_explain_plan_completes_after_time_budget():
+    module = dbapi2_module("explain_plan_slow")
+    module.proceed.clear()
+    executor = ExplainPlanExecutor("test", 1, 1, 60.0, 4)
+
+    try:
+        with executor.harvest(0.05) as connections:
+            assert run_explain_plan(connections, module, "SELECT * FROM users") is None
+
+            # Requesting the same statement again within the harvest does
+            # not queue a second explain plan, and as the time budget has
+            # been used up, does not wait on the first either.
+
+            start = time.time()
+            assert run_explain_plan(connections, module, "SELECT * FROM users") is None
+            assert time.time() - start < 0.05
+
+        module.proceed.set()
+
+        with executor.harvest(5.0) as connections:
+            deadline = time.time() + 5.0
+            while run_explain_plan(connections, module, "SELECT * FROM users") is None and time.time() < deadline:
+                time.sleep(0.01)
+
+            assert run_explain_plan(connections, module, "SELECT * FROM users")
+
+        assert len(module.queries) == 1
+
+    finally:
+        executor.shutdown()
+
+
+def test_explain_plan_database_concurrency():
+    module = dbapi2_module("explain_plan_concurrency", delay=0.02)
+    executor = ExplainPlanExecutor("test", 4, 1, 60.0, 4)
+
+    try:
+        with executor.harvest(5.0) as connections:
+            threads = [
+                threading.Thread(
+                    target=run_explain_plan, args=(connections, module, "SELECT * FROM table_%d" % index)
+                )
+                for index in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert len(module.queries) == 4
+        assert module.max_running == 1
+
+    finally:
+        executor.shutdown()
+
+
+def test_explain_plan_cached_per_database():
+    module = dbapi2_module("explain_plan_per_database")
+    module._nr_instance_info = instance_info
+    executor = ExplainPlanExecutor("test", 2, 1, 60.0, 4)
+
+    primary = ((), {"host": "primary", "database": "app", "user": "web"})
+    replica = ((), {"host": "replica", "database": "app", "user": "web"})
+    reporting = ((), {"host": "primary", "database": "reporting", "user": "web"})
+    primary_other_user = ((), {"host": "primary", "database": "app", "user": "admin"})
+
+    try:
+        with executor.harvest(5.0) as connections:
+            for connect_params in (primary, replica, reporting, primary_other_user):
+                assert run_explain_plan(connections, module, "SELECT * FROM users", connect_params)
+
+        # Each database has its own cached result, with connections to the
+        # same database as a different user sharing the result.
+
+        assert len(module.queries) == 3
+
+    finally:
+        executor.shutdown()
+
+
+def test_explain_plan_concurrency_per_database():
+    module = dbapi2_module("explain_plan_concurrency_per_database")
+    module.proceed.clear()
+    executor = ExplainPlanExecutor("test", 4, 1, 60.0, 4)
+
+    try:
+        with executor.harvest(5.0) as connections:
+            threads = [
+                threading.Thread(
+                    target=run_explain_plan,
+                    args=(connections, module, "SELECT * FROM table_%d" % index, ((), {"host": "db%d" % index})),
+                )
+                for index in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+
+            # Explain plans against different databases using the same
+            # client module run at the same time.
+
+            deadline = time.time() + 5.0
+            while module.running < 2 and time.time() < deadline:
+                time.sleep(0.01)
+
+            module.proceed.set()
+
+            for thread in threads:
+                thread.join()
+
+        assert module.max_running == 2
+
+    finally:
+        executor.shutdown()
@@ -14,6 +14,7 @@
 
 import random
 import tempfile
+import threading
 import time
 
 import pytest
@@ -28,12 +29,13 @@ from newrelic.common.object_wrapper import function_wrapper, transient_function_
 from newrelic.core.application import Application
 from newrelic.core.config import finalize_application_settings, global_settings
 from newrelic.core.custom_event import create_custom_event
+from newrelic.core.deferred_recorder import DeferredRecorder
 from newrelic.core.error_node import ErrorNode
 from newrelic.core.function_node import FunctionNode
 from newrelic.core.root_node import RootNode
 from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
 from newrelic.core.transaction_node import TransactionNode
-from newrelic.network.exceptions import RetryDataForRequest
+from newrelic.network.exceptions import DiscardDataForRequest, RetryDataForRequest
 
 settings = global_settings()
 
@@ -464,6 +466,321 @@ def test_transaction_count(transaction_node):
     assert app._transaction_count == 0
 
 
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "stats_sharding.enabled": True,
+        "stats_sharding.shard_count": 4,
+    },
+)
+def test_stats_sharding(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    def record_transactions():
+        for _ in range(5):
+            app.record_transaction(transaction_node)
+
+    threads = [threading.Thread(target=record_transactions) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Transactions are recorded into the shards, not the main stats engine
+    assert app._transaction_count == 0
+    assert ("OtherTransaction/Function/main", "") not in app._stats_engine.stats_table
+    assert sum(shard.transaction_count for shard in app._stats_shards) == 30
+
+    # Harvest merges the shards into the snapshot taken from the main stats
+    # engine, without holding the lock for the main stats engine
+    snapshots = []
+
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngineShards.harvest")
+    def _capture_snapshot(wrapped, instance, args, kwargs):
+        acquired = []
+
+        def try_acquire():
+            if app._stats_lock.acquire(False):
+                acquired.append(True)
+                app._stats_lock.release()
+
+        thread = threading.Thread(target=try_acquire)
+        thread.start()
+        thread.join()
+        assert acquired == [True]
+
+        result = wrapped(*args, **kwargs)
+        snapshot = args[0]
+        snapshots.append((snapshot.transaction_events.num_seen, snapshot.stats_table.copy()))
+        return result
+
+    _capture_snapshot(app.harvest)()
+
+    transaction_events_seen, stats_table = snapshots[0]
+    assert transaction_events_seen == 30
+    assert stats_table[("OtherTransaction/Function/main", "")].call_count == 30
+    assert sum(shard.transaction_count for shard in app._stats_shards) == 0
+    assert all(shard.stats_engine.metrics_count() == 0 for shard in app._stats_shards)
+
+
+@failing_endpoint("analytic_event_data")
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "stats_sharding.enabled": True,
+        "stats_sharding.shard_count": 2,
+    },
+)
+def test_stats_sharding_flexible_harvest_rollback(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    # The stats engine shards share the settings of the main stats engine
+    app._stats_engine.settings.event_harvest_config.allowlist = frozenset(("analytic_event_data",))
+
+    for _ in range(5):
+        app.record_transaction(transaction_node)
+
+    app.harvest(flexible=True)
+
+    # Transaction events from the shards which failed to send are rolled
+    # back into the main stats engine
+    assert app._stats_engine.transaction_events.num_seen == 5
+
+    # Metrics are not part of the flexible harvest and are retained until
+    # the default harvest
+    stats_key = ("OtherTransaction/Function/main", "")
+    assert stats_key not in app._stats_engine.stats_table
+
+    snapshots = []
+
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngineShards.harvest")
+    def _capture_snapshot(wrapped, instance, args, kwargs):
+        result = wrapped(*args, **kwargs)
+        snapshots.append(args[0].stats_table.copy())
+        return result
+
+    _capture_snapshot(app.harvest)()
+
+    assert snapshots[0][stats_key].call_count == 5
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "concurrent_harvest.enabled": True,
+        "concurrent_harvest.max_workers": 3,
+    },
+)
+def test_concurrent_harvest(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    app.record_transaction(transaction_node)
+
+    endpoints_called = []
+
+    @validate_metric_payload(
+        metrics=[
+            ("OtherTransaction/Function/main", 1),
+            ("Supportability/Python/Collector/Duration/analytic_event_data", 1),
+            ("Supportability/Python/Collector/Duration/error_event_data", 1),
+            ("Supportability/Python/Collector/Duration/error_data", 1),
+        ],
+        endpoints_called=endpoints_called,
+    )
+    def _test():
+        app.harvest()
+
+    _test()
+
+    # The metric data is only sent once all other payloads have been sent
+    assert endpoints_called[-2:] == ["metric_data", "get_agent_commands"]
+    assert set(endpoints_called[:-2]) == {
+        "analytic_event_data",
+        "span_event_data",
+        "error_event_data",
+        "custom_event_data",
+        "error_data",
+    }
+
+    assert app._stats_engine.transaction_events.num_seen == 0
+    assert app._stats_engine.error_events.num_seen == 0
+
+    app.internal_agent_shutdown(restart=False)
+    assert app._harvest_upload_pool is None
+
+
+@pytest.mark.parametrize(
+    "raises,rolled_back",
+    (
+        (RetryDataForRequest, True),
+        (DiscardDataForRequest, False),
+    ),
+)
+def test_concurrent_harvest_rollback(transaction_node, raises, rolled_back):
+    @failing_endpoint("analytic_event_data", raises=raises)
+    @override_generic_settings(
+        settings,
+        {
+            "developer_mode": True,
+            "license_key": "**NOT A LICENSE KEY**",
+            "feature_flag": set(),
+            "concurrent_harvest.enabled": True,
+        },
+    )
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+
+        app.record_transaction(transaction_node)
+
+        endpoints_called = []
+
+        @validate_metric_payload(endpoints_called=endpoints_called)
+        def _harvest():
+            app.harvest()
+
+        _harvest()
+
+        # The other payloads are still sent, but the harvest is aborted
+        # before the metric data is sent.
+        assert "error_event_data" in endpoints_called
+        assert "metric_data" not in endpoints_called
+
+        # Only data which failed to send is rolled back
+        assert app._stats_engine.transaction_events.num_seen == int(rolled_back)
+        assert app._stats_engine.error_events.num_seen == 0
+
+        stats_key = ("OtherTransaction/Function/main", "")
+        assert (stats_key in app._stats_engine.stats_table) == rolled_back
+
+        app.internal_agent_shutdown(restart=False)
+
+    _test()
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "deferred_recording.enabled": True,
+        "deferred_recording.queue_size": 3,
+        "deferred_recording.batch_size": 100,
+    },
+)
+def test_deferred_recording(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    for _ in range(5):
+        app.record_transaction(transaction_node)
+
+    @validate_metric_payload(
+        metrics=[
+            ("OtherTransaction/Function/main", 3),
+            ("Supportability/Python/DeferredRecording/Recorded", 3),
+            ("Supportability/Python/DeferredRecording/Dropped", 2),
+        ],
+        endpoints_called=[],
+    )
+    def _test():
+        app.harvest()
+
+    _test()
+
+    assert app._transaction_count == 0
+    app.internal_agent_shutdown(restart=False)
+    assert app._deferred_recorder is None
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "deferred_recording.enabled": True,
+    },
+)
+def test_deferred_recording_reconnect():
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    recorder = app._deferred_recorder
+    thread = recorder._thread
+
+    # The background thread of the prior agent run is stopped when the
+    # application connects again.
+
+    app._active_session = None
+    app.connect_to_data_collector(None)
+
+    assert app._deferred_recorder is not recorder
+    assert not thread.is_alive()
+
+    app.internal_agent_shutdown(restart=False)
+
+
+def test_deferred_recorder_shutdown_records_queued():
+    recorded = []
+    recorder = DeferredRecorder("Python Agent Test (Harvest Loop)", recorded.extend, 10, 100)
+    recorder.start()
+
+    for index in range(3):
+        recorder.put(index)
+
+    recorder.shutdown()
+
+    # Transactions queued before shutdown are recorded, and those queued
+    # after it are dropped.
+
+    assert not recorder.put(3)
+    assert not recorder._thread.is_alive()
+    assert recorded == [0, 1, 2]
+    assert recorder.stats() == (3, 1)
+
+
+def test_deferred_recorder_after_fork():
+    recorded = []
+    recorder = DeferredRecorder("Python Agent Test (Harvest Loop)", recorded.extend, 10, 100)
+    recorder.start()
+    recorder.put("parent")
+
+    # Simulate the recorder being used in a process forked from the one the
+    # transaction was queued in. That transaction is left to the parent
+    # process to record, and a new background thread is started.
+
+    thread = recorder._thread
+    recorder._process_id = -1
+
+    recorder.put("child")
+
+    assert recorder._thread is not thread
+
+    recorder.shutdown()
+
+    thread.join(5.0)
+    assert not thread.is_alive()
+    assert recorded == ["child"]
+    assert recorder.stats() == (1, 0)
+
+
 @override_generic_settings(
     settings,
     {
@@ -871,7 +1188,9 @@ def test_default_events_harvested(allowlist_event):
     num_seen = 0 if (allowlist_event != "span_event_data") else 1
     assert app._stats_engine.span_events.num_seen == num_seen
 
-    assert app._stats_engine.metrics_count() == 1
+    # The harvest call metric and the durations of the requests sent after
+    # the metric data are reported in the next harvest.
+    assert app._stats_engine.metrics_count() == 3
 
 
 @failing_endpoint("analytic_event_data")
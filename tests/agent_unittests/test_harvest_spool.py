@@ -0,0 +1,275 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import tempfile
+import time
+
+import pytest
+from testing_support.fixtures import failing_endpoint, override_generic_settings
+
+from newrelic.common.object_wrapper import transient_function_wrapper
+from newrelic.core.application import Application
+from newrelic.core.config import global_settings
+from newrelic.core.harvest_spool import HarvestSpool
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
+
+settings = global_settings()
+
+
+@pytest.fixture
+def spool_directory():
+    return tempfile.mkdtemp()
+
+
+def make_spool(directory, max_bytes=1024 * 1024, replay_limit=10):
+    return HarvestSpool(directory, "**NOT A LICENSE KEY**", "Python Agent Test (Harvest Spool)", max_bytes, replay_limit)
+
+
+def test_spool_and_replay_in_order(spool_directory):
+    spool = make_spool(spool_directory)
+
+    assert spool.spool("analytic_event_data", ("run-1", {"events_seen": 1}, [[{"name": "a"}, {}, {}]]))
+    assert spool.spool("sql_trace_data", ([["sql"]],))
+    assert spool.spool("metric_data", ("run-1", 1.0, 2.0, [[{"name": "m"}, [1, 0, 0, 0, 0, 0]]]))
+
+    sent = []
+    spool.replay(lambda method, payload: sent.append((method, payload)), "run-2")
+
+    # The payloads are replayed oldest first against the current agent run.
+    assert sent == [
+        ("analytic_event_data", ["run-2", {"events_seen": 1}, [[{"name": "a"}, {}, {}]]]),
+        ("sql_trace_data", [[["sql"]]]),
+        ("metric_data", ["run-2", 1.0, 2.0, [[{"name": "m"}, [1, 0, 0, 0, 0, 0]]]]),
+    ]
+    assert os.listdir(spool.directory) == []
+    assert not spool.offline
+
+
+def test_spool_permissions(spool_directory):
+    spool = make_spool(os.path.join(spool_directory, "spool"))
+    spool.spool("error_data", ("run-1", [0]))
+
+    # Only the current user can access the spooled data.
+
+    assert stat.S_IMODE(os.stat(os.path.dirname(spool.directory)).st_mode) & 0o077 == 0
+    assert stat.S_IMODE(os.stat(spool.directory).st_mode) & 0o077 == 0
+
+    for name in os.listdir(spool.directory):
+        assert stat.S_IMODE(os.stat(os.path.join(spool.directory, name)).st_mode) & 0o077 == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="Ownership of directories is not checked on this platform.")
+def test_spool_refuses_directory_of_other_user(spool_directory, monkeypatch):
+    spool = make_spool(spool_directory)
+    spool.spool("error_data", ("run-1", [0]))
+
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+
+    # A directory owned by another user is neither written to nor has data
+    # replayed from it.
+
+    assert not spool.spool("error_data", ("run-1", [1]))
+
+    spool.offline = True
+    sent = []
+    spool.replay(lambda method, payload: sent.append(payload), "run-2")
+
+    assert sent == []
+    assert not spool.offline
+    assert len(os.listdir(spool.directory)) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="Symbolic links are not supported on this platform.")
+def test_spool_refuses_symbolic_link(spool_directory):
+    target = tempfile.mkdtemp()
+    os.symlink(target, os.path.join(spool_directory, "spool"))
+
+    spool = make_spool(os.path.join(spool_directory, "spool"))
+
+    assert not spool.spool("error_data", ("run-1", [0]))
+    assert os.listdir(target) == []
+
+
+def test_spool_unsupported_endpoint(spool_directory):
+    spool = make_spool(spool_directory)
+
+    assert not spool.spool("profile_data", ("run-1", []))
+    assert not os.path.exists(spool.directory)
+
+
+def test_replay_limit(spool_directory):
+    spool = make_spool(spool_directory, replay_limit=2)
+
+    for index in range(3):
+        spool.spool("error_data", ("run-1", [index]))
+
+    sent = []
+    spool.replay(lambda method, payload: sent.append(payload), "run-2")
+
+    assert sent == [["run-2", [0]], ["run-2", [1]]]
+    assert len(os.listdir(spool.directory)) == 1
+
+
+def test_max_bytes_drops_oldest(spool_directory):
+    spool = make_spool(spool_directory, max_bytes=1)
+
+    spool.spool("error_data", ("run-1", [0]))
+    spool.spool("error_data", ("run-1", [1]))
+
+    # Only the newest payload is ever retained as each is larger than the
+    # limit, with the older payload dropped.
+
+    sent = []
+    spool.replay(lambda method, payload: sent.append(payload), "run-2")
+
+    assert sent == []
+
+    spool = make_spool(spool_directory, max_bytes=1024)
+
+    for index in range(3):
+        spool.spool("error_data", ("run-1", [index]))
+
+    size = sum(os.path.getsize(os.path.join(spool.directory, name)) for name in os.listdir(spool.directory))
+    assert size <= 1024
+
+
+@pytest.mark.parametrize(
+    "raises,retained,offline",
+    (
+        (RetryDataForRequest, 2, True),
+        (DiscardDataForRequest, 0, False),
+        (ForceAgentRestart, 2, False),
+    ),
+)
+def test_replay_failure(spool_directory, raises, retained, offline):
+    spool = make_spool(spool_directory)
+
+    spool.spool("error_data", ("run-1", [0]))
+    spool.spool("error_data", ("run-1", [1]))
+
+    sent = []
+
+    def send(method, payload):
+        if not sent:
+            sent.append(payload)
+            raise raises()
+        sent.append(payload)
+
+    try:
+        spool.replay(send, "run-2")
+    except ForceAgentRestart:
+        assert raises is ForceAgentRestart
+
+    # A payload which could not be sent is put back to be replayed again,
+    # unless the data collector indicated it should be discarded.
+
+    names = os.listdir(spool.directory)
+    assert len(names) == retained
+    assert all(name.endswith(".payload") for name in names)
+    assert spool.offline == offline
+
+
+def test_abandoned_claim_is_replayed(spool_directory):
+    spool = make_spool(spool_directory)
+    spool.spool("error_data", ("run-1", [0]))
+
+    # Simulate a process which claimed the payload and then exited.
+
+    name = os.listdir(spool.directory)[0]
+    claimed = os.path.join(spool.directory, name + ".sending")
+    os.rename(os.path.join(spool.directory, name), claimed)
+
+    sent = []
+    spool.replay(lambda method, payload: sent.append(payload), "run-2")
+    assert sent == []
+
+    abandoned = time.time() - 3600
+    os.utime(claimed, (abandoned, abandoned))
+
+    spool.replay(lambda method, payload: sent.append(payload), "run-2")
+    assert sent == [["run-2", [0]]]
+
+
+def test_spool_shared_between_instances(spool_directory):
+    # A new process reporting as the same application replays the data
+    # spooled by a process which has since exited.
+
+    make_spool(spool_directory).spool("error_data", ("run-1", [0]))
+
+    sent = []
+    make_spool(spool_directory).replay(lambda method, payload: sent.append(payload), "run-2")
+    assert sent == [["run-2", [0]]]
+
+    other = HarvestSpool(spool_directory, "**NOT A LICENSE KEY**", "Other Application", 1024, 10)
+    other.spool("error_data", ("run-1", [0]))
+
+    sent = []
+    make_spool(spool_directory).replay(lambda method, payload: sent.append(payload), "run-2")
+    assert sent == []
+
+
+def test_harvest_spools_when_collector_unreachable(spool_directory):
+    @failing_endpoint("custom_event_data")
+    @override_generic_settings(
+        settings,
+        {
+            "developer_mode": True,
+            "license_key": "**NOT A LICENSE KEY**",
+            "feature_flag": set(),
+            "harvest_spool.enabled": True,
+            "harvest_spool.directory": spool_directory,
+        },
+    )
+    def _test():
+        app = Application("Python Agent Test (Harvest Spool)")
+        app.connect_to_data_collector(None)
+
+        spool = app._active_session.spool
+        assert spool is not None
+
+        app.record_custom_event("Custom", {})
+
+        app.harvest()
+
+        # The data which could not be sent is spooled rather than being
+        # rolled back into memory, with the metric data sent after it
+        # spooled without an attempt to send it.
+
+        assert app._stats_engine.custom_events.num_seen == 0
+        assert spool.offline
+        assert len(os.listdir(spool.directory)) == 2
+
+        sent = []
+
+        @transient_function_wrapper("newrelic.core.agent_protocol", "AgentProtocol.send")
+        def _capture_send(wrapped, instance, args, kwargs):
+            sent.append(args[0])
+            return wrapped(*args, **kwargs)
+
+        _capture_send(app.harvest)()
+
+        # The spooled data is replayed at the start of the next harvest.
+
+        assert sent[:2] == ["custom_event_data", "metric_data"]
+        assert os.listdir(spool.directory) == []
+        assert not spool.offline
+
+    _test()
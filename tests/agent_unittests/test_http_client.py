@@ -16,6 +16,7 @@ import base64
 import json
 import os.path
 import ssl
+import threading
 import zlib
 
 import pytest
@@ -259,6 +260,30 @@ def test_http_close_connection(server):
     client.close_connection()
 
 
+def test_concurrent_requests_share_connection_pool(insecure_server):
+    client = InsecureHttpClient("localhost", insecure_server.port, max_connections=3)
+
+    connections = []
+    statuses = []
+
+    def send_request():
+        connections.append(client._connection)
+        status, _ = client.send_request()
+        statuses.append(status)
+
+    threads = [threading.Thread(target=send_request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * 6
+    assert all(connection is connections[0] for connection in connections)
+    assert connections[0].pool.maxsize == 3
+
+    client.close_connection()
+
+
 def test_http_close_connection_in_context_manager():
     client = HttpClient("localhost", 1000)
     with client:
@@ -342,6 +367,70 @@ def test_http_payload_compression(server, client_cls, method, threshold):
     assert sent_payload == payload
 
 
+def _echoed_body(data):
+    # The echoed request ends with the body, the length of which is given
+    # by the echoed content-length header.
+    for header in data.split(b"\n")[1:]:
+        if header.lower().startswith(b"content-length"):
+            _, content_length = header.split(b":", 1)
+            return data[-int(content_length) :]
+
+
+@pytest.mark.parametrize("threshold", (0, 100, 100000))
+def test_http_streamed_payload_compression(server, threshold):
+    chunks = [b'{"data":"', b"*" * 1000, b'"}']
+    payload = b"".join(chunks)
+
+    internal_metrics = CustomMetrics()
+
+    with ApplicationModeClient(
+        "localhost",
+        server.port,
+        disable_certificate_validation=True,
+        compression_threshold=threshold,
+    ) as client:
+        with InternalTraceContext(internal_metrics):
+            status, data = client.send_request(payload=iter(chunks), params={"method": "test"})
+
+    assert status == 200
+
+    body = _echoed_body(data)
+    internal_metrics = dict(internal_metrics.metrics())
+
+    if threshold < len(payload):
+        decompressor = zlib.decompressobj(31)
+        assert decompressor.decompress(body) + decompressor.flush() == payload
+        assert internal_metrics["Supportability/Python/Collector/ZLIB/Bytes/test"][:2] == [1, len(payload)]
+    else:
+        assert body == payload
+        assert "Supportability/Python/Collector/ZLIB/Bytes/test" not in internal_metrics
+
+
+def test_streamed_payload_stops_at_max_payload_size(insecure_server):
+    produced = []
+
+    def chunks():
+        for _ in range(1000):
+            chunk = os.urandom(1024)
+            produced.append(chunk)
+            yield chunk
+
+    with InsecureHttpClient(
+        "localhost",
+        insecure_server.port,
+        compression_threshold=0,
+        max_payload_size_in_bytes=16 * 1024,
+    ) as client:
+        status, data = client.send_request(payload=chunks())
+
+    assert status == 413
+    assert not data
+
+    # Encoding of the payload is abandoned once the compressed body is
+    # known to be too large.
+    assert len(produced) < 1000
+
+
 def test_cert_path(server):
     with HttpClient("localhost", server.port, ca_bundle_path=SERVER_CERT) as client:
         status, data = client.send_request()
@@ -79,3 +79,35 @@ def test_module_function_globbing(input, expected):
     
     result = set(_module_function_glob(module, input))
     assert result == expected, (result, expected)
+
+
+def test_import_hook_durations(monkeypatch):
+    """This asserts the time spent running the import hooks for a module is
+    recorded, and is reset each time it is reported."""
+    monkeypatch.setattr(import_hook, "_import_hooks", {"_test_import_hook": [hook, hook]})
+    monkeypatch.setattr(import_hook, "_import_hook_durations", {})
+
+    import _test_import_hook as module
+
+    import_hook._notify_import_hooks("_test_import_hook", module)
+
+    durations = import_hook.import_hook_durations()
+    assert list(durations) == ["_test_import_hook"]
+    assert durations["_test_import_hook"] >= 0.0
+
+    assert import_hook.import_hook_durations() == {}
+
+
+def test_entry_points_match_pkg_resources():
+    """This asserts entry points found through importlib.metadata are the
+    same as those found through pkg_resources."""
+    from newrelic.common import entry_points
+
+    pytest.importorskip("pkg_resources")
+
+    if entry_points._entry_points is None:
+        pytest.skip("importlib.metadata is not available")
+
+    for group in ("console_scripts", "pytest11"):
+        expected = sorted(entry_points._pkg_resources_entry_points(group))
+        assert sorted(entry_points.iter_entry_points(group)) == expected
@@ -0,0 +1,203 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import time
+import zlib
+
+import pytest
+from testing_support.mock_external_http_server import MockExternalHTTPServer
+
+from newrelic.api.log import NewRelicLogHandler
+from newrelic.common.agent_http import InsecureHttpClient
+
+
+def capture_request(self):
+    content_length = int(self.headers.get("Content-Length", 0))
+    data = self.rfile.read(content_length)
+
+    if self.headers.get("Content-Encoding") == "gzip":
+        data = zlib.decompress(data, 31)
+
+    self.server.requests.append((self.path, dict(self.headers), json.loads(data.decode("utf-8"))))
+
+    self.send_response(self.server.status)
+    self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockExternalHTTPServer(handler=capture_request) as server:
+        server.httpd.requests = []
+        server.httpd.status = 202
+        yield server
+
+
+@pytest.fixture
+def requests(server):
+    server.httpd.requests = []
+    server.httpd.status = 202
+    return server.httpd.requests
+
+
+class InsecureLogHandler(NewRelicLogHandler):
+    CLIENT = InsecureHttpClient
+
+
+def make_logger(handler):
+    logger = logging.getLogger("test_log_handler.%d" % id(handler))
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_synchronous_emit(server, requests):
+    handler = InsecureLogHandler(license_key="license-key", host="localhost", port=server.port)
+    logger = make_logger(handler)
+
+    logger.info("first")
+    logger.info("second")
+
+    # Each log record is sent as it is emitted.
+
+    assert [request[2]["message"] for request in requests] == ["first", "second"]
+    assert requests[0][0] == "/log/v1"
+    assert requests[0][1]["Api-Key"] == "license-key"
+
+    handler.close()
+
+
+def test_asynchronous_batches(server, requests):
+    handler = InsecureLogHandler(
+        license_key="license-key",
+        host="localhost",
+        port=server.port,
+        asynchronous=True,
+        batch_size=2,
+        flush_interval=60.0,
+    )
+    logger = make_logger(handler)
+
+    for index in range(5):
+        logger.info("message %d", index)
+
+    # Full batches are sent by the background thread without waiting for
+    # the flush interval, with the partial batch sent on close.
+
+    wait_for(lambda: len(requests) == 2)
+    assert len(requests) == 2
+
+    handler.close()
+
+    assert [[event["message"] for event in request[2]] for request in requests] == [
+        ["message 0", "message 1"],
+        ["message 2", "message 3"],
+        ["message 4"],
+    ]
+    assert all(request[1]["Content-Encoding"] == "gzip" for request in requests)
+    assert handler.stats() == (5, 0)
+
+
+def test_asynchronous_flush_interval(server, requests):
+    handler = InsecureLogHandler(
+        host="localhost", port=server.port, asynchronous=True, batch_size=100, flush_interval=0.05
+    )
+    logger = make_logger(handler)
+
+    logger.info("message")
+
+    wait_for(lambda: requests)
+    assert [[event["message"] for event in request[2]] for request in requests] == [["message"]]
+
+    handler.close()
+
+
+def test_asynchronous_queue_full(server, requests):
+    handler = InsecureLogHandler(
+        host="localhost", port=server.port, asynchronous=True, batch_size=100, flush_interval=60.0, queue_size=3
+    )
+    logger = make_logger(handler)
+
+    for index in range(5):
+        logger.info("message %d", index)
+
+    handler.close()
+
+    # Log records emitted while the queue is full are dropped, as are any
+    # emitted after the handler is closed.
+
+    logger.info("closed")
+
+    assert [event["message"] for event in requests[0][2]] == ["message 0", "message 1", "message 2"]
+    assert handler.stats() == (3, 3)
+
+
+def test_asynchronous_failed_batch_dropped(server, requests, capsys):
+    server.httpd.status = 500
+
+    handler = InsecureLogHandler(host="localhost", port=server.port, asynchronous=True, flush_interval=60.0)
+    logger = make_logger(handler)
+
+    logger.info("first")
+    logger.info("second")
+    handler.flush()
+
+    assert len(requests) == 1
+    assert handler.stats() == (0, 2)
+    assert "Logging error" in capsys.readouterr().err
+
+    handler.close()
+
+
+def test_asynchronous_after_fork(server, requests):
+    handler = InsecureLogHandler(
+        host="localhost", port=server.port, asynchronous=True, batch_size=100, flush_interval=60.0, queue_size=1
+    )
+    logger = make_logger(handler)
+
+    logger.info("parent")
+    logger.info("dropped")
+
+    # Simulate the handler being used in a process forked from the one the
+    # log records were queued in. Those log records are left to the parent
+    # process to send, and the counts start again.
+
+    stale_notify, stale_thread = handler._notify, handler._thread
+    handler._process_id = -1
+
+    logger.info("child")
+
+    # The background thread started before the fork exits once woken, and
+    # is replaced by a new one which sends the log records of the child.
+
+    assert handler._thread is not stale_thread
+
+    with stale_notify:
+        stale_notify.notify_all()
+
+    stale_thread.join(5.0)
+    assert not stale_thread.is_alive()
+
+    handler.close()
+
+    assert [[event["message"] for event in request[2]] for request in requests] == [["child"]]
+    assert handler.stats() == (1, 0)
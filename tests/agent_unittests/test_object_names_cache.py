@@ -0,0 +1,129 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gc
+
+import pytest
+
+from newrelic.common import object_names
+from newrelic.common.object_names import callable_name
+
+
+class Base(object):
+    def method(self):
+        pass
+
+    @classmethod
+    def class_method(cls):
+        pass
+
+
+class Child(Base):
+    pass
+
+
+class Slotted(object):
+    __slots__ = ()
+
+    def __call__(self):
+        pass
+
+
+class Unhashable(object):
+    __eq__ = object.__eq__
+    __hash__ = None
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    object_names._object_path_cache.clear()
+    object_names._method_path_cache.clear()
+    object_names._object_path_type_cache.clear()
+
+
+def test_bound_methods_cached_per_class():
+    assert callable_name(Base().method) == __name__ + ":Base.method"
+    assert callable_name(Child().method) == __name__ + ":Child.method"
+    assert callable_name(Base.class_method) == __name__ + ":Base.class_method"
+    assert callable_name(Child.class_method) == __name__ + ":Child.class_method"
+
+    assert len(object_names._method_path_cache[Base.method]) == 2
+
+    # Cached results are the same as when first derived.
+    assert callable_name(Base().method) == __name__ + ":Base.method"
+    assert callable_name(Child().method) == __name__ + ":Child.method"
+    assert callable_name(Child.class_method) == __name__ + ":Child.class_method"
+
+
+def test_cache_entries_dropped_with_class():
+    class Dynamic(object):
+        def method(self):
+            pass
+
+    assert callable_name(Dynamic().method).endswith(".Dynamic.method")
+    assert len(object_names._method_path_cache) == 1
+
+    del Dynamic
+    gc.collect()
+
+    assert len(object_names._method_path_cache) == 0
+
+
+def test_object_without_attributes_cached():
+    instance = Slotted()
+
+    assert callable_name(instance) == __name__ + ":Slotted"
+    assert object_names._object_path_type_cache[Slotted] == {__name__: (__name__, "Slotted")}
+    assert callable_name(Slotted()) == __name__ + ":Slotted"
+
+
+def test_unhashable_object_cached_by_type():
+    instances = [Unhashable() for _ in range(3)]
+
+    object_names._cache_object_context(instances[0], ("module", "path"))
+
+    # Instances without a name of their own share the cached name details
+    # of their type, so the cache only holds the type, and weakly.
+
+    for instance in instances:
+        assert object_names._cached_object_context(instance) == ("module", "path")
+
+    assert list(object_names._object_path_type_cache) == [Unhashable]
+
+
+def test_named_unhashable_object_not_cached():
+    instance = Unhashable()
+    instance.__name__ = "named"
+
+    object_names._cache_object_context(instance, ("module", "path"))
+
+    assert object_names._cached_object_context(instance) is None
+    assert len(object_names._object_path_type_cache) == 0
+
+
+def test_type_cache_entries_dropped_with_class():
+    class Dynamic(object):
+        __slots__ = ()
+
+        def __call__(self):
+            pass
+
+    assert callable_name(Dynamic()).endswith(".Dynamic")
+    assert len(object_names._object_path_type_cache) == 1
+
+    del Dynamic
+    gc.collect()
+
+    assert len(object_names._object_path_type_cache) == 0
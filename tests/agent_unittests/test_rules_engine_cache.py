@@ -0,0 +1,94 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from newrelic.core.rules_engine import RulesEngine
+
+RULES = [
+    {
+        "match_expression": "[0-9]+",
+        "replacement": "*",
+        "ignore": False,
+        "eval_order": 0,
+        "terminate_chain": False,
+        "each_segment": True,
+        "replace_all": False,
+    },
+    {
+        "match_expression": "^/health$",
+        "replacement": "",
+        "ignore": True,
+        "eval_order": 1,
+        "terminate_chain": True,
+        "each_segment": False,
+        "replace_all": False,
+    },
+]
+
+
+def test_normalize_cache_hits_and_misses():
+    rules_engine = RulesEngine(RULES, cache_size=10)
+
+    assert rules_engine.normalize("/user/123") == ("/user/*", False)
+    assert rules_engine.normalize("/user/123") == ("/user/*", False)
+    assert rules_engine.normalize(b"/health") == ("", True)
+    assert rules_engine.normalize(b"/health") == ("", True)
+    assert rules_engine.normalize("/user/456") == ("/user/*", False)
+
+    assert rules_engine.cache_stats() == (2, 3)
+    assert rules_engine.cache_stats() == (0, 0)
+
+
+def test_normalize_cache_evicts_least_recently_used():
+    rules_engine = RulesEngine(RULES, cache_size=2)
+
+    rules_engine.normalize("/a/1")
+    rules_engine.normalize("/b/2")
+    rules_engine.normalize("/a/1")
+    rules_engine.normalize("/c/3")
+
+    # "/b/2" was least recently used and so evicted when "/c/3" was added
+    rules_engine.cache_stats()
+    rules_engine.normalize("/a/1")
+    rules_engine.normalize("/b/2")
+
+    assert rules_engine.cache_stats() == (1, 1)
+
+
+def test_normalize_cache_disabled():
+    rules_engine = RulesEngine(RULES, cache_size=0)
+
+    rules_engine.normalize("/user/123")
+    rules_engine.normalize("/user/123")
+
+    assert rules_engine.cache_stats() == (0, 0)
+
+
+def test_normalize_combined_matcher_rejects_unmatched_names():
+    rules_engine = RulesEngine(RULES)
+
+    assert rules_engine.normalize("/user/profile") == ("/user/profile", False)
+    assert rules_engine.normalize("/healthz") == ("/healthz", False)
+    assert rules_engine.normalize("/user/7") == ("/user/*", False)
+
+
+def test_normalize_uncombinable_rules():
+    rules = [
+        dict(RULES[0], match_expression=r"(a)\1", replacement="b", each_segment=False),
+        dict(RULES[0], match_expression=r"(?P<x>c)(?P=x)", replacement="d", eval_order=1),
+    ]
+    rules_engine = RulesEngine(rules)
+
+    assert rules_engine.normalize("/aa/cc") == ("/b/d", False)
+    assert rules_engine.normalize("/ab/cd") == ("/ab/cd", False)
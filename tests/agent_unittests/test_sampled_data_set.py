@@ -0,0 +1,85 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+
+import pytest
+
+from newrelic.core.stats_engine import SampledDataSet
+
+
+def _data_set(capacity, priorities):
+    data_set = SampledDataSet(capacity)
+    for sample, priority in enumerate(priorities):
+        data_set.add(sample, priority)
+    return data_set
+
+
+def _add_merge(data_set, other_data_set):
+    for priority, _, sample in other_data_set.pq:
+        data_set.add(sample, priority)
+    data_set.num_seen += other_data_set.num_seen - other_data_set.num_samples
+
+
+@pytest.mark.parametrize(
+    "capacity,existing,new,new_capacity",
+    (
+        (10, 0, 5, 10),
+        (10, 4, 6, 10),
+        (10, 10, 1, 10),
+        (10, 10, 100, 100),
+        (100, 100, 5, 10),
+        (100, 50, 200, 1000),
+        (1, 3, 3, 3),
+    ),
+)
+def test_merge_keeps_top_priorities(capacity, existing, new, new_capacity):
+    rng = random.Random(capacity * existing + new)
+    priorities = [rng.choice((0.25, 0.5, rng.random())) for _ in range(existing + new)]
+
+    data_set = _data_set(capacity, priorities[:existing])
+    other_data_set = _data_set(new_capacity, priorities[existing:])
+
+    expected = _data_set(capacity, priorities[:existing])
+    _add_merge(expected, other_data_set)
+
+    data_set.merge(other_data_set)
+
+    assert data_set.num_seen == existing + new
+    assert data_set.num_samples == min(capacity, existing + min(new, new_capacity))
+    assert sorted(p for p, _, _ in data_set.pq) == sorted(p for p, _, _ in expected.pq)
+
+    # The reservoir must still be a valid heap once full
+    if data_set.heap:
+        assert data_set.pq[0] == min(data_set.pq)
+
+
+def test_merge_zero_capacity():
+    data_set = SampledDataSet(0)
+    data_set.merge(_data_set(10, [0.5] * 20))
+
+    assert data_set.num_seen == 20
+    assert data_set.num_samples == 0
+
+
+def test_add_after_merge_stays_bounded():
+    data_set = _data_set(10, [0.5] * 5)
+    data_set.merge(_data_set(2, [0.5] * 20))
+
+    for _ in range(20):
+        data_set.add("sample", 0.75)
+
+    assert data_set.num_samples == 10
+    assert data_set.num_seen == 45
@@ -0,0 +1,93 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import sys
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+
+
+def function_node(guid, children=()):
+    return FunctionNode(
+        group="Function",
+        name=guid,
+        children=children,
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=1.0,
+        label=None,
+        params=None,
+        rollup=None,
+        guid=guid,
+        agent_attributes={"code.function": guid},
+        user_attributes={"user": guid},
+    )
+
+
+def root_node(children):
+    return RootNode(
+        name="Function/main",
+        children=children,
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.0,
+        guid="root",
+        agent_attributes={},
+        user_attributes={},
+        path="OtherTransaction/Function/main",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+
+def test_span_events_depth_first_order():
+    root = root_node(
+        (
+            function_node("a", (function_node("a1"), function_node("a2", (function_node("a2x"),)))),
+            function_node("b"),
+        )
+    )
+
+    events = list(root.span_events(finalize_application_settings({}), {"traceId": "trace"}, parent_guid="parent"))
+
+    assert [(i_attrs["guid"], i_attrs["parentId"]) for i_attrs, _, _ in events] == [
+        ("root", "parent"),
+        ("a", "root"),
+        ("a1", "a"),
+        ("a2", "a"),
+        ("a2x", "a2"),
+        ("b", "root"),
+    ]
+
+    for i_attrs, u_attrs, a_attrs in events[1:]:
+        assert i_attrs["traceId"] == "trace"
+        assert a_attrs["code.function"] == u_attrs["user"] == i_attrs["guid"]
+
+
+def test_span_events_deeper_than_recursion_limit():
+    depth = sys.getrecursionlimit() * 2
+
+    node = function_node("leaf")
+    for index in range(depth):
+        node = function_node(str(index), (node,))
+
+    events = list(root_node((node,)).span_events(finalize_application_settings({})))
+
+    assert len(events) == depth + 2
+    assert events[-1][0]["guid"] == "leaf"
+    assert events[-1][0]["parentId"] == "0"
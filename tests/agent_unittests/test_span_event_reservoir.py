@@ -0,0 +1,109 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from test_span_event_generation import function_node, root_node
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.stats_engine import SpanEventDataSet
+from newrelic.core.transaction_node import SpanEventReference, TransactionNode
+
+
+class Transaction(object):
+    # Borrows the span event methods of the transaction node, which only
+    # need the few fields set here.
+
+    _span_event_base_attrs = TransactionNode._span_event_base_attrs
+    span_events = TransactionNode.span_events
+    span_event_references = TransactionNode.span_event_references
+
+    def __init__(self, name, priority):
+        self.guid = name
+        self.trace_id = name
+        self.sampled = True
+        self.priority = priority
+        self.parent_span = None
+        self.root = root_node(
+            (
+                function_node(name + "-a", (function_node(name + "-a1"),)),
+                function_node(name + "-b"),
+            )
+        )
+
+
+def transactions():
+    return [Transaction("txn%d" % n, priority) for n, priority in enumerate((0.5, 1.5, 0.2, 1.5, 0.9, 1.2, 0.1))]
+
+
+@pytest.mark.parametrize("capacity", (0, 3, 5, 100))
+def test_lazy_span_events_match_eager(capacity):
+    settings = finalize_application_settings({})
+
+    eager = SpanEventDataSet(capacity)
+    for transaction in transactions():
+        for event in transaction.span_events(settings):
+            eager.add(event, priority=transaction.priority)
+
+    lazy = SpanEventDataSet(capacity)
+    for transaction in transactions():
+        lazy.add_references(transaction, settings)
+
+    assert lazy.num_seen == eager.num_seen == 28
+    assert lazy.num_samples == eager.num_samples
+    assert [entry[:2] for entry in lazy.pq] == [entry[:2] for entry in eager.pq]
+    assert list(lazy) == list(eager)
+
+
+def test_references_materialized_once():
+    settings = finalize_application_settings({})
+
+    data_set = SpanEventDataSet(4)
+    data_set.add_references(Transaction("low", 0.1), settings)
+    data_set.add_references(Transaction("high", 1.0), settings)
+
+    assert all(isinstance(sample, SpanEventReference) for _, _, sample in data_set.pq)
+
+    events = list(data_set)
+
+    assert sorted(i_attrs["guid"] for i_attrs, _, _ in events) == ["high-a", "high-a1", "high-b", "root"]
+    assert not any(isinstance(sample, SpanEventReference) for _, _, sample in data_set.pq)
+    assert list(data_set) == events
+
+    # A transaction which cannot displace any sample leaves the samples as they were.
+    data_set.add_references(Transaction("lowest", 0.0), settings)
+
+    assert data_set.num_seen == 12
+    assert list(data_set) == events
+
+
+def test_merge_references():
+    settings = finalize_application_settings({})
+
+    data_set = SpanEventDataSet(6)
+    data_set.add_references(Transaction("first", 0.5), settings)
+
+    other = SpanEventDataSet(6)
+    other.add_references(Transaction("second", 1.0), settings)
+
+    data_set.merge(other)
+
+    assert data_set.num_seen == 8
+    assert sorted((i_attrs["transactionId"], i_attrs["guid"]) for i_attrs, _, _ in data_set) == [
+        ("first", "first-a"),
+        ("first", "root"),
+        ("second", "root"),
+        ("second", "second-a"),
+        ("second", "second-a1"),
+        ("second", "second-b"),
+    ]
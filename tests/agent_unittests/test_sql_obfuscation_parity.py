@@ -0,0 +1,104 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import random
+import re
+
+import pytest
+
+from newrelic.core.database_utils import SQLStatement
+
+# The regular expressions used to obfuscate and normalize SQL before the
+# token patterns were combined into a single pass. The single pass must
+# produce exactly the same output as applying these one after another.
+
+_single_quotes_p = r"'(?:[^']|'')*?(?:\\'.*|'(?!'))"
+_double_quotes_p = r'"(?:[^"]|"")*?(?:\\".*|"(?!"))'
+_dollar_quotes_p = r"(\$(?!\d)[^$]*?\$).*?(?:\1|$)"
+_oracle_quotes_p = r"q'\[.*?(?:\]'|$)|q'\{.*?(?:\}'|$)|" r"q'\<.*?(?:\>'|$)|q'\(.*?(?:\)'|$)"
+
+_uuid_p = r"\{?(?:[0-9a-f]\-?){32}\}?"
+_int_p = r"(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(e[+-]?[0-9]+)?"
+_hex_p = r"0x[0-9a-f]+"
+_bool_p = r"\b(?:true|false|null)\b"
+_all_literals_re = re.compile("(" + ")|(".join([_uuid_p, _hex_p, _int_p, _bool_p]) + ")", re.IGNORECASE)
+
+_quotes_table = {
+    "single": (re.compile(_single_quotes_p), re.compile(r"'")),
+    "single+double": (re.compile(_single_quotes_p + "|" + _double_quotes_p), re.compile(r"'|\"")),
+    "single+dollar": (re.compile(_single_quotes_p + "|" + _dollar_quotes_p), re.compile(r"'|\$(?!\?)")),
+    "single+oracle": (re.compile(_single_quotes_p + "|" + _oracle_quotes_p), re.compile(r"'")),
+}
+
+_uncomment_sql_re = re.compile(r"((?:#|--).*?(?=\r|\n|$))|(\/\*(?:[^\/]|\/[^*])*?(?:\*\/|\/\*.*))", re.DOTALL)
+
+
+def legacy_obfuscated(sql, quoting_style):
+    quotes_re, quotes_cleanup_re = _quotes_table[quoting_style]
+    sql = quotes_re.sub("?", sql)
+    sql = _all_literals_re.sub("?", sql)
+    if quotes_cleanup_re.search(sql):
+        sql = "?"
+    return _uncomment_sql_re.sub("", sql)
+
+
+def legacy_normalized(sql):
+    sql = re.sub(r"%\([^)]*\)s", "?", sql)
+    sql = re.sub(r"\([^)]+\)", "(?)", sql)
+    sql = re.sub(r"%s", "?", sql)
+    sql = re.sub(r":\w+", "?", sql)
+    sql = sql.strip()
+    sql = re.sub(r"\s+", " ", sql)
+    sql = re.sub(r"\s+(?!\w)", "", sql)
+    sql = re.sub(r"(?<!\w)\s+", "", sql)
+    return sql
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+# Fragments are chosen to exercise the edges of each token pattern:
+# escaped and unterminated quotes, dollar quote tags, Oracle quote
+# delimiters, word boundaries around literals, parameters and comments.
+
+FRAGMENTS = [
+    "SELECT", "select", "FROM", "t1", "col_1", "x", "q", "Q", "e", "E", "_",
+    " ", "  ", "\t", "\n", "\r", ",", ";", ".", "=", "(", ")", "{", "}", "[", "]", "<", ">",
+    "'", "''", "'abc'", "\\'", '"', '""', '"id"', "$", "$$", "$tag$", "$1", "q'[", "]'", "q'{", "}'", "q'<", "q'(", ")'",
+    "0", "1", "42", "-", "-7", "3.14", "1e5", "2E-3", "0x1F", "0XAB", ":", ":1", ":name",
+    "true", "FALSE", "Null", "nullq", "deadbeef", "12345678-1234-1234-1234-123456789abc", "{0123456789abcdef0123456789ABCDEF}",
+    "%s", "%(", ")s", "%(name)s", "#", "--", "/*", "*/", "/", "*", "é",
+]
+
+
+def _random_sql(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 16)))
+
+
+@pytest.mark.parametrize("quoting_style", sorted(_quotes_table))
+def test_obfuscated_and_normalized_match_legacy_regexes(quoting_style):
+    rng = random.Random(quoting_style)
+    database = DummyDB(quoting_style)
+
+    for _ in range(5000):
+        sql = _random_sql(rng)
+        statement = SQLStatement(sql, database)
+
+        expected = legacy_obfuscated(sql, quoting_style)
+        assert statement.obfuscated == expected, sql
+        assert statement.normalized == legacy_normalized(expected), sql
+        assert statement.uncommented == _uncomment_sql_re.sub("", sql), sql
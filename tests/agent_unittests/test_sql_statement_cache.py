@@ -0,0 +1,84 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import gc
+
+from testing_support.fixtures import override_generic_settings
+
+from newrelic.core.config import global_settings
+from newrelic.core.database_utils import (
+    SQLStatement,
+    SQLStatementCache,
+    sql_statement,
+    sql_statement_cache_stats,
+)
+
+
+class DummyDB(object):
+    quoting_style = "single"
+
+
+def _statement(sql):
+    return SQLStatement(sql, DummyDB())
+
+
+def test_cache_hits_misses_and_evictions():
+    cache = SQLStatementCache()
+    a, b, c = _statement("SELECT a"), _statement("SELECT b"), _statement("SELECT c")
+
+    assert cache.get("a") is None
+    cache.add("a", a, 64)
+    cache.add("b", b, 64)
+    assert cache.get("a") is a
+
+    # Each statement is charged for four times its length, so adding a
+    # third statement evicts the least recently used one.
+
+    cache.add("c", c, 64)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is a
+    assert cache.get("c") is c
+
+    assert cache.cache_stats() == (3, 2, 1)
+    assert cache.cache_stats() == (0, 0, 0)
+
+
+def test_cache_skips_statements_over_budget():
+    cache = SQLStatementCache()
+
+    cache.add("a", _statement("SELECT a"), 16)
+
+    assert len(cache) == 0
+
+
+@override_generic_settings(global_settings(), {"agent_limits.sql_statement_cache_bytes": 1024})
+def test_sql_statement_kept_across_transactions():
+    sql = "SELECT * FROM cached_table WHERE id = 1"
+
+    statement = sql_statement(sql, DummyDB)
+    obfuscated = statement.obfuscated
+    sql_statement_cache_stats()
+
+    # Nothing else holds on to the statement, as is the case once the
+    # database nodes of the transaction which ran it have been discarded.
+
+    del statement
+    gc.collect()
+
+    statement = sql_statement(sql, DummyDB)
+
+    assert statement._obfuscated is obfuscated
+    assert sql_statement_cache_stats() == (1, 0, 0)
@@ -0,0 +1,80 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import pytest
+
+import newrelic.common.startup_profiler as startup_profiler
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setattr(startup_profiler, "_enabled", True)
+    monkeypatch.setattr(startup_profiler, "_phases", [])
+    monkeypatch.setattr(startup_profiler, "_phases_reported", 0)
+    return startup_profiler
+
+
+def test_startup_phases_recorded(profiler):
+    with profiler.startup_phase("Initialize"):
+        with profiler.startup_phase("HookRegistration", "flask"):
+            pass
+        with profiler.startup_phase("HookRegistration", "django"):
+            pass
+
+    report = profiler.startup_profile_report()
+
+    assert [(phase["category"], phase["name"]) for phase in report["phases"]] == [
+        ("HookRegistration", "flask"),
+        ("HookRegistration", "django"),
+        ("Initialize", None),
+    ]
+    assert report["categories"]["HookRegistration"]["count"] == 2
+    assert report["categories"]["Initialize"]["duration"] >= report["categories"]["HookRegistration"]["duration"]
+
+
+def test_startup_phase_recorded_on_error(profiler):
+    with pytest.raises(ValueError):
+        with profiler.startup_phase("Configuration"):
+            raise ValueError()
+
+    assert [phase["category"] for phase in profiler.startup_profile_report()["phases"]] == ["Configuration"]
+
+
+def test_startup_profile_metrics(profiler):
+    profiler.record_startup_phase("Instrumentation", "flask", 0.25)
+    profiler.record_startup_phase("Instrumentation", "jinja2", 0.5)
+    profiler.record_startup_phase("ActivateApplication", "Python Application", 1.0)
+
+    assert profiler.startup_profile_metrics() == {"Instrumentation": 0.75, "ActivateApplication": 1.0}
+
+    # Only phases recorded since the metrics were last obtained are
+    # included, but the report still covers all phases.
+
+    profiler.record_startup_phase("Instrumentation", "sqlite3", 0.125)
+
+    assert profiler.startup_profile_metrics() == {"Instrumentation": 0.125}
+    assert profiler.startup_profile_metrics() == {}
+    assert len(profiler.startup_profile_report()["phases"]) == 4
+
+
+def test_startup_profiler_disabled(monkeypatch):
+    monkeypatch.setattr(startup_profiler, "_enabled", False)
+    monkeypatch.setattr(startup_profiler, "_phases", [])
+
+    with startup_profiler.startup_phase("Initialize"):
+        pass
+    startup_profiler.record_startup_phase("Instrumentation", "flask", 0.25)
+
+    assert startup_profiler.startup_profile_report() == {"categories": {}, "phases": []}
@@ -83,6 +83,9 @@ def test_attributes(testname, config, input_key, input_default_destinations,
     expected = destinations_as_int(expected_destinations)
     assert result == expected, attribute_filter
 
+    # The cached result must be the same.
+    assert attribute_filter.apply(input_key, input_destinations) == expected
+
 _sorting_tests = [
     ('lexicographic', ('a', 1, True), ('ab', 1, True)),
     ('is_include', ('a', 1, True), ('a', 1, False)),
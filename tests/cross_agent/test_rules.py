@@ -42,15 +42,16 @@ def _make_case_insensitive(rules):
             rule['replacement'] = rule['replacement'].lower()
     return rules
 
+@pytest.mark.parametrize('cache_size', [0, 2])
 @pytest.mark.parametrize('test_group', _load_tests())
-def test_rules_engine(test_group):
+def test_rules_engine(test_group, cache_size):
 
     # FIXME: The test fixture assumes that matching is case insensitive when it
     # is not. To avoid errors, just lowercase all rules, inputs, and expected
     # values.
     insense_rules = _make_case_insensitive(test_group['rules'])
     test_rules = _prepare_rules(insense_rules)
-    rules_engine = RulesEngine(test_rules)
+    rules_engine = RulesEngine(test_rules, cache_size)
 
     for test in test_group['tests']:
 
@@ -60,6 +61,10 @@ def test_rules_engine(test_group):
 
         result, ignored = rules_engine.normalize(input_str)
 
+        # A repeat of the same input must give the same result whether or
+        # not the result was cached.
+        assert rules_engine.normalize(input_str) == (result, ignored)
+
         # When a transaction is to be ignored, the test fixture expects that
         # "expected" is None.
         if ignored:
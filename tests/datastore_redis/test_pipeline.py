@@ -0,0 +1,128 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import redis
+
+from newrelic.api.background_task import background_task
+
+from testing_support.fixtures import (validate_transaction_metrics,
+    override_application_settings)
+from testing_support.db_settings import redis_settings
+from testing_support.util import instance_hostname
+from testing_support.validators.validate_span_events import (
+        validate_span_events)
+
+DB_SETTINGS = redis_settings()[0]
+
+# Settings
+
+_enable_instance_settings = {
+    'datastore_tracer.instance_reporting.enabled': True,
+    'distributed_tracing.enabled': True,
+    'span_events.enabled': True,
+}
+
+# Metrics
+
+_host = instance_hostname(DB_SETTINGS['host'])
+_port = DB_SETTINGS['port']
+
+_instance_metric_name = 'Datastore/instance/Redis/%s/%s' % (_host, _port)
+
+# Queued commands are covered by a single trace for executing the
+# pipeline, rather than a trace for each command.
+
+_pipeline_scoped_metrics = (
+        ('Datastore/operation/Redis/pipeline', 1),
+        ('Datastore/operation/Redis/get', None),
+        ('Datastore/operation/Redis/set', None),
+)
+
+_pipeline_rollup_metrics = (
+        ('Datastore/all', 1),
+        ('Datastore/allOther', 1),
+        ('Datastore/Redis/all', 1),
+        ('Datastore/Redis/allOther', 1),
+        ('Datastore/operation/Redis/pipeline', 1),
+        (_instance_metric_name, 1),
+)
+
+# Watching keys sends commands immediately, until the pipeline is put
+# back into buffered mode with multi().
+
+_watch_scoped_metrics = (
+        ('Datastore/operation/Redis/watch', 1),
+        ('Datastore/operation/Redis/get', 1),
+        ('Datastore/operation/Redis/pipeline', 1),
+        ('Datastore/operation/Redis/set', None),
+)
+
+# Operations
+
+def exercise_pipeline(client):
+    with client.pipeline() as pipeline:
+        pipeline.set('key', 'value')
+        pipeline.set('other', 'value')
+        pipeline.get('key')
+        pipeline.execute()
+
+def exercise_watch(client):
+    with client.pipeline() as pipeline:
+        pipeline.watch('key')
+        pipeline.get('key')
+        pipeline.multi()
+        pipeline.set('key', 'value')
+        pipeline.execute()
+
+# Tests
+
+@override_application_settings(_enable_instance_settings)
+@validate_span_events(
+        count=1,
+        exact_agents={
+            'db.redis.pipeline.commands': 3,
+            'db.redis.pipeline.operations': 'set=2,get=1',
+        })
+@validate_transaction_metrics(
+        'test_pipeline:test_pipeline_single_trace',
+        scoped_metrics=_pipeline_scoped_metrics,
+        rollup_metrics=_pipeline_rollup_metrics,
+        background_task=True)
+@background_task()
+def test_pipeline_single_trace():
+    client = redis.StrictRedis(host=DB_SETTINGS['host'],
+            port=DB_SETTINGS['port'], db=0)
+    exercise_pipeline(client)
+
+@override_application_settings(_enable_instance_settings)
+@validate_transaction_metrics(
+        'test_pipeline:test_pipeline_watch',
+        scoped_metrics=_watch_scoped_metrics,
+        background_task=True)
+@background_task()
+def test_pipeline_watch():
+    client = redis.StrictRedis(host=DB_SETTINGS['host'],
+            port=DB_SETTINGS['port'], db=0)
+    exercise_watch(client)
+
+@validate_transaction_metrics(
+        'test_pipeline:test_empty_pipeline',
+        scoped_metrics=[('Datastore/operation/Redis/pipeline', None)],
+        background_task=True)
+@background_task()
+def test_empty_pipeline():
+    client = redis.StrictRedis(host=DB_SETTINGS['host'],
+            port=DB_SETTINGS['port'], db=0)
+    with client.pipeline() as pipeline:
+        pipeline.execute()
@@ -63,14 +63,20 @@ def validate_span_events(
                 events.append(event)
                 return wrapped(*args, **kwargs)
 
+            @transient_function_wrapper("newrelic.common.streaming_utils", "StreamBuffer.put_many")
+            def stream_capture_many(wrapped, instance, args, kwargs):
+                items = list(args[0])
+                events.extend(items)
+                return wrapped(items, *args[1:], **kwargs)
+
             record_transaction_called.append(True)
             try:
-                result = stream_capture(wrapped)(*args, **kwargs)
+                result = stream_capture_many(stream_capture(wrapped))(*args, **kwargs)
             except:
                 raise
             else:
                 if not instance.settings.infinite_tracing.enabled:
-                    events = [event for priority, seen_at, event in instance.span_events.pq]
+                    events = list(instance.span_events)
 
                 recorded_span_events.append(events)
 